@@ -3,7 +3,8 @@
 import asyncio
 import json
 import logging
-from typing import Any, Dict, List
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 try:
     import dbus
@@ -15,8 +16,13 @@ except ImportError as e:
     raise
 
 from basic import BasicSettingsManager
+from cmdtrace import run_in_method, start_background, trace
+from command import run_command, runner
 from config import ConfigManager
+from dispatch import AsyncDispatcher
+from metrics import instrument_methods, metrics
 from network import NetworkManager
+from storage import StorageJob, StorageManager
 from updater import UpdaterManager
 
 logger = logging.getLogger(__name__)
@@ -29,111 +35,186 @@ class DBusError(Exception):
         super().__init__(message)
 
 
+ASYNC_CALLBACKS = ("reply_handler", "error_handler")
+
+
 class StreamboxSettingsInterface(dbus.service.Object):
-    def __init__(self, config_manager: ConfigManager, bus):
+    def __init__(self, config_manager: ConfigManager, bus, dispatcher: AsyncDispatcher):
         self.config_manager = config_manager
         self.basic_manager = BasicSettingsManager()
         self.network_manager = NetworkManager()
+        self.storage_manager = StorageManager()
         self.updater_manager = UpdaterManager()
-        self._loop = asyncio.get_event_loop()
+        self._dispatcher = dispatcher
         self._callbacks = {}
+        self.network_manager.add_change_listener(self._on_network_state_change)
+        self.storage_manager.add_change_listener(self._on_storage_change)
+        self.storage_manager.add_job_listener(self._on_storage_job_finished)
+        self.updater_manager.add_status_listener(self._on_updater_status_change)
+        self._metrics_task: Optional[asyncio.Task] = None
+        runner.add_observer(metrics.observe_command)
+        runner.add_observer(trace.record)
         
         super().__init__(bus, "/org/cockpit/StreamboxSettings")
 
     async def _async_init(self):
         await self.basic_manager.initialize()
         await self.network_manager.initialize()
+        await self.storage_manager.initialize()
+        self.network_manager.dhcp_timeout = self.config_manager.get(
+            "network.dhcp_timeout", NetworkManager.DEFAULT_DHCP_TIMEOUT
+        )
+        status_rate = self.config_manager.get("updater.status_rate", 4)
+        if status_rate and status_rate > 0:
+            self.updater_manager.status_interval = 1.0 / status_rate
+        self.updater_manager.streaming = bool(self.config_manager.get("updater.streaming", False))
+        self.updater_manager.swupdate_socket = self.config_manager.get(
+            "updater.swupdate_socket", self.updater_manager.swupdate_socket
+        )
+        self.updater_manager.keep_base = bool(self.config_manager.get("updater.keep_base", True))
+        self.network_manager.start_background_scan(
+            self.config_manager.get("network.wifi_scan.interface", "wlan0"),
+            self.config_manager.get("network.wifi_scan.interval", 0),
+        )
+        textfile = self.config_manager.get("metrics.textfile")
+        if textfile:
+            self._metrics_task = start_background("metrics", self._write_metrics_textfile(
+                textfile, self.config_manager.get("metrics.interval", 60)
+            ))
+
+    async def cleanup(self):
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+        await self.network_manager.cleanup()
+        await self.storage_manager.cleanup()
+
+    async def _write_metrics_textfile(self, path: str, interval: float) -> None:
+        logger.info(f"Writing Prometheus metrics to {path} every {interval}s")
+        while True:
+            try:
+                await asyncio.to_thread(metrics.write_textfile, path)
+            except OSError as e:
+                logger.error(f"Failed to write metrics textfile: {e}")
+            await asyncio.sleep(interval)
 
-    def cleanup(self):
-        pass
+    def _dispatch(self, method: str, coro: Awaitable[Any], reply_handler: Callable,
+                  error_handler: Callable, error_name: str = "OperationFailed") -> None:
+        """Run a handler coroutine off the D-Bus thread and reply when it completes.
+
+        Args:
+            method: D-Bus method name, used for log context.
+            coro: Coroutine producing the method's return value.
+            reply_handler: dbus-python reply callback.
+            error_handler: dbus-python error callback.
+            error_name: Error code reported for unexpected exceptions.
+        """
+        def on_error(e: BaseException) -> None:
+            error_handler(self._to_dbus_error(method, e, error_name))
+
+        self._dispatcher.submit(run_in_method(method, coro), reply_handler, on_error)
+
+    def _to_dbus_error(self, method: str, e: BaseException, error_name: str) -> DBusError:
+        if isinstance(e, DBusError):
+            return e
+        logger.error(f"{method} error: {e}")
+        if isinstance(e, json.JSONDecodeError):
+            return DBusError("InvalidConfig", str(e))
+        return DBusError(error_name, str(e))
+
+    def _emit(self, signal: Callable, *args: Any) -> None:
+        """Emit a D-Bus signal from handler code running on the asyncio thread."""
+        self._dispatcher.call_in_main(signal, *args)
+
+    def _emit_network_changed(self, source: str, interfaces: Optional[Dict[str, Any]] = None) -> None:
+        payload = {"source": source, "interfaces": interfaces or {}}
+        self._emit(self.NetworkConfigChanged, json.dumps(payload))
+
+    def _on_network_state_change(self, interfaces: Dict[str, Any]) -> None:
+        self._emit_network_changed("netlink", interfaces)
+
+    def _on_storage_change(self, filesystems: Dict[str, Any]) -> None:
+        self._emit(self.StorageChanged, json.dumps({"filesystems": filesystems}))
+
+    def _on_storage_job_finished(self, job: StorageJob) -> None:
+        self._emit(self.StorageJobFinished, json.dumps(job.to_dict()))
+
+    def _on_updater_status_change(self, status: Dict[str, Any]) -> None:
+        self._emit(self.UpdaterStatusChanged, json.dumps(status))
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="a{sv}"
+        in_signature="", out_signature="a{sv}",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetBasicSettings(self) -> Dict[str, Any]:
-        try:
-            settings = self._loop.run_until_complete(
-                self.basic_manager.get_basic_settings()
-            )
-            return settings
-        except Exception as e:
-            logger.error(f"GetBasicSettings error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def GetBasicSettings(self, reply_handler, error_handler):
+        self._dispatch(
+            "GetBasicSettings", self.basic_manager.get_basic_settings(),
+            reply_handler, error_handler
+        )
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetHostname(self, hostname: str) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.basic_manager.set_hostname(hostname)
-            )
+    def SetHostname(self, hostname: str, reply_handler, error_handler):
+        async def run():
+            success = await self.basic_manager.set_hostname(hostname)
             if success:
-                self.BasicSettingsChanged()
+                self._emit(self.BasicSettingsChanged)
             return success
-        except Exception as e:
-            logger.error(f"SetHostname error: {e}")
-            raise DBusError("InvalidHostname", str(e))
+
+        self._dispatch("SetHostname", run(), reply_handler, error_handler, "InvalidHostname")
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetTimezone(self, timezone: str) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.basic_manager.set_timezone(timezone)
-            )
+    def SetTimezone(self, timezone: str, reply_handler, error_handler):
+        async def run():
+            success = await self.basic_manager.set_timezone(timezone)
             if success:
-                self.BasicSettingsChanged()
+                self._emit(self.BasicSettingsChanged)
             return success
-        except Exception as e:
-            logger.error(f"SetTimezone error: {e}")
-            raise DBusError("InvalidTimezone", str(e))
+
+        self._dispatch("SetTimezone", run(), reply_handler, error_handler, "InvalidTimezone")
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetLocale(self, locale: str) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.basic_manager.set_locale(locale)
-            )
+    def SetLocale(self, locale: str, reply_handler, error_handler):
+        async def run():
+            success = await self.basic_manager.set_locale(locale)
             if success:
-                self.BasicSettingsChanged()
+                self._emit(self.BasicSettingsChanged)
             return success
-        except Exception as e:
-            logger.error(f"SetLocale error: {e}")
-            raise DBusError("InvalidLocale", str(e))
+
+        self._dispatch("SetLocale", run(), reply_handler, error_handler, "InvalidLocale")
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="as"
+        in_signature="", out_signature="as",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetAvailableTimezones(self) -> List[str]:
-        try:
-            return self._loop.run_until_complete(
-                self.basic_manager.get_available_timezones()
-            )
-        except Exception as e:
-            logger.error(f"GetAvailableTimezones error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def GetAvailableTimezones(self, reply_handler, error_handler):
+        self._dispatch(
+            "GetAvailableTimezones", self.basic_manager.get_available_timezones(),
+            reply_handler, error_handler
+        )
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="as"
+        in_signature="", out_signature="as",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetAvailableLocales(self) -> List[str]:
-        try:
-            return self._loop.run_until_complete(
-                self.basic_manager.get_available_locales()
-            )
-        except Exception as e:
-            logger.error(f"GetAvailableLocales error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def GetAvailableLocales(self, reply_handler, error_handler):
+        self._dispatch(
+            "GetAvailableLocales", self.basic_manager.get_available_locales(),
+            reply_handler, error_handler
+        )
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
@@ -148,218 +229,188 @@ class StreamboxSettingsInterface(dbus.service.Object):
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetConfig(self, config_json: str) -> bool:
-        try:
+    def SetConfig(self, config_json: str, reply_handler, error_handler):
+        async def run():
             config = json.loads(config_json)
             self.config_manager.config = config
-            self._loop.run_until_complete(self.config_manager.save())
-            self.ConfigChanged(config_json)
+            await self.config_manager.save()
+            self._emit(self.ConfigChanged, config_json)
             return True
-        except json.JSONDecodeError as e:
-            logger.error(f"SetConfig error: {e}")
-            raise DBusError("InvalidConfig", str(e))
-        except Exception as e:
-            logger.error(f"SetConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("SetConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="s"
+        in_signature="s", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def ExportConfig(self, profile_name: str) -> str:
-        try:
-            profile = self._loop.run_until_complete(
-                self.config_manager.export_config(profile_name)
-            )
+    def ExportConfig(self, profile_name: str, reply_handler, error_handler):
+        async def run():
+            profile = await self.config_manager.export_config(profile_name)
             return json.dumps(profile, indent=2)
-        except Exception as e:
-            logger.error(f"ExportConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("ExportConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="sb", out_signature="b"
+        in_signature="sb", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def ImportConfig(self, config_json: str, apply: bool) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.config_manager.import_config(config_json, apply)
-            )
+    def ImportConfig(self, config_json: str, apply: bool, reply_handler, error_handler):
+        async def run():
+            success = await self.config_manager.import_config(config_json, apply)
             if success and apply:
-                self.ConfigChanged(config_json)
+                self._emit(self.ConfigChanged, config_json)
             return success
-        except Exception as e:
-            logger.error(f"ImportConfig error: {e}")
-            raise DBusError("InvalidConfig", str(e))
+
+        self._dispatch("ImportConfig", run(), reply_handler, error_handler, "InvalidConfig")
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="as"
+        in_signature="", out_signature="as",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetProfiles(self) -> List[str]:
-        try:
-            return self._loop.run_until_complete(
-                self.config_manager.list_profiles()
-            )
-        except Exception as e:
-            logger.error(f"GetProfiles error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def GetProfiles(self, reply_handler, error_handler):
+        self._dispatch(
+            "GetProfiles", self.config_manager.list_profiles(),
+            reply_handler, error_handler
+        )
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def LoadProfile(self, profile_name: str) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.config_manager.load_profile(profile_name)
-            )
+    def LoadProfile(self, profile_name: str, reply_handler, error_handler):
+        async def run():
+            success = await self.config_manager.load_profile(profile_name)
             if success:
-                self.ConfigChanged(self.GetConfig())
+                self._emit(self.ConfigChanged, json.dumps(self.config_manager.config, indent=2))
             return success
-        except Exception as e:
-            logger.error(f"LoadProfile error: {e}")
-            raise DBusError("ProfileNotFound", str(e))
+
+        self._dispatch("LoadProfile", run(), reply_handler, error_handler, "ProfileNotFound")
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SaveProfile(self, profile_name: str) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.config_manager.save_profile(profile_name)
-            )
-            return success
-        except Exception as e:
-            logger.error(f"SaveProfile error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def SaveProfile(self, profile_name: str, reply_handler, error_handler):
+        self._dispatch(
+            "SaveProfile", self.config_manager.save_profile(profile_name),
+            reply_handler, error_handler
+        )
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def DeleteProfile(self, profile_name: str) -> bool:
-        try:
-            success = self._loop.run_until_complete(
-                self.config_manager.delete_profile(profile_name)
-            )
-            return success
-        except Exception as e:
-            logger.error(f"DeleteProfile error: {e}")
-            raise DBusError("ProfileNotFound", str(e))
+    def DeleteProfile(self, profile_name: str, reply_handler, error_handler):
+        self._dispatch(
+            "DeleteProfile", self.config_manager.delete_profile(profile_name),
+            reply_handler, error_handler, "ProfileNotFound"
+        )
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="s"
+        in_signature="", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetTvserverConfig(self) -> str:
-        try:
-            config = self._loop.run_until_complete(
-                self.config_manager.get_tvserver_config()
-            )
+    def GetTvserverConfig(self, reply_handler, error_handler):
+        async def run():
+            config = await self.config_manager.get_tvserver_config()
             return json.dumps(config, indent=2)
-        except Exception as e:
-            logger.error(f"GetTvserverConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetTvserverConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetTvserverConfig(self, config_json: str) -> bool:
-        try:
+    def SetTvserverConfig(self, config_json: str, reply_handler, error_handler):
+        async def run():
             config = json.loads(config_json)
-            success = self._loop.run_until_complete(
-                self.config_manager.set_tvserver_config(config)
-            )
+            success = await self.config_manager.set_tvserver_config(config)
             if success:
-                self.TvserverConfigChanged(config_json)
+                self._emit(self.TvserverConfigChanged, config_json)
             return success
-        except json.JSONDecodeError as e:
-            logger.error(f"SetTvserverConfig error: {e}")
-            raise DBusError("InvalidConfig", str(e))
-        except Exception as e:
-            logger.error(f"SetTvserverConfig error: {e}")
-            raise DBusError("TvserverConfigError", str(e))
+
+        self._dispatch(
+            "SetTvserverConfig", run(), reply_handler, error_handler, "TvserverConfigError"
+        )
 
     # ==================== Network Methods ====================
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="s"
+        in_signature="", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetNetworkStatus(self) -> str:
+    def GetNetworkStatus(self, reply_handler, error_handler):
         """Get comprehensive network status as JSON."""
-        try:
-            status = self._loop.run_until_complete(
-                self.network_manager.get_network_status()
-            )
+        async def run():
+            status = await self.network_manager.get_network_status()
             return json.dumps(status)
-        except Exception as e:
-            logger.error(f"GetNetworkStatus error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetNetworkStatus", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="s"
+        in_signature="s", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetWiredConfig(self, interface: str) -> str:
+    def GetWiredConfig(self, interface: str, reply_handler, error_handler):
         """Get wired interface configuration as JSON."""
-        try:
-            config = self._loop.run_until_complete(
-                self.network_manager.get_wired_config(interface or "eth0")
-            )
+        async def run():
+            config = await self.network_manager.get_wired_config(interface or "eth0")
             return json.dumps(config)
-        except Exception as e:
-            logger.error(f"GetWiredConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetWiredConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetWiredConfig(self, config_json: str) -> bool:
+    def SetWiredConfig(self, config_json: str, reply_handler, error_handler):
         """Set wired interface configuration from JSON."""
-        try:
+        async def run():
             config = json.loads(config_json)
-            success = self._loop.run_until_complete(
-                self.network_manager.set_wired_config(config)
-            )
+            success = await self.network_manager.set_wired_config(config)
             if success:
-                self.NetworkConfigChanged()
+                self._emit_network_changed("config")
             return success
-        except json.JSONDecodeError as e:
-            logger.error(f"SetWiredConfig error: {e}")
-            raise DBusError("InvalidConfig", str(e))
-        except Exception as e:
-            logger.error(f"SetWiredConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("SetWiredConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="s"
+        in_signature="sd", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def ScanWifiNetworks(self, interface: str) -> str:
-        """Scan for available WiFi networks, returns JSON array."""
-        try:
-            networks = self._loop.run_until_complete(
-                self.network_manager.scan_wifi_networks(interface or "wlan0")
+    def ScanWifiNetworks(self, interface: str, max_age: float, reply_handler, error_handler):
+        """Get WiFi networks seen within max_age seconds, scanning if needed; returns JSON array."""
+        async def run():
+            networks = await self.network_manager.scan_wifi_networks(
+                interface or "wlan0", max(0.0, max_age)
             )
             return json.dumps(networks)
-        except Exception as e:
-            logger.error(f"ScanWifiNetworks error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("ScanWifiNetworks", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def ConnectWifi(self, config_json: str) -> bool:
+    def ConnectWifi(self, config_json: str, reply_handler, error_handler):
         """Connect to a WiFi network. Config includes interface, ssid, password, method, ip_config."""
-        try:
+        async def run():
             config = json.loads(config_json)
             interface = config.get("interface", "wlan0")
             ssid = config.get("ssid", "")
@@ -367,86 +418,71 @@ class StreamboxSettingsInterface(dbus.service.Object):
             method = config.get("method", "dhcp")
             ip_config = config.get("ip_config")
             
-            success = self._loop.run_until_complete(
-                self.network_manager.connect_wifi(ssid, password, interface, method, ip_config)
+            success = await self.network_manager.connect_wifi(
+                ssid, password, interface, method, ip_config
             )
             if success:
-                self.NetworkConfigChanged()
+                self._emit_network_changed("config")
             return success
-        except json.JSONDecodeError as e:
-            logger.error(f"ConnectWifi error: {e}")
-            raise DBusError("InvalidConfig", str(e))
-        except Exception as e:
-            logger.error(f"ConnectWifi error: {e}")
-            raise DBusError("ConnectionFailed", str(e))
+
+        self._dispatch("ConnectWifi", run(), reply_handler, error_handler, "ConnectionFailed")
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="s"
+        in_signature="", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetWifiApConfig(self) -> str:
+    def GetWifiApConfig(self, reply_handler, error_handler):
         """Get WiFi AP configuration as JSON."""
-        try:
-            config = self._loop.run_until_complete(
-                self.network_manager.get_wifi_ap_config()
-            )
+        async def run():
+            config = await self.network_manager.get_wifi_ap_config()
             return json.dumps(config)
-        except Exception as e:
-            logger.error(f"GetWifiApConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetWifiApConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetWifiApConfig(self, config_json: str) -> bool:
+    def SetWifiApConfig(self, config_json: str, reply_handler, error_handler):
         """Set WiFi AP configuration from JSON."""
-        try:
+        async def run():
             config = json.loads(config_json)
-            success = self._loop.run_until_complete(
-                self.network_manager.set_wifi_ap_config(config)
-            )
+            success = await self.network_manager.set_wifi_ap_config(config)
             if success:
-                self.NetworkConfigChanged()
+                self._emit_network_changed("config")
             return success
-        except json.JSONDecodeError as e:
-            logger.error(f"SetWifiApConfig error: {e}")
-            raise DBusError("InvalidConfig", str(e))
-        except Exception as e:
-            logger.error(f"SetWifiApConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("SetWifiApConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="s"
+        in_signature="s", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetWifiClientConfig(self, interface: str) -> str:
+    def GetWifiClientConfig(self, interface: str, reply_handler, error_handler):
         """Get WiFi client configuration as JSON."""
-        try:
-            config = self._loop.run_until_complete(
-                self.network_manager.get_wifi_client_config(interface or "wlan0")
-            )
+        async def run():
+            config = await self.network_manager.get_wifi_client_config(interface or "wlan0")
             return json.dumps(config)
-        except Exception as e:
-            logger.error(f"GetWifiClientConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetWifiClientConfig", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def DisconnectWifi(self, interface: str) -> bool:
+    def DisconnectWifi(self, interface: str, reply_handler, error_handler):
         """Disconnect from WiFi network."""
-        try:
-            success = self._loop.run_until_complete(
-                self.network_manager.disconnect_wifi(interface or "wlan0")
-            )
+        async def run():
+            success = await self.network_manager.disconnect_wifi(interface or "wlan0")
             if success:
-                self.NetworkConfigChanged()
+                self._emit_network_changed("config")
             return success
-        except Exception as e:
-            logger.error(f"DisconnectWifi error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("DisconnectWifi", run(), reply_handler, error_handler)
 
     # ==================== HDMI Loopout Settings ====================
 
@@ -502,246 +538,129 @@ class StreamboxSettingsInterface(dbus.service.Object):
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def SetHdmiConfig(self, config_json: str) -> bool:
+    def SetHdmiConfig(self, config_json: str, reply_handler, error_handler):
         """Set HDMI Loopout configuration to streambox-tv config.json."""
-        try:
-            import subprocess
-            import os
-            
+        async def run():
             config = json.loads(config_json)
-            
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.HDMI_CONFIG_PATH), exist_ok=True)
-            
-            # Write JSON config
-            with open(self.HDMI_CONFIG_PATH, "w") as f:
-                json.dump(config, f, indent=2)
-            
-            logger.info(f"Wrote HDMI config to {self.HDMI_CONFIG_PATH}")
-            
-            # Send SIGHUP to streambox-tv to reload config (it watches the file)
-            # This avoids a full restart and is faster
-            result = subprocess.run(
-                ["pkill", "-HUP", "streambox-tv"],
-                capture_output=True,
-                timeout=5
-            )
-            
-            # If pkill fails (process not running), that's fine
-            success = True
-            self.TvserverConfigChanged(config_json)
-            
+            success = await self._write_hdmi_config(config)
+            self._emit(self.TvserverConfigChanged, config_json)
             return success
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"SetHdmiConfig error: {e}")
-            raise DBusError("InvalidConfig", str(e))
-        except Exception as e:
-            logger.error(f"SetHdmiConfig error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("SetHdmiConfig", run(), reply_handler, error_handler)
+
+    async def _write_hdmi_config(self, config: Dict[str, Any]) -> bool:
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(self.HDMI_CONFIG_PATH), exist_ok=True)
+        
+        # Write JSON config
+        with open(self.HDMI_CONFIG_PATH, "w") as f:
+            json.dump(config, f, indent=2)
+        
+        logger.info(f"Wrote HDMI config to {self.HDMI_CONFIG_PATH}")
+        
+        # Send SIGHUP to streambox-tv to reload config (it watches the file)
+        # This avoids a full restart and is faster
+        await run_command(["pkill", "-HUP", "streambox-tv"], timeout=5)
+        
+        # If pkill fails (process not running), that's fine
+        return True
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="s"
+        in_signature="", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetAudioDevices(self) -> str:
+    def GetAudioDevices(self, reply_handler, error_handler):
         """Get available audio devices using aplay -l and arecord -l."""
-        try:
-            import subprocess
-            
-            devices = {
-                "playback": [],
-                "capture": []
-            }
-            
-            # Get playback devices
-            result = subprocess.run(["aplay", "-l"], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if line.startswith("card "):
-                        # Parse: "card 0: AMLAUGESOUND [AML-AUGESOUND], device 0: ..."
-                        parts = line.split(":")
-                        if len(parts) >= 2:
-                            card_part = parts[0].replace("card ", "")
-                            device_match = line.split("device ")
-                            if len(device_match) >= 2:
-                                device_num = device_match[1].split(":")[0]
-                                name_part = parts[1].split("[")[0].strip() if "[" in parts[1] else parts[1].split(",")[0].strip()
-                                hw_addr = f"hw:{card_part},{device_num}"
-                                devices["playback"].append({
-                                    "address": hw_addr,
-                                    "name": name_part,
-                                    "description": line.strip()
-                                })
-            
-            # Get capture devices
-            result = subprocess.run(["arecord", "-l"], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if line.startswith("card "):
-                        parts = line.split(":")
-                        if len(parts) >= 2:
-                            card_part = parts[0].replace("card ", "")
-                            device_match = line.split("device ")
-                            if len(device_match) >= 2:
-                                device_num = device_match[1].split(":")[0]
-                                name_part = parts[1].split("[")[0].strip() if "[" in parts[1] else parts[1].split(",")[0].strip()
-                                hw_addr = f"hw:{card_part},{device_num}"
-                                devices["capture"].append({
-                                    "address": hw_addr,
-                                    "name": name_part,
-                                    "description": line.strip()
-                                })
-            
+        async def run():
+            devices = await self._list_audio_devices()
             return json.dumps(devices)
-        except Exception as e:
-            logger.error(f"GetAudioDevices error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetAudioDevices", run(), reply_handler, error_handler)
+
+    async def _list_audio_devices(self) -> Dict[str, List[Dict[str, str]]]:
+        playback, capture = await asyncio.gather(
+            run_command(["aplay", "-l"], timeout=5),
+            run_command(["arecord", "-l"], timeout=5),
+        )
+        return {
+            "playback": self._parse_alsa_devices(playback.stdout) if playback.ok else [],
+            "capture": self._parse_alsa_devices(capture.stdout) if capture.ok else [],
+        }
+
+    def _parse_alsa_devices(self, output: str) -> List[Dict[str, str]]:
+        devices = []
+        for line in output.split('\n'):
+            if line.startswith("card "):
+                # Parse: "card 0: AMLAUGESOUND [AML-AUGESOUND], device 0: ..."
+                parts = line.split(":")
+                if len(parts) >= 2:
+                    card_part = parts[0].replace("card ", "")
+                    device_match = line.split("device ")
+                    if len(device_match) >= 2:
+                        device_num = device_match[1].split(":")[0]
+                        name_part = parts[1].split("[")[0].strip() if "[" in parts[1] else parts[1].split(",")[0].strip()
+                        hw_addr = f"hw:{card_part},{device_num}"
+                        devices.append({
+                            "address": hw_addr,
+                            "name": name_part,
+                            "description": line.strip()
+                        })
+        return devices
 
     # ==================== Storage Settings ====================
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="", out_signature="s"
+        in_signature="", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def GetStorageInfo(self) -> str:
-        """Get storage device information using df and lsblk."""
-        try:
-            import subprocess
-            
-            filesystems = []
-            
-            # Get filesystem info from df
-            result = subprocess.run(
-                ["df", "-B1", "--output=source,target,fstype,size,used,avail,pcent"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                for line in lines[1:]:  # Skip header
-                    parts = line.split()
-                    if len(parts) >= 7 and not parts[0].startswith("tmpfs") and not parts[0].startswith("devtmpfs"):
-                        # Get label using lsblk
-                        label = ""
-                        try:
-                            lsblk_result = subprocess.run(
-                                ["lsblk", "-no", "LABEL", parts[0]],
-                                capture_output=True,
-                                text=True,
-                                timeout=5
-                            )
-                            if lsblk_result.returncode == 0:
-                                label = lsblk_result.stdout.strip()
-                        except:
-                            pass
-                        
-                        use_percent = parts[6].replace("%", "")
-                        try:
-                            use_percent = int(use_percent)
-                        except:
-                            use_percent = 0
-                        
-                        filesystems.append({
-                            "device": parts[0],
-                            "mount_point": parts[1],
-                            "fstype": parts[2],
-                            "size": int(parts[3]),
-                            "used": int(parts[4]),
-                            "available": int(parts[5]),
-                            "use_percent": use_percent,
-                            "label": label
-                        })
-            
+    def GetStorageInfo(self, reply_handler, error_handler):
+        """Get storage device information from the cached inventory."""
+        async def run():
+            filesystems = await self.storage_manager.get_filesystems()
             return json.dumps({"filesystems": filesystems})
-        except Exception as e:
-            logger.error(f"GetStorageInfo error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("GetStorageInfo", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="s", out_signature="u",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def MountDevice(self, device: str) -> bool:
-        """Mount a storage device."""
-        try:
-            import subprocess
-            import os
-            
-            # Sanitize device path
-            if not device.startswith("/dev/"):
-                device = "/dev/" + device
-            
-            # Get filesystem label for mount point
-            label = ""
-            try:
-                result = subprocess.run(
-                    ["lsblk", "-no", "LABEL", device],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if result.returncode == 0:
-                    label = result.stdout.strip()
-            except:
-                pass
-            
-            # Create mount point
-            mount_point = f"/media/{label}" if label else f"/media/{os.path.basename(device)}"
-            os.makedirs(mount_point, exist_ok=True)
-            
-            # Mount device
-            result = subprocess.run(
-                ["mount", device, mount_point],
-                capture_output=True,
-                timeout=30
-            )
-            
-            success = result.returncode == 0
-            if success:
-                logger.info(f"Mounted {device} at {mount_point}")
-            else:
-                logger.error(f"Mount failed: {result.stderr.decode()}")
-            
-            return success
-        except Exception as e:
-            logger.error(f"MountDevice error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def MountDevice(self, device: str, reply_handler, error_handler):
+        """Queue a mount and return its job id; StorageJobFinished reports the outcome."""
+        async def run():
+            return self.storage_manager.start_mount(device).id
+
+        self._dispatch("MountDevice", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="s", out_signature="b"
+        in_signature="sbb", out_signature="u",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def UnmountDevice(self, device: str) -> bool:
-        """Unmount a storage device."""
-        try:
-            import subprocess
-            
-            # Sanitize device path
-            if not device.startswith("/dev/"):
-                device = "/dev/" + device
-            
-            # Unmount device
-            result = subprocess.run(
-                ["umount", device],
-                capture_output=True,
-                timeout=30
-            )
-            
-            success = result.returncode == 0
-            if success:
-                logger.info(f"Unmounted {device}")
-            else:
-                logger.error(f"Unmount failed: {result.stderr.decode()}")
-            
-            return success
-        except Exception as e:
-            logger.error(f"UnmountDevice error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def UnmountDevice(self, device: str, lazy: bool, sync: bool, reply_handler, error_handler):
+        """Queue an unmount and return its job id; StorageJobFinished reports the outcome."""
+        async def run():
+            return self.storage_manager.start_unmount(device, lazy=bool(lazy), sync=bool(sync)).id
+
+        self._dispatch("UnmountDevice", run(), reply_handler, error_handler)
+
+    @dbus.service.method(
+        "org.cockpit.StreamboxSettings",
+        in_signature="", out_signature="s",
+        async_callbacks=ASYNC_CALLBACKS
+    )
+    def GetStorageJobs(self, reply_handler, error_handler):
+        """Get queued, running and recently finished mount/unmount jobs."""
+        async def run():
+            return json.dumps(self.storage_manager.get_jobs())
+
+        self._dispatch("GetStorageJobs", run(), reply_handler, error_handler)
 
     # ==================== Updater Methods ====================
 
@@ -758,42 +677,59 @@ class StreamboxSettingsInterface(dbus.service.Object):
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="t", out_signature="b"
+        in_signature="ts", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def StartUpload(self, total_size: int) -> bool:
-        try:
-            success = self.updater_manager.start_upload(total_size)
+    def StartUpload(self, total_size: int, upload_id: str, reply_handler, error_handler):
+        """Start an upload, or continue an unfinished one with the same ``upload_id`` and size."""
+        async def run():
+            # Connecting to swupdate for a streamed upload can block for seconds
+            success = await asyncio.to_thread(
+                self.updater_manager.start_upload, int(total_size), upload_id=str(upload_id))
             if not success:
                 raise DBusError("UploadBusy", "Upload already in progress or invalid state")
-            self.UpdaterStatusChanged()
             return success
-        except DBusError:
-            raise
-        except Exception as e:
-            logger.error(f"StartUpload error: {e}")
-            raise DBusError("OperationFailed", str(e))
+
+        self._dispatch("StartUpload", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
-        in_signature="ayt", out_signature="d"
+        in_signature="ts", out_signature="b",
+        async_callbacks=ASYNC_CALLBACKS
     )
-    def UploadChunk(self, data: bytes, offset: int) -> float:
-        try:
-            progress = self.updater_manager.write_chunk(data, offset)
-            return progress
-        except Exception as e:
-            logger.error(f"UploadChunk error: {e}")
-            raise DBusError("OperationFailed", str(e))
+    def StartDeltaUpload(self, total_size: int, upload_id: str, reply_handler, error_handler):
+        """Start the upload of a delta against the package kept as base_version."""
+        async def run():
+            # Waits on the manager lock, which a StartUpload may hold while connecting
+            success = await asyncio.to_thread(
+                self.updater_manager.start_upload, int(total_size), delta=True, upload_id=str(upload_id))
+            if not success:
+                message = self.updater_manager.error_message or "Upload already in progress or invalid state"
+                raise DBusError("UploadBusy", message)
+            return success
+
+        self._dispatch("StartDeltaUpload", run(), reply_handler, error_handler)
+
+    @dbus.service.method(
+        "org.cockpit.StreamboxSettings",
+        in_signature="ayt", out_signature="d",
+        async_callbacks=ASYNC_CALLBACKS, byte_arrays=True
+    )
+    def UploadChunk(self, data: bytes, offset: int, reply_handler, error_handler):
+        """Write one chunk at ``offset``; clients may keep several chunks in flight."""
+        async def run():
+            return await asyncio.to_thread(self.updater_manager.write_chunk, data, int(offset))
+
+        self._dispatch("UploadChunk", run(), reply_handler, error_handler)
 
     @dbus.service.method(
         "org.cockpit.StreamboxSettings",
         in_signature="s", out_signature="b"
     )
     def FinalizeUpload(self, expected_sha256: str) -> bool:
+        """Start verifying the upload; the result arrives as the READY or ERROR state."""
         try:
-            success = self.updater_manager.finalize_upload(expected_sha256)
-            self.UpdaterStatusChanged()
-            return success
+            return self.updater_manager.finalize_upload(expected_sha256, background=True)
         except Exception as e:
             logger.error(f"FinalizeUpload error: {e}")
             raise DBusError("OperationFailed", str(e))
@@ -804,10 +740,7 @@ class StreamboxSettingsInterface(dbus.service.Object):
     )
     def TriggerUpdate(self) -> bool:
         try:
-            success = self.updater_manager.trigger_update()
-            if success:
-                self.UpdaterStatusChanged()
-            return success
+            return self.updater_manager.trigger_update()
         except Exception as e:
             logger.error(f"TriggerUpdate error: {e}")
             raise DBusError("OperationFailed", str(e))
@@ -818,9 +751,7 @@ class StreamboxSettingsInterface(dbus.service.Object):
     )
     def CancelUpload(self) -> bool:
         try:
-            success = self.updater_manager.cancel_upload()
-            self.UpdaterStatusChanged()
-            return success
+            return self.updater_manager.cancel_upload()
         except Exception as e:
             logger.error(f"CancelUpload error: {e}")
             raise DBusError("OperationFailed", str(e))
@@ -832,7 +763,6 @@ class StreamboxSettingsInterface(dbus.service.Object):
     def SetDryRun(self, enabled: bool) -> bool:
         try:
             self.updater_manager.set_dry_run(enabled)
-            self.UpdaterStatusChanged()
             return True
         except Exception as e:
             logger.error(f"SetDryRun error: {e}")
@@ -843,14 +773,31 @@ class StreamboxSettingsInterface(dbus.service.Object):
         in_signature="ss", out_signature="b"
     )
     def ImportLocalFile(self, filepath: str, expected_sha256: str) -> bool:
+        """Start verifying a package on the device; the result arrives as the READY or ERROR state."""
         try:
-            success = self.updater_manager.import_local_file(filepath, expected_sha256)
-            self.UpdaterStatusChanged()
-            return success
+            return self.updater_manager.import_local_file(filepath, expected_sha256, background=True)
         except Exception as e:
             logger.error(f"ImportLocalFile error: {e}")
             raise DBusError("OperationFailed", str(e))
 
+    # ==================== Diagnostics Methods ====================
+
+    @dbus.service.method(
+        "org.cockpit.StreamboxSettings",
+        in_signature="", out_signature="s"
+    )
+    def GetMetrics(self) -> str:
+        """Per-method call counts and latency quantiles plus per-command child process time, as JSON."""
+        return json.dumps(metrics.snapshot())
+
+    @dbus.service.method(
+        "org.cockpit.StreamboxSettings",
+        in_signature="u", out_signature="s"
+    )
+    def GetCommandTrace(self, limit: int) -> str:
+        """Most recent child process runs, oldest first, as a JSON array (limit 0 returns all)."""
+        return json.dumps(trace.entries(int(limit)))
+
     @dbus.service.signal("org.cockpit.StreamboxSettings")
     def BasicSettingsChanged(self):
         pass
@@ -863,13 +810,30 @@ class StreamboxSettingsInterface(dbus.service.Object):
     def TvserverConfigChanged(self, config_json: str):
         pass
 
-    @dbus.service.signal("org.cockpit.StreamboxSettings")
-    def NetworkConfigChanged(self):
-        """Signal emitted when network configuration changes."""
+    @dbus.service.signal("org.cockpit.StreamboxSettings", signature="s")
+    def NetworkConfigChanged(self, changes_json: str):
+        """Signal emitted when network configuration or interface state changes."""
         pass
 
-    @dbus.service.signal("org.cockpit.StreamboxSettings")
-    def UpdaterStatusChanged(self):
-        """Signal emitted when updater state changes."""
+    @dbus.service.signal("org.cockpit.StreamboxSettings", signature="s")
+    def StorageChanged(self, changes_json: str):
+        """Signal emitted when block devices or mounts change."""
         pass
 
+    @dbus.service.signal("org.cockpit.StreamboxSettings", signature="s")
+    def StorageJobFinished(self, job_json: str):
+        """Signal emitted when a mount or unmount job has finished."""
+        pass
+
+    @dbus.service.signal("org.cockpit.StreamboxSettings", signature="s")
+    def UpdaterStatusChanged(self, status_json: str):
+        """Signal emitted with the GetUpdaterStatus JSON when the updater status changes."""
+        pass
+
+
+# Time every exported method, whether it replies inline or through callbacks
+instrument_methods(
+    StreamboxSettingsInterface, metrics,
+    is_method=lambda func: getattr(func, "_dbus_is_method", False),
+    callbacks=ASYNC_CALLBACKS,
+)
@@ -2,15 +2,39 @@
 
 import asyncio
 import logging
-import subprocess
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from catalog import CachedCatalog
+from command import run_command
+from tzcatalog import load_timezones
 
 logger = logging.getLogger(__name__)
 
 
+FALLBACK_TIMEZONES = ["UTC"]
+FALLBACK_LOCALES = ["en_US.utf8", "en_US.UTF-8", "C.utf8", "C.UTF-8", "en_GB.utf8", "zh_CN.utf8", "zh_TW.utf8", "ja_JP.utf8", "ko_KR.utf8", "de_DE.utf8", "fr_FR.utf8", "es_ES.utf8"]
+
+
 class BasicSettingsManager:
+    HOSTNAME_FILE = Path("/etc/hostname")
+    LOCALE_CONF_FILE = Path("/etc/locale.conf")
+    ZONEINFO_DIR = Path("/usr/share/zoneinfo")
+    LOCALE_DIR = Path("/usr/lib/locale")
+
     def __init__(self):
         self._initialized = False
+        self._timezones = CachedCatalog(
+            "timezone", lambda: self._load_timezones(),
+            [self.ZONEINFO_DIR, self.ZONEINFO_DIR / "tzdata.zi",
+             self.ZONEINFO_DIR / "zone1970.tab"],
+            FALLBACK_TIMEZONES,
+        )
+        self._locales = CachedCatalog(
+            "locale", lambda: self._load_locales(),
+            [self.LOCALE_DIR, self.LOCALE_DIR / "locale-archive"],
+            FALLBACK_LOCALES,
+        )
 
     async def initialize(self):
         if self._initialized:
@@ -18,27 +42,12 @@ class BasicSettingsManager:
         logger.info("Initializing BasicSettingsManager")
         self._initialized = True
 
-    def _run_command(self, args: List[str]) -> tuple[bool, str]:
-        try:
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            return result.returncode == 0, result.stdout.strip()
-        except subprocess.TimeoutExpired:
-            logger.error(f"Command timeout: {' '.join(args)}")
-            return False, ""
-        except FileNotFoundError:
-            logger.error(f"Command not found: {args[0]}")
-            return False, ""
-        except Exception as e:
-            logger.error(f"Command failed: {e}")
-            return False, ""
+    async def _run_command(self, args: List[str]) -> tuple[bool, str]:
+        result = await run_command(args, timeout=30)
+        return result.ok, result.stdout.strip()
 
     async def get_hostname(self) -> str:
-        success, hostname = self._run_command(["hostnamectl", "--static", "transient"])
+        success, hostname = await self._run_command(["hostnamectl", "--static", "transient"])
         if success:
             return hostname
         return "streambox"
@@ -48,7 +57,7 @@ class BasicSettingsManager:
             logger.error(f"Invalid hostname: {hostname}")
             return False
 
-        success, _ = self._run_command(["hostnamectl", "set-hostname", hostname])
+        success, _ = await self._run_command(["hostnamectl", "set-hostname", hostname])
         if success:
             logger.info(f"Hostname set to: {hostname}")
             return True
@@ -67,18 +76,17 @@ class BasicSettingsManager:
         return all(c in allowed for c in hostname) and not hostname.startswith("-")
 
     async def get_timezone(self) -> str:
-        success, timezone = self._run_command(["timedatectl", "show", "-p", "Timezone", "--value"])
+        success, timezone = await self._run_command(["timedatectl", "show", "-p", "Timezone", "--value"])
         if success:
             return timezone
         return "UTC"
 
     async def set_timezone(self, timezone: str) -> bool:
-        available_timezones = await self.get_available_timezones()
-        if timezone not in available_timezones:
+        if not await self._timezones.contains(timezone):
             logger.error(f"Invalid timezone: {timezone}")
             return False
 
-        success, _ = self._run_command(["timedatectl", "set-timezone", timezone])
+        success, _ = await self._run_command(["timedatectl", "set-timezone", timezone])
         if success:
             logger.info(f"Timezone set to: {timezone}")
             return True
@@ -87,13 +95,13 @@ class BasicSettingsManager:
         return False
 
     async def get_available_timezones(self) -> List[str]:
-        success, output = self._run_command(["timedatectl", "list-timezones"])
-        if success:
-            return output.split("\n")
-        return ["UTC"]
+        return await self._timezones.list()
+
+    async def _load_timezones(self) -> Optional[List[str]]:
+        return await asyncio.to_thread(load_timezones, self.ZONEINFO_DIR)
 
     async def get_locale(self) -> str:
-        success, output = self._run_command(["localectl", "status", "--no-pager"])
+        success, output = await self._run_command(["localectl", "status", "--no-pager"])
         if success:
             for line in output.split("\n"):
                 if line.strip().startswith("LANG="):
@@ -101,12 +109,11 @@ class BasicSettingsManager:
         return "en_US.UTF-8"
 
     async def set_locale(self, locale: str) -> bool:
-        available_locales = await self.get_available_locales()
-        if locale not in available_locales:
+        if not await self._locales.contains(locale):
             logger.error(f"Invalid locale: {locale}")
             return False
 
-        success, _ = self._run_command(["localectl", "set-locale", f"LANG={locale}"])
+        success, _ = await self._run_command(["localectl", "set-locale", f"LANG={locale}"])
         if success:
             logger.info(f"Locale set to: {locale}")
             return True
@@ -115,7 +122,10 @@ class BasicSettingsManager:
         return False
 
     async def get_available_locales(self) -> List[str]:
-        success, output = self._run_command(["locale", "-a"])
+        return await self._locales.list()
+
+    async def _load_locales(self) -> Optional[List[str]]:
+        success, output = await self._run_command(["locale", "-a"])
         if success and output:
             locales = []
             for line in output.split("\n"):
@@ -123,22 +133,22 @@ class BasicSettingsManager:
                     locales.append(line.strip())
             
             if locales:
-                return sorted(list(set(locales)))
+                return locales
         
-        logger.warning("Failed to get locales from system, using fallback list")
-        return ["en_US.utf8", "en_US.UTF-8", "C.utf8", "C.UTF-8", "en_GB.utf8", "zh_CN.utf8", "zh_TW.utf8", "ja_JP.utf8", "ko_KR.utf8", "de_DE.utf8", "fr_FR.utf8", "es_ES.utf8"]
+        logger.warning("Failed to get locales from system")
+        return None
 
     async def get_ntp_server(self) -> str:
-        success, output = self._run_command(["timedatectl", "show", "-p", "NTP", "--value"])
+        success, output = await self._run_command(["timedatectl", "show", "-p", "NTP", "--value"])
         if success:
             return "yes" if output == "yes" else "no"
         return "yes"
 
     async def set_ntp_server(self, ntp_server: str) -> bool:
         if ntp_server == "yes" or ntp_server:
-            success, _ = self._run_command(["timedatectl", "set-ntp", "true"])
+            success, _ = await self._run_command(["timedatectl", "set-ntp", "true"])
         else:
-            success, _ = self._run_command(["timedatectl", "set-ntp", "false"])
+            success, _ = await self._run_command(["timedatectl", "set-ntp", "false"])
 
         if success:
             logger.info(f"NTP set to: {ntp_server}")
@@ -147,22 +157,56 @@ class BasicSettingsManager:
         logger.error(f"Failed to set NTP: {ntp_server}")
         return False
 
+    async def _read_hostname(self) -> str:
+        """Read the static hostname from /etc/hostname, falling back to hostnamectl."""
+        try:
+            hostname = self.HOSTNAME_FILE.read_text().strip()
+            if hostname:
+                return hostname
+        except OSError:
+            pass
+        return await self.get_hostname()
+
+    async def _read_locale(self) -> str:
+        """Read LANG from /etc/locale.conf, falling back to localectl."""
+        try:
+            for line in self.LOCALE_CONF_FILE.read_text().split("\n"):
+                line = line.strip()
+                if line.startswith("LANG="):
+                    return line.split("=", 1)[1].strip().strip('"')
+        except OSError:
+            pass
+        return await self.get_locale()
+
+    async def _get_time_settings(self) -> Tuple[str, str]:
+        """Read timezone and NTP state with a single timedatectl call."""
+        success, output = await self._run_command(
+            ["timedatectl", "show", "-p", "Timezone", "-p", "NTP"]
+        )
+        props = {}
+        if success:
+            for line in output.split("\n"):
+                if "=" in line:
+                    key, value = line.split("=", 1)
+                    props[key.strip()] = value.strip()
+        timezone = props.get("Timezone") or "UTC"
+        ntp = props.get("NTP")
+        ntp_server = "yes" if ntp is None or ntp == "yes" else "no"
+        return timezone, ntp_server
+
     async def get_basic_settings(self) -> Dict[str, str]:
-        settings = {}
-        
-        hostname = await self.get_hostname()
-        settings["hostname"] = hostname
-        
-        timezone = await self.get_timezone()
-        settings["timezone"] = timezone
-        
-        locale = await self.get_locale()
-        settings["locale"] = locale
-        
-        ntp_server = await self.get_ntp_server()
-        settings["ntp_server"] = ntp_server
+        hostname, locale, (timezone, ntp_server) = await asyncio.gather(
+            self._read_hostname(),
+            self._read_locale(),
+            self._get_time_settings(),
+        )
         
-        return settings
+        return {
+            "hostname": hostname,
+            "timezone": timezone,
+            "locale": locale,
+            "ntp_server": ntp_server,
+        }
 
     async def set_basic_settings(self, settings: Dict[str, str]) -> bool:
         success = True
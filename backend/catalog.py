@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Optional[Iterable[str]]]]
+
+
+class CachedCatalog:
+    """In-memory catalog of names (timezones, locales) with mtime invalidation.
+
+    The catalog is built once by ``loader`` and kept as a frozenset for O(1)
+    membership checks plus a sorted tuple for listing. Every access stats
+    ``watch_paths``; when any mtime changes (or a path appears or vanishes)
+    the catalog is rebuilt on the next access. Concurrent rebuilds are
+    coalesced into one.
+    """
+
+    def __init__(self, name: str, loader: Loader, watch_paths: Sequence[Path],
+                 fallback: Iterable[str] = ()):
+        """Create a catalog.
+
+        Args:
+            name: Name used in log messages.
+            loader: Coroutine returning the catalog entries, or None when the
+                source is unavailable. A None result is not cached.
+            watch_paths: Files or directories whose mtimes invalidate the cache.
+            fallback: Entries served when the loader returns None.
+        """
+        self._name = name
+        self._loader = loader
+        self._watch_paths = list(watch_paths)
+        self._fallback = frozenset(fallback)
+        self._items: Optional[FrozenSet[str]] = None
+        self._sorted: Tuple[str, ...] = ()
+        self._signature: Optional[Tuple] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _stat_signature(self) -> Tuple:
+        signature = []
+        for path in self._watch_paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def invalidate(self) -> None:
+        """Drop the cached entries; the next access rebuilds them."""
+        self._items = None
+        self._signature = None
+
+    async def _ensure(self) -> FrozenSet[str]:
+        signature = self._stat_signature()
+        if self._items is not None and signature == self._signature:
+            return self._items
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._items is not None and signature == self._signature:
+                return self._items
+
+            entries = await self._loader()
+            if entries is None:
+                logger.warning(f"{self._name} catalog unavailable, using fallback list")
+                return self._fallback
+
+            items = frozenset(e for e in entries if e)
+            self._items = items
+            self._sorted = tuple(sorted(items))
+            self._signature = signature
+            logger.info(f"Loaded {self._name} catalog: {len(items)} entries")
+            return items
+
+    async def contains(self, name: str) -> bool:
+        """Return True if ``name`` is in the catalog."""
+        return name in await self._ensure()
+
+    async def list(self) -> List[str]:
+        """Return the catalog entries in sorted order."""
+        items = await self._ensure()
+        if items is self._fallback:
+            return sorted(items)
+        return list(self._sorted)
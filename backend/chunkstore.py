@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from digest import Sha256
+
+logger = logging.getLogger(__name__)
+
+HASH_READ_SIZE = 4 * 1024 * 1024
+
+
+class RangeSet:
+    """Sorted, merged set of half-open byte ranges [start, end)."""
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = ()):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        for start, end in ranges:
+            self.add(start, end)
+
+    def add(self, start: int, end: int) -> int:
+        """Add [start, end) and return how many of its bytes were new."""
+        if end <= start:
+            return 0
+        # Ranges overlapping or touching [start, end) are merged into it
+        lo = bisect.bisect_left(self._ends, start)
+        hi = bisect.bisect_right(self._starts, end)
+        overlap = sum(min(e, end) - max(s, start)
+                      for s, e in zip(self._starts[lo:hi], self._ends[lo:hi]))
+        new = end - start - overlap
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+        return new
+
+    @property
+    def total(self) -> int:
+        return sum(e - s for s, e in zip(self._starts, self._ends))
+
+    def prefix_end(self) -> int:
+        """End of the range starting at 0, or 0 if byte 0 is missing."""
+        return self._ends[0] if self._starts and self._starts[0] == 0 else 0
+
+    def missing(self, size: int) -> List[Tuple[int, int]]:
+        """Return the ranges of [0, size) that are not in the set."""
+        gaps = []
+        pos = 0
+        for start, end in zip(self._starts, self._ends):
+            if pos >= size:
+                break
+            if start > pos:
+                gaps.append((pos, min(start, size)))
+            pos = max(pos, end)
+        if pos < size:
+            gaps.append((pos, size))
+        return gaps
+
+    def to_list(self) -> List[List[int]]:
+        return [[s, e] for s, e in zip(self._starts, self._ends)]
+
+
+class ChunkStore:
+    """Sparse part file that accepts chunks at any offset, in any order.
+
+    The file is opened once and sized with ftruncate, so unwritten regions
+    are holes rather than zeroes written from memory; chunks land with
+    pwrite. The byte ranges received are saved to ``<part>.ranges`` after
+    every chunk, so an upload interrupted by a daemon restart resumes
+    where it stopped. The ``upload_id`` chosen by the client and whether
+    the upload is a ``delta`` are saved with them, so only the same file
+    resumes, as the same kind of upload. The SHA-256 follows file order: chunks that extend
+    the received prefix are hashed as they arrive, and bytes that arrived
+    ahead of a gap are read back once the gap is filled.
+
+    ``write`` may be called from several threads at once. The pwrite runs
+    unlocked; the lock only covers the range bookkeeping. Saving the state
+    and hashing are each done by one thread at a time, and a thread that
+    finds either busy leaves its update to the one already at work.
+    """
+
+    def __init__(self, path: Path, total_size: int, fd: int,
+                 ranges: Iterable[Tuple[int, int]] = (), upload_id: str = "", delta: bool = False):
+        self.path = Path(path)
+        self.total_size = total_size
+        self.upload_id = upload_id
+        self.delta = delta
+        self.ranges = RangeSet(ranges)
+        self._fd: Optional[int] = fd
+        self._sha256 = Sha256()
+        self._hashed = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._writers = 0
+        self._version = 0
+        self._saved_version = -1
+        self._save_lock = threading.Lock()
+        self._hash_lock = threading.Lock()
+
+    @staticmethod
+    def state_path(path: Path) -> Path:
+        return Path(path).with_name(Path(path).name + ".ranges")
+
+    @classmethod
+    def create(cls, path: Path, total_size: int, upload_id: str = "", delta: bool = False) -> "ChunkStore":
+        """Start a new part file of ``total_size`` bytes, replacing any old one."""
+        cls.state_path(path).unlink(missing_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, total_size)
+        except OSError:
+            os.close(fd)
+            raise
+        store = cls(path, total_size, fd, upload_id=upload_id, delta=delta)
+        store._save()
+        return store
+
+    @classmethod
+    def resume(cls, path: Path) -> Optional["ChunkStore"]:
+        """Reopen an interrupted upload, or return None if there is none."""
+        state_path = cls.state_path(path)
+        try:
+            state = json.loads(state_path.read_text())
+            total_size = int(state["total_size"])
+            ranges = [(int(s), int(e)) for s, e in state["ranges"]]
+            upload_id = str(state.get("upload_id", ""))
+            delta = bool(state.get("delta", False))
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Discarding unreadable upload state {state_path}: {e}")
+            return None
+        if os.fstat(fd).st_size != total_size:
+            logger.warning(f"Discarding upload state: {path} is not {total_size} bytes")
+            os.close(fd)
+            return None
+        return cls(path, total_size, fd, ranges, upload_id, delta)
+
+    @property
+    def received(self) -> int:
+        with self._lock:
+            return self.ranges.total
+
+    @property
+    def complete(self) -> bool:
+        return self.received == self.total_size
+
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        with self._lock:
+            return self.ranges.missing(self.total_size)
+
+    def write(self, data: bytes, offset: int) -> int:
+        """Store one chunk and return how many of its bytes were new.
+
+        Raises:
+            ValueError: If the chunk lies outside the file or the store is closed.
+        """
+        end = offset + len(data)
+        if offset < 0 or end > self.total_size:
+            raise ValueError(f"Chunk [{offset}, {end}) outside upload of {self.total_size} bytes")
+        with self._lock:
+            fd = self._fd
+            if fd is None:
+                raise ValueError("Upload file is closed")
+            self._writers += 1
+        try:
+            view = memoryview(data)
+            written = 0
+            while written < len(view):
+                written += os.pwrite(fd, view[written:], offset + written)
+            with self._lock:
+                new = self.ranges.add(offset, end)
+                self._version += 1
+            self._save()
+            self._hash_received(fd, view, offset)
+            return new
+        finally:
+            with self._lock:
+                self._writers -= 1
+                if not self._writers:
+                    self._idle.notify_all()
+
+    def _prefix_end(self) -> int:
+        with self._lock:
+            return self.ranges.prefix_end()
+
+    def _hash_received(self, fd: int, view: memoryview, offset: int) -> None:
+        # One thread hashes at a time; the others leave their bytes to it
+        while self._hashed < self._prefix_end() and self._hash_lock.acquire(blocking=False):
+            try:
+                if offset <= self._hashed < offset + len(view):
+                    self._sha256.update(view[self._hashed - offset:])
+                    self._hashed = offset + len(view)
+                self._hash_prefix(fd)
+            finally:
+                self._hash_lock.release()
+
+    def _hash_prefix(self, fd: int, progress: Optional[Callable[[int], None]] = None) -> None:
+        # Catch up with bytes that arrived before the gap in front of them was filled
+        limit = self._prefix_end()
+        while self._hashed < limit:
+            chunk = os.pread(fd, min(HASH_READ_SIZE, limit - self._hashed), self._hashed)
+            if not chunk:
+                break
+            self._sha256.update(chunk)
+            self._hashed += len(chunk)
+            if progress is not None:
+                progress(self._hashed)
+
+    def sha256_hexdigest(self, progress: Optional[Callable[[int], None]] = None) -> str:
+        """Return the digest of the whole file; call once the upload is complete.
+
+        ``progress`` is called with the bytes hashed so far as the remaining
+        read-back proceeds; an exception it raises aborts the hash.
+        """
+        with self._hash_lock:
+            if progress is not None:
+                progress(self._hashed)
+            self._hash_prefix(self._fd, progress)
+            return self._sha256.hexdigest()
+
+    def hash_stats(self) -> Dict[str, Any]:
+        """Backend and throughput of the hashing done so far."""
+        return self._sha256.stats()
+
+    def _save(self) -> None:
+        # Saves queue up; one that waited often finds its ranges already written
+        with self._save_lock:
+            with self._lock:
+                if self._saved_version == self._version:
+                    return
+                version = self._version
+                state = {"total_size": self.total_size, "upload_id": self.upload_id,
+                         "delta": self.delta, "ranges": self.ranges.to_list()}
+            state_path = self.state_path(self.path)
+            tmp = state_path.with_name(f".{state_path.name}.tmp")
+            tmp.write_text(json.dumps(state))
+            os.replace(tmp, state_path)
+            self._saved_version = version
+
+    def close(self) -> None:
+        """Close the file and the hash and forget the ranges; the part file itself stays.
+
+        Waits for writes already in progress; later ones raise ValueError.
+        """
+        with self._lock:
+            fd, self._fd = self._fd, None
+            while self._writers:
+                self._idle.wait()
+        if fd is not None:
+            os.close(fd)
+        with self._hash_lock:
+            self._sha256.close()
+        self.state_path(self.path).unlink(missing_ok=True)
+
+    def discard(self) -> None:
+        """Close and delete the part file."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Child process trace for the settings daemon.
+
+Every command run through the shared runner is recorded in a bounded ring
+buffer together with the D-Bus method that caused it. Run as a module to
+summarise a trace into the costliest commands:
+
+    python3 -m cmdtrace [--top 10] [--by total|count|max] [--file trace.json]
+
+Without --file the trace is fetched from the running daemon over D-Bus.
+"""
+
+import argparse
+import asyncio
+import collections
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Deque, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 1024
+
+T = TypeVar("T")
+
+# D-Bus method whose handler is running in the current task
+current_method: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "current_method", default=None
+)
+
+
+async def run_in_method(method: str, coro: Awaitable[T]) -> T:
+    """Await coro with current_method set, so commands it runs are attributed to method."""
+    current_method.set(method)
+    return await coro
+
+
+def start_background(name: str, coro: Awaitable[T]) -> "asyncio.Future[T]":
+    """Start a long-lived task whose commands are traced as "background:<name>".
+
+    Tasks copy the context they are created in, so without this a task
+    started from a D-Bus handler would charge everything it runs to that
+    method.
+    """
+    return asyncio.ensure_future(run_in_method(f"background:{name}", coro))
+
+
+@dataclass
+class TraceRecord:
+    timestamp: float
+    program: str
+    duration: float
+    returncode: int
+    stdout_bytes: int
+    timed_out: bool
+    method: Optional[str]
+
+
+class CommandTrace:
+    """Ring buffer of the most recent commands, fed as a CommandRunner observer."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._records: Deque[TraceRecord] = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, result: Any) -> None:
+        entry = TraceRecord(
+            timestamp=time.time(),
+            program=os.path.basename(result.args[0]) if result.args else "?",
+            duration=result.duration,
+            returncode=result.returncode,
+            stdout_bytes=result.stdout_bytes,
+            timed_out=result.timed_out,
+            method=current_method.get(),
+        )
+        with self._lock:
+            self._records.append(entry)
+
+    def entries(self, limit: int = 0) -> List[Dict[str, Any]]:
+        """Return the newest ``limit`` records (all if 0), oldest first."""
+        with self._lock:
+            records = list(self._records)
+        if limit:
+            records = records[-limit:]
+        return [asdict(r) for r in records]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+trace = CommandTrace()
+
+
+def summarize(entries: List[Dict[str, Any]], top: int = 10, by: str = "total") -> List[Dict[str, Any]]:
+    """Aggregate trace entries per program and return the top ones.
+
+    Args:
+        entries: Records as returned by CommandTrace.entries().
+        top: Number of programs to return.
+        by: Sort key: "total" (summed duration), "count" or "max".
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        group = groups.setdefault(entry["program"], {
+            "program": entry["program"], "count": 0, "total": 0.0, "max": 0.0,
+            "failures": 0, "stdout_bytes": 0, "methods": collections.Counter(),
+        })
+        group["count"] += 1
+        group["total"] += entry["duration"]
+        group["max"] = max(group["max"], entry["duration"])
+        group["stdout_bytes"] += entry["stdout_bytes"]
+        if entry["returncode"] != 0 or entry["timed_out"]:
+            group["failures"] += 1
+        group["methods"][entry["method"] or "-"] += 1
+
+    ranked = sorted(groups.values(), key=lambda g: g[by], reverse=True)[:top]
+    for group in ranked:
+        group["mean"] = group["total"] / group["count"]
+        group["methods"] = [name for name, _ in group["methods"].most_common(3)]
+    return ranked
+
+
+def _load_entries(path: Optional[str]) -> List[Dict[str, Any]]:
+    if path is None:
+        import dbus
+        bus = dbus.SystemBus()
+        proxy = bus.get_object("org.cockpit.StreamboxSettings", "/org/cockpit/StreamboxSettings")
+        return json.loads(proxy.GetCommandTrace(
+            dbus.UInt32(0), dbus_interface="org.cockpit.StreamboxSettings"
+        ))
+
+    text = sys.stdin.read() if path == "-" else open(path).read()
+    data = json.loads(text)
+    # Accept "busctl --json=short call ..." output as well as the raw reply
+    if isinstance(data, dict) and "data" in data:
+        data = json.loads(data["data"][0])
+    return data
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarise the daemon's command trace.")
+    parser.add_argument("--top", type=int, default=10, help="number of commands to show")
+    parser.add_argument("--by", choices=("total", "count", "max"), default="total",
+                        help="ranking key (default: total time)")
+    parser.add_argument("--file", help="read a GetCommandTrace JSON reply from a file, or - for stdin")
+    args = parser.parse_args(argv)
+
+    entries = _load_entries(args.file)
+    print(f"{len(entries)} commands traced")
+    print(f"{'program':<16} {'count':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} "
+          f"{'fail':>5} {'stdout KiB':>10}  methods")
+    for group in summarize(entries, args.top, args.by):
+        print(f"{group['program']:<16} {group['count']:>6} {group['total']:>9.3f} "
+              f"{group['mean'] * 1000:>9.1f} {group['max'] * 1000:>9.1f} "
+              f"{group['failures']:>5} {group['stdout_bytes'] / 1024:>10.1f}  "
+              f"{', '.join(group['methods'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
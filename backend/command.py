@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+@dataclass
+class CommandResult:
+    """Outcome of one child process run."""
+
+    args: List[str]
+    returncode: int
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+    stdout_bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+class CommandRunner:
+    """Runs external commands with asyncio subprocesses.
+
+    Commands never block the event loop, so independent calls overlap.
+    A semaphore bounds how many children run at once, each call has its
+    own timeout, and cancelling the awaiting task kills the child.
+    Observers are called with every CommandResult, including failures.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self._max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._observers: List[Callable[[CommandResult], None]] = []
+
+    def add_observer(self, observer: Callable[[CommandResult], None]) -> None:
+        self._observers.append(observer)
+
+    def _finish(self, result: CommandResult) -> CommandResult:
+        for observer in self._observers:
+            try:
+                observer(result)
+            except Exception as e:
+                logger.error(f"Command observer failed: {e}")
+        return result
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphore
+
+    async def run(
+        self,
+        args: List[str],
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        input: Optional[bytes] = None,
+        cwd: Optional[str] = None,
+    ) -> CommandResult:
+        """Run a command and collect its output.
+
+        Args:
+            args: Program and arguments; never passed through a shell.
+            timeout: Seconds before the child is killed, or None for no limit.
+            input: Optional bytes written to the child's stdin.
+            cwd: Optional working directory.
+
+        Returns:
+            A CommandResult. A missing program yields returncode 127 and a
+            timeout yields returncode -1 with ``timed_out`` set.
+        """
+        async with self._get_semaphore():
+            start = time.monotonic()
+            proc = await self._spawn(args, input is not None, cwd)
+            if proc is None:
+                return self._finish(CommandResult(args, 127, "", f"{args[0]}: not found",
+                                                  time.monotonic() - start))
+
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(input), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Command timeout: {' '.join(args)}")
+                await self._kill(proc)
+                return self._finish(CommandResult(args, -1, "", "", time.monotonic() - start,
+                                                  timed_out=True))
+            except asyncio.CancelledError:
+                await self._kill(proc)
+                raise
+
+            return self._finish(CommandResult(
+                args,
+                proc.returncode,
+                stdout.decode(errors="replace"),
+                stderr.decode(errors="replace"),
+                time.monotonic() - start,
+                stdout_bytes=len(stdout),
+            ))
+
+    async def run_lines(
+        self,
+        args: List[str],
+        on_line: Callable[[str], None],
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        cwd: Optional[str] = None,
+    ) -> CommandResult:
+        """Run a command and hand each stdout line to ``on_line`` as it arrives.
+
+        Stdout is never held in memory as a whole, so large outputs are
+        processed in constant space. Timeouts, cancellation and missing
+        programs behave as in run().
+
+        Returns:
+            A CommandResult whose ``stdout`` is empty.
+        """
+        async with self._get_semaphore():
+            start = time.monotonic()
+            proc = await self._spawn(args, False, cwd)
+            if proc is None:
+                return self._finish(CommandResult(args, 127, "", f"{args[0]}: not found",
+                                                  time.monotonic() - start))
+
+            stdout_bytes = 0
+
+            async def pump() -> bytes:
+                nonlocal stdout_bytes
+                stderr_task = asyncio.ensure_future(proc.stderr.read())
+                try:
+                    async for raw in proc.stdout:
+                        stdout_bytes += len(raw)
+                        on_line(raw.decode(errors="replace").rstrip("\n"))
+                    stderr = await stderr_task
+                finally:
+                    stderr_task.cancel()
+                await proc.wait()
+                return stderr
+
+            try:
+                stderr = await asyncio.wait_for(pump(), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Command timeout: {' '.join(args)}")
+                await self._kill(proc)
+                return self._finish(CommandResult(args, -1, "", "", time.monotonic() - start,
+                                                  timed_out=True))
+            except asyncio.CancelledError:
+                await self._kill(proc)
+                raise
+
+            return self._finish(CommandResult(args, proc.returncode, "",
+                                              stderr.decode(errors="replace"),
+                                              time.monotonic() - start,
+                                              stdout_bytes=stdout_bytes))
+
+    @staticmethod
+    async def _spawn(args: List[str], with_stdin: bool,
+                     cwd: Optional[str]) -> Optional[asyncio.subprocess.Process]:
+        try:
+            return await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if with_stdin else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+            )
+        except FileNotFoundError:
+            logger.error(f"Command not found: {args[0]}")
+            return None
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process) -> None:
+        if proc.returncode is not None:
+            return
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            return
+        await proc.wait()
+
+
+runner = CommandRunner()
+
+
+async def run_command(
+    args: List[str],
+    timeout: Optional[float] = DEFAULT_TIMEOUT,
+    input: Optional[bytes] = None,
+    cwd: Optional[str] = None,
+) -> CommandResult:
+    """Run a command on the shared daemon-wide runner."""
+    return await runner.run(args, timeout=timeout, input=input, cwd=cwd)
+
+
+async def run_command_lines(
+    args: List[str],
+    on_line: Callable[[str], None],
+    timeout: Optional[float] = DEFAULT_TIMEOUT,
+) -> CommandResult:
+    """Stream a command's stdout line by line on the shared runner."""
+    return await runner.run_lines(args, on_line, timeout=timeout)
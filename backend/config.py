@@ -53,7 +53,22 @@ class ConfigManager:
                 "ip_address": "192.168.4.1",
                 "ip_range_start": "192.168.4.100",
                 "ip_range_end": "192.168.4.200"
-            }
+            },
+            "wifi_scan": {
+                "interface": "wlan0",
+                "interval": 0
+            },
+            "dhcp_timeout": 30
+        },
+        "metrics": {
+            "textfile": None,
+            "interval": 60
+        },
+        "updater": {
+            "status_rate": 4,
+            "streaming": False,
+            "swupdate_socket": "/tmp/sockinstctrl",
+            "keep_base": True
         }
     }
 
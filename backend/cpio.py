@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import logging
+import mmap
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# swupdate images are cpio archives in the "new ASCII" format, with or
+# without the checksum field filled in
+NEWC_MAGICS = (b"070701", b"070702")
+HEADER_SIZE = 110
+TRAILER = "TRAILER!!!"
+
+
+class CpioError(Exception):
+    pass
+
+
+@dataclass
+class CpioEntry:
+    name: str
+    mode: int
+    size: int
+    offset: int  # archive offset of the file data
+
+
+def _pad4(n: int) -> int:
+    return -n % 4
+
+
+def parse_header(header: bytes) -> Tuple[int, int, int]:
+    """Return (mode, filesize, namesize) from a 110 byte newc header.
+
+    Raises:
+        CpioError: If the magic or a field is not valid.
+    """
+    if bytes(header[:6]) not in NEWC_MAGICS:
+        raise CpioError(f"Not a newc cpio header: {bytes(header[:6])!r}")
+    try:
+        mode = int(header[14:22], 16)
+        filesize = int(header[54:62], 16)
+        namesize = int(header[94:102], 16)
+    except ValueError:
+        raise CpioError("Malformed cpio header")
+    if namesize == 0:
+        raise CpioError("Malformed cpio header: empty name")
+    return mode, filesize, namesize
+
+
+class CpioStreamParser:
+    """Indexes a newc archive from a stream of chunks of any size.
+
+    Headers and names are buffered until complete; file data is skipped
+    by counting, except for entries named in ``capture``, whose contents
+    are kept in ``captured``. Each byte is looked at once, so the parser
+    can ride along with a hash or copy loop over the same buffer.
+    """
+
+    def __init__(self, capture: Iterable[str] = (), capture_limit: int = 1024 * 1024):
+        self.entries: List[CpioEntry] = []
+        self.captured: Dict[str, bytes] = {}
+        self.done = False
+        self.position = 0
+        self._capture = set(capture)
+        self._capture_limit = capture_limit
+        self._buf = bytearray()
+        self._need = HEADER_SIZE
+        self._header: Optional[Tuple[int, int, int]] = None
+        self._data_left = 0
+        self._pad_left = 0
+        self._capturing: Optional[bytearray] = None
+
+    @property
+    def names(self) -> List[str]:
+        return [entry.name for entry in self.entries]
+
+    def feed(self, data) -> None:
+        """Consume the next chunk of the archive.
+
+        Bytes after the trailer are ignored.
+
+        Raises:
+            CpioError: On a malformed header.
+        """
+        view = memoryview(data).cast("B")
+        while len(view) and not self.done:
+            if self._data_left:
+                n = min(self._data_left, len(view))
+                if self._capturing is not None:
+                    self._capturing += view[:n]
+                self._data_left -= n
+                if not self._data_left and self._capturing is not None:
+                    self.captured[self.entries[-1].name] = bytes(self._capturing)
+                    self._capturing = None
+            elif self._pad_left:
+                n = min(self._pad_left, len(view))
+                self._pad_left -= n
+            else:
+                n = min(self._need - len(self._buf), len(view))
+                self._buf += view[:n]
+            self.position += n
+            view = view[n:]
+            if len(self._buf) == self._need:
+                self._complete_field()
+
+    def _complete_field(self) -> None:
+        if self._header is None:
+            self._header = parse_header(self._buf)
+            namesize = self._header[2]
+            self._need = namesize + _pad4(HEADER_SIZE + namesize)
+            self._buf.clear()
+            return
+
+        mode, size, namesize = self._header
+        name = self._buf[:namesize].split(b"\0", 1)[0].decode(errors="replace")
+        self._header = None
+        self._need = HEADER_SIZE
+        self._buf.clear()
+        if name == TRAILER:
+            self.done = True
+            return
+
+        self.entries.append(CpioEntry(name, mode, size, self.position))
+        self._data_left = size
+        self._pad_left = _pad4(size)
+        if name in self._capture:
+            if size > self._capture_limit:
+                logger.warning(f"Not capturing {name}: {size} bytes")
+            elif size == 0:
+                self.captured[name] = b""
+            else:
+                self._capturing = bytearray()
+
+    def finish(self) -> None:
+        """Raise CpioError unless the trailer was reached."""
+        if not self.done:
+            raise CpioError(f"Truncated cpio archive after {self.position} bytes")
+
+
+class CpioIndex:
+    """Random-access index of a newc archive file.
+
+    The file is memory-mapped and only the 110 byte headers and names are
+    touched: the walk seeks over every file body, so indexing a large
+    image costs a few pages per entry rather than a read of the archive.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.entries: List[CpioEntry] = []
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise CpioError(f"Empty cpio archive: {path}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._map, "madvise"):
+            # Don't let readahead pull in the bodies between headers
+            self._map.madvise(mmap.MADV_RANDOM)
+        try:
+            self._walk()
+        except BaseException:
+            self.close()
+            raise
+        self._by_name = {entry.name: entry for entry in self.entries}
+
+    def _walk(self) -> None:
+        data = self._map
+        end = len(data)
+        pos = 0
+        while True:
+            if pos + HEADER_SIZE > end:
+                raise CpioError(f"Truncated cpio archive at {pos} bytes")
+            mode, size, namesize = parse_header(data[pos:pos + HEADER_SIZE])
+            name_end = pos + HEADER_SIZE + namesize
+            data_start = name_end + _pad4(HEADER_SIZE + namesize)
+            if data_start + size > end:
+                raise CpioError(f"Truncated cpio archive at {pos} bytes")
+            name = data[pos + HEADER_SIZE:name_end].split(b"\0", 1)[0].decode(errors="replace")
+            if name == TRAILER:
+                return
+            self.entries.append(CpioEntry(name, mode, size, data_start))
+            pos = data_start + size + _pad4(size)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "CpioIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    @property
+    def names(self) -> List[str]:
+        return [entry.name for entry in self.entries]
+
+    def find(self, name: str) -> Optional[CpioEntry]:
+        """Return the entry for ``name``; its offset and size give the byte range."""
+        return self._by_name.get(name)
+
+    def read(self, name: str) -> Optional[bytes]:
+        entry = self._by_name.get(name)
+        if entry is None:
+            return None
+        return self._map[entry.offset:entry.offset + entry.size]
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Union
+
+from digest import Sha256
+
+logger = logging.getLogger(__name__)
+
+# A delta rebuilds a target package from a base package already on the
+# device. After the header it is a sequence of records: COPY takes a range
+# of the base, DATA carries literal bytes, END closes the delta. The output
+# is written strictly in order, so it can be hashed and indexed as it is
+# produced, and the delta itself can be read as a stream.
+MAGIC = b"SBDELTA1"
+# magic, target size, target sha256, base sha256, length of the base version
+_HEADER = struct.Struct("<8sQ32s32sH")
+OP_END, OP_COPY, OP_DATA = 0, 1, 2
+_COPY = struct.Struct("<QQ")  # base offset, length
+_DATA = struct.Struct("<I")   # length, then the bytes
+_RECORD_SIZES = {OP_END: 1, OP_COPY: 1 + _COPY.size, OP_DATA: 1 + _DATA.size}
+
+# Matching granularity of the generator
+BLOCK_SIZE = 4096
+# Longest DATA record written, and read size for COPY records
+MAX_DATA = 1024 * 1024
+COPY_READ_SIZE = 1024 * 1024
+DELTA_CHUNK_SIZE = 4 * 1024 * 1024
+# Adler-32 sums are kept modulo this prime
+ADLER_MOD = 65521
+
+
+class DeltaError(Exception):
+    pass
+
+
+@dataclass
+class DeltaHeader:
+    target_size: int
+    target_sha256: str
+    base_sha256: str
+    base_version: str
+
+    def pack(self) -> bytes:
+        version = self.base_version.encode()
+        return _HEADER.pack(
+            MAGIC, self.target_size, bytes.fromhex(self.target_sha256),
+            bytes.fromhex(self.base_sha256), len(version),
+        ) + version
+
+
+def read_header(path: Union[str, Path]) -> Optional[DeltaHeader]:
+    """Return the header of a delta file, or None if it is not a delta.
+
+    Raises:
+        OSError: If the file cannot be read.
+        DeltaError: If the file starts like a delta but the header is cut short.
+    """
+    with open(path, "rb") as f:
+        fixed = f.read(_HEADER.size)
+        if fixed[:len(MAGIC)] != MAGIC:
+            return None
+        if len(fixed) < _HEADER.size:
+            raise DeltaError("Delta header is truncated")
+        _, target_size, target_sha256, base_sha256, version_len = _HEADER.unpack(fixed)
+        version = f.read(version_len)
+        if len(version) < version_len:
+            raise DeltaError("Delta header is truncated")
+    return DeltaHeader(target_size, target_sha256.hex(), base_sha256.hex(), version.decode(errors="replace"))
+
+
+class DeltaApplier:
+    """Rebuilds the target from a base file and a delta fed in chunks of any size.
+
+    Output is passed to ``sink`` in order as memoryviews that are only
+    valid for the duration of the call.
+    """
+
+    def __init__(self, base_fd: int, sink: Callable[[memoryview], None]):
+        self.header: Optional[DeltaHeader] = None
+        self.written = 0
+        self.done = False
+        self._base_fd = base_fd
+        self._base_size = os.fstat(base_fd).st_size
+        self._sink = sink
+        self._buf = bytearray()
+        self._data_left = 0
+        self._copy_buf = bytearray(COPY_READ_SIZE)
+
+    def _need(self) -> int:
+        if self.header is None:
+            if len(self._buf) < _HEADER.size:
+                return _HEADER.size
+            return _HEADER.size + _HEADER.unpack_from(self._buf)[4]
+        if not self._buf:
+            return 1
+        try:
+            return _RECORD_SIZES[self._buf[0]]
+        except KeyError:
+            raise DeltaError(f"Unknown delta record type {self._buf[0]}")
+
+    def feed(self, data) -> None:
+        """Consume the next chunk of the delta.
+
+        Raises:
+            DeltaError: On a malformed delta or one that does not fit the base.
+            OSError: If the base cannot be read.
+        """
+        view = memoryview(data).cast("B")
+        while len(view):
+            if self.done:
+                raise DeltaError("Data after the end of the delta")
+            if self._data_left:
+                n = min(self._data_left, len(view))
+                self._emit(view[:n])
+                self._data_left -= n
+                view = view[n:]
+                continue
+            n = min(self._need() - len(self._buf), len(view))
+            self._buf += view[:n]
+            view = view[n:]
+            if len(self._buf) == self._need():
+                self._complete_record()
+                self._buf.clear()
+
+    def _complete_record(self) -> None:
+        if self.header is None:
+            magic, target_size, target_sha256, base_sha256, _ = _HEADER.unpack_from(self._buf)
+            if magic != MAGIC:
+                raise DeltaError("Not a delta")
+            version = bytes(self._buf[_HEADER.size:]).decode(errors="replace")
+            self.header = DeltaHeader(target_size, target_sha256.hex(), base_sha256.hex(), version)
+            return
+        op = self._buf[0]
+        if op == OP_END:
+            self.done = True
+        elif op == OP_DATA:
+            (length,) = _DATA.unpack_from(self._buf, 1)
+            self._check_output(length)
+            self._data_left = length
+        else:
+            offset, length = _COPY.unpack_from(self._buf, 1)
+            if offset + length > self._base_size:
+                raise DeltaError(f"Copy of [{offset}, {offset + length}) is outside the base")
+            self._check_output(length)
+            self._copy(offset, length)
+
+    def _check_output(self, length: int) -> None:
+        if self.written + length > self.header.target_size:
+            raise DeltaError("Delta writes past the target size")
+
+    def _copy(self, offset: int, length: int) -> None:
+        view = memoryview(self._copy_buf)
+        while length:
+            n = os.preadv(self._base_fd, [view[:min(length, len(view))]], offset)
+            if n == 0:
+                raise DeltaError(f"Base ended early at {offset} bytes")
+            self._emit(view[:n])
+            offset += n
+            length -= n
+
+    def _emit(self, view: memoryview) -> None:
+        self._sink(view)
+        self.written += len(view)
+
+    def finish(self) -> DeltaHeader:
+        """Check that the whole target was produced and return the header.
+
+        Raises:
+            DeltaError: If the delta ended early.
+        """
+        if self.header is None or not self.done or self._data_left:
+            raise DeltaError("Delta is truncated")
+        if self.written != self.header.target_size:
+            raise DeltaError(f"Delta produced {self.written} bytes, header says {self.header.target_size}")
+        return self.header
+
+
+def apply_delta(delta_path: Union[str, Path], base_path: Union[str, Path], out_path: Union[str, Path],
+                sha256: Optional[Sha256] = None, delta_sha256: Optional[Sha256] = None,
+                feed: Optional[Callable[[memoryview], None]] = None,
+                progress: Optional[Callable[[int], None]] = None,
+                chunk_size: int = DELTA_CHUNK_SIZE) -> str:
+    """Rebuild the target of ``delta_path`` against ``base_path`` into ``out_path``.
+
+    The delta is read once, in ``chunk_size`` pieces. Output bytes are
+    hashed with ``sha256`` and passed to ``feed`` (e.g. a cpio parser) as
+    they are written; ``delta_sha256``, if given, hashes the delta itself.
+    ``progress`` is called with the target bytes written after every chunk;
+    an exception it raises aborts the rebuild.
+
+    Returns:
+        The SHA-256 hex digest of the target, checked against the header.
+
+    Raises:
+        DeltaError: If the delta is malformed, for another base, or the
+            result does not match the header.
+    """
+    sha256 = sha256 or Sha256()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+
+    with open(base_path, "rb") as base, open(delta_path, "rb", buffering=0) as fin, \
+            open(out_path, "wb") as out:
+        def sink(data: memoryview) -> None:
+            out.write(data)
+            sha256.update(data)
+            if feed is not None:
+                feed(data)
+
+        applier = DeltaApplier(base.fileno(), sink)
+        while True:
+            n = fin.readinto(buf)
+            if not n:
+                break
+            if delta_sha256 is not None:
+                delta_sha256.update(view[:n])
+            applier.feed(view[:n])
+            if progress is not None:
+                progress(applier.written)
+        header = applier.finish()
+
+    computed = sha256.hexdigest()
+    if computed != header.target_sha256:
+        raise DeltaError(f"Rebuilt package SHA-256 mismatch (expected {header.target_sha256[:16]}..., "
+                         f"got {computed[:16]}...)")
+    return computed
+
+
+class _DeltaWriter:
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self._copy: Optional[List[int]] = None
+
+    def copy(self, offset: int, length: int) -> None:
+        if self._copy is not None and self._copy[0] + self._copy[1] == offset:
+            self._copy[1] += length
+            return
+        self._flush_copy()
+        self._copy = [offset, length]
+
+    def data(self, data) -> None:
+        self._flush_copy()
+        for start in range(0, len(data), MAX_DATA):
+            chunk = data[start:start + MAX_DATA]
+            self.out.write(bytes([OP_DATA]) + _DATA.pack(len(chunk)))
+            self.out.write(chunk)
+
+    def end(self) -> None:
+        self._flush_copy()
+        self.out.write(bytes([OP_END]))
+
+    def _flush_copy(self) -> None:
+        if self._copy is not None:
+            self.out.write(bytes([OP_COPY]) + _COPY.pack(*self._copy))
+            self._copy = None
+
+
+def _map(f: BinaryIO) -> Union[mmap.mmap, bytes]:
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_delta(base_path: Union[str, Path], target_path: Union[str, Path], out_path: Union[str, Path],
+                base_version: str, block_size: int = BLOCK_SIZE) -> int:
+    """Write a delta that rebuilds ``target_path`` from ``base_path``.
+
+    The base is indexed in ``block_size`` blocks by Adler-32. A window of
+    ``block_size`` bytes slides over the target with its Adler-32 rolled
+    forward one byte at a time, as rsync does, so blocks found in the base
+    at any offset match, even shifted by an earlier change, and changed
+    regions cost O(1) per byte. Checksum hits are confirmed by comparing
+    the bytes, and each match is extended block by block. Everything else
+    is sent as literal data.
+
+    Returns:
+        The size of the delta in bytes.
+    """
+    with open(base_path, "rb") as fb, open(target_path, "rb") as ft, open(out_path, "wb") as out:
+        base = _map(fb)
+        target = _map(ft)
+        header = DeltaHeader(
+            len(target), hashlib.sha256(target).hexdigest(), hashlib.sha256(base).hexdigest(), base_version,
+        )
+        out.write(header.pack())
+
+        writer = _DeltaWriter(out)
+        _scan(memoryview(base), memoryview(target), writer, block_size)
+        writer.end()
+        for mapped in (base, target):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        return out.tell()
+
+
+def _scan(base: memoryview, target: memoryview, writer: _DeltaWriter, block_size: int) -> None:
+    index: Dict[int, List[int]] = {}
+    for offset in range(0, len(base) - block_size + 1, block_size):
+        index.setdefault(zlib.adler32(base[offset:offset + block_size]), []).append(offset)
+
+    pos = literal = 0
+    last = len(target) - block_size
+    while pos <= last:
+        checksum = zlib.adler32(target[pos:pos + block_size])
+        a, b = checksum & 0xffff, checksum >> 16
+        match = None
+        while True:
+            candidates = index.get(a | b << 16)
+            if candidates is not None:
+                block = target[pos:pos + block_size]
+                match = next((c for c in candidates if base[c:c + block_size] == block), None)
+                if match is not None:
+                    break
+            if pos == last:
+                break
+            # Roll the window one byte: drop target[pos], take target[pos + block_size]
+            out, new = target[pos], target[pos + block_size]
+            a = (a - out + new) % ADLER_MOD
+            b = (b - block_size * out + a - 1) % ADLER_MOD
+            pos += 1
+        if match is None:
+            break
+        if literal < pos:
+            writer.data(target[literal:pos])
+        length = block_size
+        while (pos + length + block_size <= len(target) and match + length + block_size <= len(base)
+               and target[pos + length:pos + length + block_size] == base[match + length:match + length + block_size]):
+            length += block_size
+        writer.copy(match, length)
+        pos += length
+        literal = pos
+    if literal < len(target):
+        writer.data(target[literal:])
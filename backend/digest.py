@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import hashlib
+import logging
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_CRYPTO = Path("/proc/crypto")
+
+AF_ALG = "af_alg"
+HASHLIB = "hashlib"
+BACKENDS = (AF_ALG, HASHLIB)
+
+# Plain C kernel driver; OpenSSL beats it, so "auto" does not pick it
+GENERIC_DRIVER = "sha256-generic"
+
+_selected: Optional[str] = None
+
+
+def kernel_sha256_driver(proc_crypto: Path = PROC_CRYPTO) -> Optional[str]:
+    """Return the kernel driver AF_ALG would use for sha256, or None.
+
+    The kernel picks the highest-priority implementation registered under
+    the algorithm name, e.g. "sha256-ce" on ARMv8 with crypto extensions.
+    """
+    try:
+        text = proc_crypto.read_text()
+    except OSError:
+        return None
+    best = None
+    for block in text.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition(":")
+            if sep:
+                fields[key.strip()] = value.strip()
+        if fields.get("name") != "sha256" or fields.get("type") not in ("shash", "ahash"):
+            continue
+        try:
+            priority = int(fields.get("priority", "0"))
+        except ValueError:
+            continue
+        if best is None or priority > best[0]:
+            best = (priority, fields.get("driver", "sha256"))
+    return best[1] if best else None
+
+
+def af_alg_available() -> bool:
+    """Return True if the kernel crypto API accepts a sha256 hash socket."""
+    if not hasattr(socket, "AF_ALG"):
+        return False
+    try:
+        with socket.socket(socket.AF_ALG, socket.SOCK_SEQPACKET, 0) as tfm:
+            tfm.bind(("hash", "sha256"))
+    except OSError:
+        return False
+    return True
+
+
+def available_backends() -> List[str]:
+    return [name for name in BACKENDS if name != AF_ALG or af_alg_available()]
+
+
+def select_backend(name: str = "auto") -> str:
+    """Choose the default backend for ``Sha256`` and return its name.
+
+    "auto" takes AF_ALG when the kernel has an accelerated sha256 driver
+    and hashlib otherwise.
+
+    Raises:
+        ValueError: If ``name`` is unknown or not available here.
+    """
+    global _selected
+    if name == "auto":
+        driver = kernel_sha256_driver()
+        if af_alg_available() and driver is not None and driver != GENERIC_DRIVER:
+            name = AF_ALG
+        else:
+            name = HASHLIB
+    elif name not in BACKENDS:
+        raise ValueError(f"Unknown digest backend: {name}")
+    elif name == AF_ALG and not af_alg_available():
+        raise ValueError("AF_ALG sha256 is not available")
+    if name != _selected:
+        driver = kernel_sha256_driver() if name == AF_ALG else None
+        logger.info(f"SHA-256 backend: {name}" + (f" ({driver})" if driver else ""))
+    _selected = name
+    return name
+
+
+class _KernelHash:
+    """Incremental sha256 through an AF_ALG socket."""
+
+    def __init__(self):
+        self._tfm = socket.socket(socket.AF_ALG, socket.SOCK_SEQPACKET, 0)
+        try:
+            self._tfm.bind(("hash", "sha256"))
+            self._op, _ = self._tfm.accept()
+        except OSError:
+            self._tfm.close()
+            raise
+
+    def update(self, data) -> None:
+        # MSG_MORE keeps the kernel request open across sends
+        view = memoryview(data).cast("B")
+        while view:
+            sent = self._op.send(view, socket.MSG_MORE)
+            view = view[sent:]
+
+    def digest(self) -> bytes:
+        try:
+            return self._op.recv(32)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._op.close()
+        self._tfm.close()
+
+
+class Sha256:
+    """SHA-256 with a selectable backend that times its own updates.
+
+    The API mirrors hashlib, except that ``hexdigest`` finalises the hash
+    and later updates raise. ``throughput`` is bytes per second of time
+    spent hashing.
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = backend or _selected or select_backend()
+        self._impl = None
+        if self.backend == AF_ALG:
+            try:
+                self._impl = _KernelHash()
+            except OSError as e:
+                logger.warning(f"AF_ALG sha256 failed ({e}), using hashlib")
+                self.backend = HASHLIB
+        if self._impl is None:
+            self._impl = hashlib.sha256()
+        self._hexdigest: Optional[str] = None
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def update(self, data) -> None:
+        if self._hexdigest is not None:
+            raise ValueError("SHA-256 already finalised")
+        start = time.perf_counter()
+        self._impl.update(data)
+        self.seconds += time.perf_counter() - start
+        self.bytes += memoryview(data).nbytes
+
+    def hexdigest(self) -> str:
+        if self._hexdigest is None:
+            start = time.perf_counter()
+            self._hexdigest = self._impl.digest().hex()
+            self.seconds += time.perf_counter() - start
+        return self._hexdigest
+
+    def close(self) -> None:
+        """Release the kernel sockets of an unfinished AF_ALG hash.
+
+        Safe to call more than once, and a no-op for hashlib. Updates after
+        close fail; call it when a hash is abandoned.
+        """
+        close = getattr(self._impl, "close", None)
+        if close is not None:
+            close()
+
+    @property
+    def throughput(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 6),
+            "throughput": round(self.throughput),
+        }
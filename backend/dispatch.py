@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDispatcher:
+    """Runs D-Bus handler coroutines on a dedicated asyncio loop thread.
+
+    The GLib main loop owns the D-Bus connection and must never wait for
+    a coroutine. Handlers submit their work here and return immediately;
+    the reply is delivered back on the GLib thread through ``call_in_main``
+    once the coroutine finishes, so independent requests run concurrently.
+    """
+
+    def __init__(self, call_in_main: Optional[Callable[..., Any]] = None):
+        """Create a dispatcher.
+
+        Args:
+            call_in_main: Schedules a callable on the D-Bus (GLib) thread,
+                normally ``GLib.idle_add``. Defaults to calling inline, which
+                is only suitable for tests.
+        """
+        self._call_in_main = call_in_main or self._call_inline
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @staticmethod
+    def _call_inline(func: Callable[..., Any], *args: Any) -> bool:
+        func(*args)
+        return False
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The asyncio loop all managers run on."""
+        if self._loop is None:
+            raise RuntimeError("AsyncDispatcher is not started")
+        return self._loop
+
+    def start(self) -> None:
+        """Start the asyncio loop thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run_loop, name="streambox-asyncio", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+        logger.info("Async dispatcher started")
+
+    def _run_loop(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the loop thread, cancelling any handlers still running."""
+        if self._thread is None or self._loop is None:
+            return
+
+        def _cancel_all():
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+            self._loop.stop()
+
+        self._loop.call_soon_threadsafe(_cancel_all)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("Async dispatcher stopped")
+
+    def run_sync(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result.
+
+        Only for startup and shutdown, before or after the GLib loop runs.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def submit(
+        self,
+        coro: Awaitable[Any],
+        on_result: Callable[[Any], None],
+        on_error: Callable[[BaseException], None],
+    ) -> Future:
+        """Schedule a coroutine and deliver its outcome on the main thread.
+
+        Args:
+            coro: Coroutine to run on the dispatcher loop.
+            on_result: Called with the return value on the main thread.
+            on_error: Called with the raised exception on the main thread.
+
+        Returns:
+            The concurrent future tracking the coroutine.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        def _done(fut: Future) -> None:
+            try:
+                result = fut.result()
+            except BaseException as e:
+                self._call_in_main(on_error, e)
+                return
+            self._call_in_main(on_result, result)
+
+        future.add_done_callback(_done)
+        return future
+
+    def call_in_main(self, func: Callable[..., Any], *args: Any) -> None:
+        """Run a callable on the main (D-Bus) thread, e.g. to emit a signal."""
+        self._call_in_main(func, *args)
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-import asyncio
 import logging
 import signal
 import sys
@@ -13,6 +12,7 @@ from gi.repository import GLib
 
 from config import ConfigManager
 from api import StreamboxSettingsInterface
+from dispatch import AsyncDispatcher
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,7 +23,7 @@ logger = logging.getLogger(__name__)
 
 class StreamboxSettingsDaemon:
     def __init__(self):
-        self.loop = None
+        self.dispatcher: Optional[AsyncDispatcher] = None
         self.bus: Optional[dbus.SystemBus] = None
         self.config_manager: Optional[ConfigManager] = None
         self.api_interface: Optional[StreamboxSettingsInterface] = None
@@ -39,14 +39,16 @@ class StreamboxSettingsDaemon:
             logger.info("System bus acquired")
             
             self.config_manager = ConfigManager()
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
+            self.dispatcher = AsyncDispatcher(call_in_main=GLib.idle_add)
+            self.dispatcher.start()
             
-            self.loop.run_until_complete(self.config_manager.initialize())
+            self.dispatcher.run_sync(self.config_manager.initialize())
             logger.info("Config manager initialized")
             
-            self.api_interface = StreamboxSettingsInterface(self.config_manager, self.bus)
-            self.loop.run_until_complete(self.api_interface._async_init())
+            self.api_interface = StreamboxSettingsInterface(
+                self.config_manager, self.bus, self.dispatcher
+            )
+            self.dispatcher.run_sync(self.api_interface._async_init())
             logger.info("API interface initialized")
             
             self.bus_name = dbus.service.BusName(
@@ -66,11 +68,12 @@ class StreamboxSettingsDaemon:
         logger.info("Shutting down Streambox Settings daemon")
         self._running = False
         
-        if self.api_interface:
-            self.api_interface.cleanup()
+        if self.api_interface and self.dispatcher:
+            self.dispatcher.run_sync(self.api_interface.cleanup())
         
-        if self.config_manager and self.loop:
-            self.loop.run_until_complete(self.config_manager.cleanup())
+        if self.config_manager and self.dispatcher:
+            self.dispatcher.run_sync(self.config_manager.cleanup())
+            self.dispatcher.stop()
 
     def setup_signal_handlers(self):
         def signal_handler(signum, frame):
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the last bucket is unbounded
+BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with interpolated quantiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return self.max
+                low = BUCKETS[i - 1] if i else 0.0
+                high = min(BUCKETS[i], self.max)
+                return low + (high - low) * max(0.0, rank - seen) / n
+            seen += n
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        result = {"count": self.count, "total_seconds": round(self.total, 6),
+                  "max": round(self.max, 6)}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = round(self.quantile(q), 6)
+        return result
+
+
+class _Series:
+    __slots__ = ("histogram", "errors", "in_flight")
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self.in_flight = 0
+
+
+class Metrics:
+    """Per-method and per-command timing, safe to update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods: Dict[str, _Series] = {}
+        self._commands: Dict[str, _Series] = {}
+        self._started = time.monotonic()
+
+    def method_started(self, method: str) -> float:
+        with self._lock:
+            self._methods.setdefault(method, _Series()).in_flight += 1
+        return time.monotonic()
+
+    def method_finished(self, method: str, start: float, error: bool = False) -> None:
+        elapsed = time.monotonic() - start
+        with self._lock:
+            series = self._methods.setdefault(method, _Series())
+            series.in_flight -= 1
+            series.histogram.observe(elapsed)
+            if error:
+                series.errors += 1
+
+    def observe_command(self, result: Any) -> None:
+        """Record one finished CommandResult under its program name."""
+        name = os.path.basename(result.args[0]) if result.args else "?"
+        with self._lock:
+            series = self._commands.setdefault(name, _Series())
+            series.histogram.observe(result.duration)
+            if not result.ok:
+                series.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return all counters as a JSON-serialisable dict."""
+        with self._lock:
+            methods = {}
+            for name, series in sorted(self._methods.items()):
+                entry = series.histogram.summary()
+                entry.update(errors=series.errors, in_flight=series.in_flight)
+                methods[name] = entry
+            commands = {}
+            for name, series in sorted(self._commands.items()):
+                entry = series.histogram.summary()
+                entry["failures"] = series.errors
+                commands[name] = entry
+        return {
+            "uptime_seconds": round(time.monotonic() - self._started, 3),
+            "methods": methods,
+            "commands": commands,
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            self._render_family(lines, "streambox_dbus_method", "method", self._methods,
+                                "D-Bus method latency", "errors_total", "failed D-Bus calls")
+            lines.append("# HELP streambox_dbus_method_in_flight D-Bus calls in progress")
+            lines.append("# TYPE streambox_dbus_method_in_flight gauge")
+            for name, series in sorted(self._methods.items()):
+                lines.append(f'streambox_dbus_method_in_flight{{method="{name}"}} {series.in_flight}')
+            self._render_family(lines, "streambox_command", "command", self._commands,
+                                "Child process run time", "failures_total",
+                                "commands that failed or timed out")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_family(lines: List[str], prefix: str, label: str, table: Dict[str, _Series],
+                       help_text: str, error_suffix: str, error_help: str) -> None:
+        lines.append(f"# HELP {prefix}_duration_seconds {help_text}")
+        lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+        for name, series in sorted(table.items()):
+            histogram = series.histogram
+            cumulative = 0
+            for bound, n in zip(BUCKETS, histogram.counts):
+                cumulative += n
+                lines.append(f'{prefix}_duration_seconds_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{{label}="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}_duration_seconds_sum{{{label}="{name}"}} {histogram.total:.6f}')
+            lines.append(f'{prefix}_duration_seconds_count{{{label}="{name}"}} {histogram.count}')
+        lines.append(f"# HELP {prefix}_{error_suffix} {error_help}")
+        lines.append(f"# TYPE {prefix}_{error_suffix} counter")
+        for name, series in sorted(table.items()):
+            lines.append(f'{prefix}_{error_suffix}{{{label}="{name}"}} {series.errors}')
+
+    def write_textfile(self, path: Path) -> None:
+        """Atomically write the Prometheus text format for node_exporter's textfile collector."""
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+metrics = Metrics()
+
+
+def instrument_methods(cls: type, registry: Metrics,
+                       is_method: Callable[[Any], bool],
+                       callbacks: Tuple[str, str] = ("reply_handler", "error_handler")) -> type:
+    """Wrap every method of cls selected by is_method with timing.
+
+    Synchronous methods are timed around the call. Methods that receive
+    reply/error callbacks are timed until one of the callbacks fires. The
+    wrapper copies the original's ``__dict__``, so decorator metadata such
+    as dbus-python's ``_dbus_*`` attributes stays intact.
+    """
+    reply_name, error_name = callbacks
+    for attr, func in list(vars(cls).items()):
+        if not callable(func) or not is_method(func):
+            continue
+
+        def wrap(func: Callable, name: str) -> Callable:
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                start = registry.method_started(name)
+                reply = kwargs.get(reply_name)
+                error = kwargs.get(error_name)
+                if reply is not None and error is not None:
+                    def on_reply(*result):
+                        registry.method_finished(name, start)
+                        reply(*result)
+
+                    def on_error(e):
+                        registry.method_finished(name, start, error=True)
+                        error(e)
+
+                    kwargs[reply_name] = on_reply
+                    kwargs[error_name] = on_error
+                    try:
+                        return func(self, *args, **kwargs)
+                    except Exception:
+                        registry.method_finished(name, start, error=True)
+                        raise
+
+                try:
+                    result = func(self, *args, **kwargs)
+                except Exception:
+                    registry.method_finished(name, start, error=True)
+                    raise
+                registry.method_finished(name, start)
+                return result
+            return wrapper
+
+        setattr(cls, attr, wrap(func, attr))
+    return cls
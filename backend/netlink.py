@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NETLINK_ROUTE = 0
+
+NLMSG_NOOP = 1
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_DUMP = 0x300
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+RTM_GETROUTE = 26
+
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_OPERSTATE = 16
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_TABLE = 15
+
+RT_TABLE_MAIN = 254
+
+# Names match the operstate strings printed by "ip -j link"
+OPERSTATES = ["UNKNOWN", "NOTPRESENT", "DOWN", "LOWERLAYERDOWN", "TESTING", "DORMANT", "UP"]
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_IFINFOMSG = struct.Struct("=BxHiII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTMSG = struct.Struct("=BBBBBBBBI")
+_RTATTR = struct.Struct("=HH")
+_RTGENMSG = struct.Struct("=Bxxx")
+
+
+@dataclass
+class LinkInfo:
+    index: int
+    name: str
+    operstate: str
+    mac: str
+
+
+@dataclass
+class AddrInfo:
+    index: int
+    family: int
+    local: str
+    prefixlen: int
+
+
+@dataclass
+class RouteInfo:
+    family: int
+    dst_len: int
+    table: int
+    oif: Optional[int]
+    gateway: Optional[str]
+    priority: int
+
+
+class NetlinkError(Exception):
+    pass
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def _parse_attrs(data: bytes, offset: int, end: int) -> Dict[int, bytes]:
+    attrs = {}
+    while offset + _RTATTR.size <= end:
+        rta_len, rta_type = _RTATTR.unpack_from(data, offset)
+        if rta_len < _RTATTR.size:
+            break
+        attrs.setdefault(rta_type & 0x7fff, data[offset + _RTATTR.size:offset + rta_len])
+        offset += _align(rta_len)
+    return attrs
+
+
+def _format_addr(family: int, raw: Optional[bytes]) -> Optional[str]:
+    if raw is None:
+        return None
+    try:
+        return socket.inet_ntop(family, raw)
+    except (ValueError, OSError):
+        return None
+
+
+def _parse_link(data: bytes, offset: int, end: int) -> LinkInfo:
+    _family, _type, index, _flags, _change = _IFINFOMSG.unpack_from(data, offset)
+    attrs = _parse_attrs(data, offset + _IFINFOMSG.size, end)
+    name = attrs.get(IFLA_IFNAME, b"").split(b"\0", 1)[0].decode(errors="replace")
+    operstate = "UNKNOWN"
+    if IFLA_OPERSTATE in attrs and attrs[IFLA_OPERSTATE]:
+        code = attrs[IFLA_OPERSTATE][0]
+        if code < len(OPERSTATES):
+            operstate = OPERSTATES[code]
+    mac = ":".join(f"{b:02x}" for b in attrs.get(IFLA_ADDRESS, b""))
+    return LinkInfo(index, name, operstate, mac)
+
+
+def _parse_addr(data: bytes, offset: int, end: int) -> AddrInfo:
+    family, prefixlen, _flags, _scope, index = _IFADDRMSG.unpack_from(data, offset)
+    attrs = _parse_attrs(data, offset + _IFADDRMSG.size, end)
+    local = _format_addr(family, attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS)))
+    return AddrInfo(index, family, local or "", prefixlen)
+
+
+def _parse_route(data: bytes, offset: int, end: int) -> RouteInfo:
+    family, dst_len, _src_len, _tos, table, _proto, _scope, _type, _flags = (
+        _RTMSG.unpack_from(data, offset)
+    )
+    attrs = _parse_attrs(data, offset + _RTMSG.size, end)
+    if RTA_TABLE in attrs and len(attrs[RTA_TABLE]) >= 4:
+        table = struct.unpack_from("=I", attrs[RTA_TABLE])[0]
+    oif = struct.unpack_from("=i", attrs[RTA_OIF])[0] if RTA_OIF in attrs else None
+    priority = struct.unpack_from("=I", attrs[RTA_PRIORITY])[0] if RTA_PRIORITY in attrs else 0
+    return RouteInfo(family, dst_len, table, oif, _format_addr(family, attrs.get(RTA_GATEWAY)),
+                     priority)
+
+
+_PARSERS = {
+    RTM_NEWLINK: _parse_link,
+    RTM_DELLINK: _parse_link,
+    RTM_NEWADDR: _parse_addr,
+    RTM_DELADDR: _parse_addr,
+    RTM_NEWROUTE: _parse_route,
+    RTM_DELROUTE: _parse_route,
+}
+
+
+def parse_messages(data: bytes) -> Iterator[Tuple[int, int, Any]]:
+    """Parse a buffer of rtnetlink messages.
+
+    Args:
+        data: Bytes as returned by one recv() on a NETLINK_ROUTE socket.
+
+    Yields:
+        (message type, sequence number, parsed payload). The payload is a
+        LinkInfo, AddrInfo or RouteInfo; it is None for NLMSG_DONE and the
+        errno for NLMSG_ERROR. Other message types are skipped.
+    """
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        msg_len, msg_type, _flags, seq, _pid = _NLMSGHDR.unpack_from(data, offset)
+        if msg_len < _NLMSGHDR.size or offset + msg_len > len(data):
+            logger.warning("Truncated netlink message")
+            return
+        body = offset + _NLMSGHDR.size
+        end = offset + msg_len
+        if msg_type == NLMSG_DONE:
+            yield msg_type, seq, None
+        elif msg_type == NLMSG_ERROR:
+            yield msg_type, seq, -struct.unpack_from("=i", data, body)[0]
+        elif msg_type in _PARSERS:
+            yield msg_type, seq, _PARSERS[msg_type](data, body, end)
+        offset += _align(msg_len)
+
+
+def build_dump_request(msg_type: int, seq: int, family: int = socket.AF_UNSPEC) -> bytes:
+    """Build an NLM_F_DUMP request for RTM_GETLINK, RTM_GETADDR or RTM_GETROUTE."""
+    if msg_type == RTM_GETLINK:
+        payload = _IFINFOMSG.pack(family, 0, 0, 0, 0)
+    elif msg_type == RTM_GETROUTE:
+        payload = _RTMSG.pack(family, 0, 0, 0, 0, 0, 0, 0, 0)
+    else:
+        payload = _RTGENMSG.pack(family)
+    header = _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type,
+                            NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+    return header + payload
+
+
+def is_leased_ipv4(address: Optional[str]) -> bool:
+    """True for an IPv4 address that is not link-local.
+
+    dhcpcd assigns a 169.254/16 IPv4LL address itself when no DHCP lease
+    arrives, so such an address does not mean the link is configured.
+    """
+    if not address:
+        return False
+    try:
+        return not ipaddress.IPv4Address(address).is_link_local
+    except ValueError:
+        return False
+
+
+class NetworkState:
+    """In-memory model of links, IPv4 addresses and IPv4 default routes.
+
+    Fed with parsed rtnetlink messages from a dump or from multicast
+    events, and rendered in the same shape as ``ip -j addr`` and
+    ``ip -j route`` output so callers can share one record builder.
+    """
+
+    def __init__(self):
+        self.links: Dict[int, LinkInfo] = {}
+        self.addrs: Dict[Tuple[int, str, int], AddrInfo] = {}
+        self.routes: Dict[Tuple[int, Optional[int], Optional[str], int], RouteInfo] = {}
+
+    def apply(self, msg_type: int, payload: Any) -> bool:
+        """Apply one parsed message. Returns True if the model changed."""
+        if msg_type == RTM_NEWLINK:
+            if self.links.get(payload.index) == payload:
+                return False
+            self.links[payload.index] = payload
+            return True
+        if msg_type == RTM_DELLINK:
+            if self.links.pop(payload.index, None) is None:
+                return False
+            for key in [k for k in self.addrs if k[0] == payload.index]:
+                del self.addrs[key]
+            for key in [k for k, r in self.routes.items() if r.oif == payload.index]:
+                del self.routes[key]
+            return True
+        if msg_type in (RTM_NEWADDR, RTM_DELADDR):
+            if payload.family != socket.AF_INET:
+                return False
+            key = (payload.index, payload.local, payload.prefixlen)
+            if msg_type == RTM_NEWADDR:
+                if self.addrs.get(key) == payload:
+                    return False
+                self.addrs[key] = payload
+                return True
+            return self.addrs.pop(key, None) is not None
+        if msg_type in (RTM_NEWROUTE, RTM_DELROUTE):
+            if (payload.family != socket.AF_INET or payload.dst_len != 0
+                    or payload.table != RT_TABLE_MAIN):
+                return False
+            key = (payload.table, payload.oif, payload.gateway, payload.priority)
+            if msg_type == RTM_NEWROUTE:
+                if self.routes.get(key) == payload:
+                    return False
+                self.routes[key] = payload
+                return True
+            return self.routes.pop(key, None) is not None
+        return False
+
+    def has_ipv4_address(self, name: str) -> bool:
+        """True if the named link has an IPv4 address other than an IPv4LL one."""
+        for link in self.links.values():
+            if link.name == name:
+                return any(a.index == link.index and is_leased_ipv4(a.local) for a in self.addrs.values())
+        return False
+
+    def to_ip_json(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Render the model like ``ip -j addr show`` and ``ip -j route show default``."""
+        links = []
+        for link in self.links.values():
+            links.append({
+                "ifindex": link.index,
+                "ifname": link.name,
+                "operstate": link.operstate,
+                "address": link.mac,
+                "addr_info": [
+                    {"family": "inet", "local": a.local, "prefixlen": a.prefixlen}
+                    for a in self.addrs.values() if a.index == link.index
+                ],
+            })
+        names = {link.index: link.name for link in self.links.values()}
+        routes = []
+        for route in sorted(self.routes.values(), key=lambda r: r.priority):
+            entry = {"dst": "default", "dev": names.get(route.oif)}
+            if route.gateway:
+                entry["gateway"] = route.gateway
+            routes.append(entry)
+        return links, routes
+
+
+class NetlinkMonitor:
+    """Keeps a NetworkState current from an RTNETLINK multicast subscription.
+
+    The subscription socket is opened before the initial dump so no event
+    is lost; events queued during the dump are replayed on top of it.
+    ``on_change`` is called on the event loop after every batch of
+    messages that changed the model.
+    """
+
+    GROUPS = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE
+
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        self.state = NetworkState()
+        self._on_change = on_change
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Subscribe, load the initial state and start watching for events.
+
+        Raises:
+            OSError: If a netlink socket cannot be opened.
+        """
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        try:
+            sock.bind((0, self.GROUPS))
+            sock.setblocking(False)
+            await asyncio.to_thread(self._dump_into, self.state)
+        except Exception:
+            sock.close()
+            raise
+        self._sock = sock
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        self._on_readable()
+        logger.info(f"Netlink monitor started: {len(self.state.links)} links")
+
+    def stop(self) -> None:
+        """Stop watching and close the socket."""
+        if self._sock is None:
+            return
+        if self._loop is not None:
+            self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+
+    def sync(self) -> None:
+        """Apply every event already queued on the socket.
+
+        Call after a command that changed kernel state has returned: its
+        events are queued by then, so the model is current afterwards.
+        """
+        self._on_readable()
+
+    @staticmethod
+    def _dump_into(state: NetworkState) -> None:
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE) as sock:
+            sock.settimeout(2.0)
+            sock.bind((0, 0))
+            requests = [
+                (RTM_GETLINK, socket.AF_UNSPEC),
+                (RTM_GETADDR, socket.AF_INET),
+                (RTM_GETROUTE, socket.AF_INET),
+            ]
+            for seq, (msg_type, family) in enumerate(requests, start=1):
+                sock.send(build_dump_request(msg_type, seq, family))
+                done = False
+                while not done:
+                    for reply_type, reply_seq, payload in parse_messages(sock.recv(65536)):
+                        if reply_seq != seq:
+                            continue
+                        if reply_type == NLMSG_DONE:
+                            done = True
+                        elif reply_type == NLMSG_ERROR:
+                            if payload:
+                                raise NetlinkError(f"netlink dump {msg_type} failed: errno {payload}")
+                            done = True
+                        else:
+                            state.apply(reply_type, payload)
+
+    def _on_readable(self) -> None:
+        changed = False
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # ENOBUFS means events were dropped; resynchronise from a dump
+                logger.warning(f"Netlink receive error: {e}, resynchronising")
+                asyncio.ensure_future(self._resync())
+                break
+            for msg_type, _seq, payload in parse_messages(data):
+                if payload is not None and msg_type not in (NLMSG_DONE, NLMSG_ERROR):
+                    changed |= self.state.apply(msg_type, payload)
+        if changed and self._on_change is not None:
+            self._on_change()
+
+    async def _resync(self) -> None:
+        state = NetworkState()
+        try:
+            await asyncio.to_thread(self._dump_into, state)
+        except (OSError, NetlinkError) as e:
+            logger.error(f"Netlink resync failed: {e}")
+            return
+        self.state = state
+        if self._on_change is not None:
+            self._on_change()
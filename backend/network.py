@@ -3,12 +3,25 @@
 import asyncio
 import json
 import logging
-import subprocess
 import re
-from typing import Dict, List, Optional, Any
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+from cmdtrace import start_background
+from command import run_command, run_command_lines
+from netlink import NetlinkError, NetlinkMonitor, is_leased_ipv4
+from wifiscan import ScanParser
+from wpactrl import (
+    CTRL_DIR, EVENT_CONNECTED, EVENT_DISCONNECTED, EVENT_SSID_TEMP_DISABLED, WpaCtrl,
+    WpaCtrlError, select_network,
+)
 
 logger = logging.getLogger(__name__)
 
+# Administratively up, as set by "ip link set IFACE up"
+IFF_UP = 0x1
+
 
 class NetworkManager:
     """Manages network configuration for wired and wireless interfaces."""
@@ -16,70 +29,167 @@ class NetworkManager:
     # Only show these interfaces
     ALLOWED_INTERFACES = ["eth0", "wlan0", "wlan1"]
 
+    # The kernel drops BSS entries not seen for 30 s, so "iw scan dump"
+    # never returns anything older than this
+    SCAN_DUMP_MAX_AGE = 30
+
+    SYS_CLASS_NET = Path("/sys/class/net")
+    WPA_CTRL_DIR = CTRL_DIR
+    WIFI_CONNECT_TIMEOUT = 15
+
+    DEFAULT_DHCP_TIMEOUT = 30
+    # Only used when no netlink socket is available
+    ADDRESS_POLL_INTERVAL = 0.5
+
     def __init__(self):
         self._initialized = False
+        self._monitor: Optional[NetlinkMonitor] = None
+        self._published: Dict[str, Dict[str, Any]] = {}
+        self._change_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._scan_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._scan_inflight: Dict[str, asyncio.Future] = {}
+        self._scan_task: Optional[asyncio.Task] = None
+        self._address_waiters: Dict[str, List[asyncio.Future]] = {}
+        self.dhcp_timeout: float = self.DEFAULT_DHCP_TIMEOUT
+        # Seconds from starting the DHCP client to a bound address, per interface
+        self.time_to_address: Dict[str, float] = {}
 
     async def initialize(self):
         if self._initialized:
             return
         logger.info("Initializing NetworkManager")
+        monitor = NetlinkMonitor(on_change=self._on_netlink_change)
+        try:
+            await monitor.start()
+        except (OSError, NetlinkError) as e:
+            logger.warning(f"Netlink monitor unavailable, status will be read with ip: {e}")
+        else:
+            self._monitor = monitor
+            self._published = {i["name"]: i for i in self._interfaces_from_state()}
         self._initialized = True
 
-    def _run_command(self, args: List[str], timeout: int = 30) -> tuple[bool, str]:
-        """Run a shell command and return success status and output."""
+    async def cleanup(self):
+        if self._scan_task is not None:
+            self._scan_task.cancel()
+            self._scan_task = None
+        if self._monitor is not None:
+            self._monitor.stop()
+            self._monitor = None
+
+    def add_change_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Register a callback for interface changes seen by the netlink monitor.
+
+        The callback receives a dict mapping interface name to its new record,
+        or to None if the interface disappeared. Only changed interfaces are
+        included, and it is not called when nothing visible changed.
+        """
+        self._change_listeners.append(callback)
+
+    def _interfaces_from_state(self) -> List[Dict[str, Any]]:
+        links, routes = self._monitor.state.to_ip_json()
+        return self._build_interfaces(links, routes)
+
+    def _on_netlink_change(self):
+        self._wake_address_waiters()
+        current = {i["name"]: i for i in self._interfaces_from_state()}
+        diff = {name: iface for name, iface in current.items()
+                if self._published.get(name) != iface}
+        diff.update({name: None for name in self._published if name not in current})
+        self._published = current
+        if not diff:
+            return
+        logger.debug(f"Network state changed: {sorted(diff)}")
+        for callback in self._change_listeners:
+            callback(diff)
+
+    async def _run_command(self, args: List[str], timeout: int = 30) -> tuple[bool, str]:
+        """Run a command and return success status and output."""
+        result = await run_command(args, timeout=timeout)
+        return result.ok, result.stdout.strip()
+
+    def _wake_address_waiters(self) -> None:
+        for name, waiters in self._address_waiters.items():
+            if waiters and self._monitor.state.has_ipv4_address(name):
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    async def wait_for_ipv4(self, interface: str, timeout: float) -> Optional[float]:
+        """Wait until interface has an IPv4 address; IPv4LL (169.254/16) does not count.
+
+        Returns:
+            Seconds waited, or None if no address appeared within timeout.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self._monitor is not None:
+            self._monitor.sync()
+            if not self._monitor.state.has_ipv4_address(interface):
+                waiter = loop.create_future()
+                waiters = self._address_waiters.setdefault(interface, [])
+                waiters.append(waiter)
+                try:
+                    await asyncio.wait_for(waiter, timeout)
+                except asyncio.TimeoutError:
+                    return None
+                finally:
+                    if waiter in waiters:
+                        waiters.remove(waiter)
+        else:
+            while not is_leased_ipv4((await self._get_interface_ip(interface))["ip_address"]):
+                if loop.time() - start >= timeout:
+                    return None
+                await asyncio.sleep(self.ADDRESS_POLL_INTERVAL)
+        return loop.time() - start
+
+    async def _acquire_dhcp_lease(self, interface: str) -> bool:
+        """Start a DHCP client and return once an IPv4 address is bound."""
+        await self._run_command(["ip", "addr", "flush", "dev", interface])
+        
+        # Listen before the client starts so a fast lease is not missed
+        waiter = asyncio.ensure_future(self.wait_for_ipv4(interface, self.dhcp_timeout))
         try:
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                timeout=timeout
+            success, _ = await self._run_command(
+                ["dhcpcd", "-b", "-t", str(int(self.dhcp_timeout)), interface]
             )
-            return result.returncode == 0, result.stdout.strip()
-        except subprocess.TimeoutExpired:
-            logger.error(f"Command timeout: {' '.join(args)}")
-            return False, ""
-        except FileNotFoundError:
-            logger.error(f"Command not found: {args[0]}")
-            return False, ""
-        except Exception as e:
-            logger.error(f"Command failed: {e}")
-            return False, ""
+            if not success:
+                # Try dhclient as fallback
+                success, _ = await self._run_command(["dhclient", "-nw", interface])
+            if not success:
+                logger.error(f"Failed to start a DHCP client on {interface}")
+                return False
+            elapsed = await waiter
+        finally:
+            waiter.cancel()
+        
+        if elapsed is None:
+            logger.error(f"No DHCP lease on {interface} within {self.dhcp_timeout}s")
+            return False
+        self.time_to_address[interface] = elapsed
+        logger.info(f"DHCP address on {interface} after {elapsed:.2f}s")
+        return True
+
+    async def _run_command_lines(self, args: List[str], on_line: Callable[[str], None],
+                                 timeout: int = 30) -> bool:
+        """Run a command, passing each stdout line to on_line; return success status."""
+        result = await run_command_lines(args, on_line, timeout=timeout)
+        return result.ok
 
     async def get_interfaces(self) -> List[Dict[str, Any]]:
         """Get list of network interfaces with their status."""
+        if self._monitor is not None:
+            return self._interfaces_from_state()
+
         interfaces = []
         
-        # Get interface list using ip command
-        success, output = self._run_command(["ip", "-j", "link", "show"])
-        if success and output:
-            try:
-                links = json.loads(output)
-                for link in links:
-                    name = link.get("ifname", "")
-                    # Only include allowed interfaces
-                    if name not in self.ALLOWED_INTERFACES:
-                        continue
-                    
-                    iface = {
-                        "name": name,
-                        "type": self._get_interface_type(name),
-                        "state": link.get("operstate", "unknown").lower(),
-                        "mac": link.get("address", ""),
-                        "ip_address": None,
-                        "netmask": None,
-                        "gateway": None
-                    }
-                    
-                    # Get IP address
-                    ip_info = await self._get_interface_ip(name)
-                    iface.update(ip_info)
-                    
-                    interfaces.append(iface)
-            except json.JSONDecodeError:
-                logger.error("Failed to parse ip link output")
+        # One address dump and one route dump cover every interface
+        snapshot = await self._collect_snapshot()
+        if snapshot is not None:
+            links, routes = snapshot
+            interfaces = self._build_interfaces(links, routes)
         else:
             # Fallback without JSON
-            success, output = self._run_command(["ip", "link", "show"])
+            success, output = await self._run_command(["ip", "link", "show"])
             if success:
                 for line in output.split("\n"):
                     match = re.match(r"^\d+:\s+(\w+):", line)
@@ -98,6 +208,78 @@ class NetworkManager:
         
         return interfaces
 
+    async def _collect_snapshot(self) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Dump all links with addresses and the default routes in two concurrent calls."""
+        (addr_ok, addr_out), (route_ok, route_out) = await asyncio.gather(
+            self._run_command(["ip", "-j", "addr", "show"]),
+            self._run_command(["ip", "-j", "route", "show", "default"]),
+        )
+        if not addr_ok or not addr_out:
+            return None
+        
+        try:
+            links = json.loads(addr_out)
+        except json.JSONDecodeError:
+            logger.error("Failed to parse ip addr output")
+            return None
+        
+        routes = []
+        if route_ok and route_out:
+            try:
+                routes = json.loads(route_out)
+            except json.JSONDecodeError:
+                logger.error("Failed to parse ip route output")
+        
+        return links, routes
+
+    def _build_interfaces(self, links: List[Dict[str, Any]],
+                          routes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build interface records for allowed interfaces from one address and route dump."""
+        gateways = self._default_gateways(routes)
+        interfaces = []
+        for link in links:
+            name = link.get("ifname", "")
+            # Only include allowed interfaces
+            if name not in self.ALLOWED_INTERFACES:
+                continue
+            
+            iface = {
+                "name": name,
+                "type": self._get_interface_type(name),
+                "state": link.get("operstate", "unknown").lower(),
+                "mac": link.get("address", ""),
+            }
+            iface.update(self._link_ip_info(link, gateways))
+            interfaces.append(iface)
+        
+        return interfaces
+
+    def _default_gateways(self, routes: List[Dict[str, Any]]) -> Dict[Optional[str], str]:
+        """Map device name to its default gateway; key None holds the first default gateway."""
+        gateways = {}
+        for route in routes:
+            gateway = route.get("gateway")
+            if route.get("dst", "default") != "default" or not gateway:
+                continue
+            gateways.setdefault(route.get("dev"), gateway)
+            gateways.setdefault(None, gateway)
+        return gateways
+
+    def _link_ip_info(self, link: Dict[str, Any], gateways: Dict[Optional[str], str]) -> Dict[str, Any]:
+        """Extract the first IPv4 address and the gateway for one link."""
+        result = {
+            "ip_address": None,
+            "netmask": None,
+            "gateway": gateways.get(link.get("ifname"), gateways.get(None))
+        }
+        for addr in link.get("addr_info", []):
+            if addr.get("family") == "inet":
+                result["ip_address"] = addr.get("local")
+                prefix = addr.get("prefixlen", 24)
+                result["netmask"] = self._prefix_to_netmask(prefix)
+                break
+        return result
+
     def _get_interface_type(self, name: str) -> str:
         """Determine interface type based on name."""
         if name.startswith("eth") or name.startswith("enp"):
@@ -110,30 +292,18 @@ class NetworkManager:
 
     async def _get_interface_ip(self, interface: str) -> Dict[str, Any]:
         """Get IP configuration for an interface."""
-        result = {"ip_address": None, "netmask": None, "gateway": None}
-        
-        success, output = self._run_command(["ip", "-j", "addr", "show", interface])
-        if success and output:
-            try:
-                data = json.loads(output)
-                if data and data[0].get("addr_info"):
-                    for addr in data[0]["addr_info"]:
-                        if addr.get("family") == "inet":
-                            result["ip_address"] = addr.get("local")
-                            prefix = addr.get("prefixlen", 24)
-                            result["netmask"] = self._prefix_to_netmask(prefix)
-                            break
-            except (json.JSONDecodeError, IndexError, KeyError):
-                pass
-        
-        # Get gateway
-        success, output = self._run_command(["ip", "route", "show", "default"])
-        if success and output:
-            match = re.search(r"default via (\S+)", output)
-            if match:
-                result["gateway"] = match.group(1)
+        if self._monitor is not None:
+            snapshot = self._monitor.state.to_ip_json()
+        else:
+            snapshot = await self._collect_snapshot()
+        if snapshot is not None:
+            links, routes = snapshot
+            gateways = self._default_gateways(routes)
+            for link in links:
+                if link.get("ifname") == interface:
+                    return self._link_ip_info(link, gateways)
         
-        return result
+        return {"ip_address": None, "netmask": None, "gateway": None}
 
     def _prefix_to_netmask(self, prefix: int) -> str:
         """Convert CIDR prefix to netmask."""
@@ -149,7 +319,8 @@ class NetworkManager:
         
         return {
             "interfaces": interfaces,
-            "dns_servers": dns_servers
+            "dns_servers": dns_servers,
+            "time_to_address": dict(self.time_to_address)
         }
 
     async def _get_dns_servers(self) -> List[str]:
@@ -182,7 +353,7 @@ class NetworkManager:
         config.update(ip_info)
         
         # Check if using DHCP by looking at dhcpcd leases
-        success, output = self._run_command(["cat", f"/var/lib/dhcpcd/{interface}.lease"])
+        success, output = await self._run_command(["cat", f"/var/lib/dhcpcd/{interface}.lease"])
         if success and output:
             config["method"] = "dhcp"
         elif config["ip_address"]:
@@ -200,9 +371,7 @@ class NetworkManager:
         try:
             if method == "dhcp":
                 # Enable DHCP
-                self._run_command(["ip", "addr", "flush", "dev", interface])
-                success, _ = self._run_command(["dhcpcd", interface])
-                return success
+                return await self._acquire_dhcp_lease(interface)
             else:
                 # Static IP configuration
                 ip_address = config.get("ip_address")
@@ -217,8 +386,8 @@ class NetworkManager:
                 prefix = self._netmask_to_prefix(netmask)
                 
                 # Flush and set IP
-                self._run_command(["ip", "addr", "flush", "dev", interface])
-                success, _ = self._run_command([
+                await self._run_command(["ip", "addr", "flush", "dev", interface])
+                success, _ = await self._run_command([
                     "ip", "addr", "add", f"{ip_address}/{prefix}", "dev", interface
                 ])
                 
@@ -227,8 +396,8 @@ class NetworkManager:
                 
                 # Set gateway
                 if gateway:
-                    self._run_command(["ip", "route", "del", "default"])
-                    success, _ = self._run_command([
+                    await self._run_command(["ip", "route", "del", "default"])
+                    success, _ = await self._run_command([
                         "ip", "route", "add", "default", "via", gateway
                     ])
                 
@@ -264,57 +433,92 @@ class NetworkManager:
             logger.error(f"Failed to set DNS: {e}")
             return False
 
-    async def scan_wifi_networks(self, interface: str = "wlan0") -> List[Dict[str, Any]]:
-        """Scan for available WiFi networks."""
-        networks = []
+    async def scan_wifi_networks(self, interface: str = "wlan0",
+                                 max_age: float = 0) -> List[Dict[str, Any]]:
+        """Get WiFi networks, one entry per SSID, strongest first.
+
+        Args:
+            interface: Wireless interface to scan on.
+            max_age: Oldest acceptable result in seconds. Cached results
+                within this age are returned at once; 0 forces a new scan.
+        """
+        cached = self._scan_cache.get(interface)
+        if cached is not None and time.monotonic() - cached[0] <= max_age:
+            return cached[1]
         
-        # Bring interface up
-        self._run_command(["ip", "link", "set", interface, "up"])
+        # Results of scans run by anyone (wpa_supplicant included) within the
+        # last 30 s are available without using the radio
+        if max_age >= self.SCAN_DUMP_MAX_AGE:
+            networks = await self._scan_dump(interface)
+            if networks:
+                return networks
         
-        # Use iw to scan
-        success, output = self._run_command(["iw", "dev", interface, "scan"], timeout=15)
-        if success:
-            current_network = None
-            
-            for line in output.split("\n"):
-                line = line.strip()
-                
-                if line.startswith("BSS "):
-                    if current_network:
-                        networks.append(current_network)
-                    bssid = line.split()[1].replace("(", "").replace(")", "")
-                    current_network = {
-                        "bssid": bssid,
-                        "ssid": "",
-                        "signal": 0,
-                        "security": "open",
-                        "frequency": 0
-                    }
-                elif current_network:
-                    if line.startswith("SSID:"):
-                        current_network["ssid"] = line[5:].strip()
-                    elif line.startswith("signal:"):
-                        match = re.search(r"(-?\d+)", line)
-                        if match:
-                            current_network["signal"] = int(match.group(1))
-                    elif line.startswith("freq:"):
-                        match = re.search(r"(\d+)", line)
-                        if match:
-                            current_network["frequency"] = int(match.group(1))
-                    elif "WPA" in line or "RSN" in line:
-                        current_network["security"] = "wpa"
-                    elif "WEP" in line:
-                        current_network["security"] = "wep"
-            
-            if current_network:
-                networks.append(current_network)
+        return await self._scan_coalesced(interface)
+
+    def start_background_scan(self, interface: str, interval: float) -> None:
+        """Refresh the scan cache for interface every interval seconds (0 disables)."""
+        if interval <= 0 or self._scan_task is not None:
+            return
+        logger.info(f"Background WiFi scan on {interface} every {interval}s")
+        self._scan_task = start_background("wifi-scan", self._background_scan(interface, interval))
+
+    async def _background_scan(self, interface: str, interval: float) -> None:
+        while True:
+            # An active scan brings the link up; leave a radio the user turned off alone
+            if not self._link_is_up(interface):
+                logger.debug(f"Background WiFi scan skipped: {interface} is down")
+            else:
+                try:
+                    await self._scan_coalesced(interface)
+                except Exception as e:
+                    logger.warning(f"Background WiFi scan failed: {e}")
+            await asyncio.sleep(interval)
+
+    def _link_is_up(self, interface: str) -> bool:
+        """Return True if interface is administratively up, without running ip."""
+        try:
+            flags = int((self.SYS_CLASS_NET / interface / "flags").read_text(), 16)
+        except (OSError, ValueError):
+            return False
+        return bool(flags & IFF_UP)
+
+    async def _scan_coalesced(self, interface: str) -> List[Dict[str, Any]]:
+        """Join the in-flight scan on interface, or start one."""
+        task = self._scan_inflight.get(interface)
+        if task is None:
+            task = asyncio.ensure_future(self._active_scan(interface))
+            self._scan_inflight[interface] = task
+            task.add_done_callback(lambda _: self._scan_inflight.pop(interface, None))
+        # A cancelled caller must not abort the scan other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _active_scan(self, interface: str) -> List[Dict[str, Any]]:
+        # Bring interface up
+        await self._run_command(["ip", "link", "set", interface, "up"])
         
-        # Filter out hidden networks (empty SSID)
-        networks = [n for n in networks if n.get("ssid", "").strip()]
+        # Parse iw output as it streams in rather than buffering all of it
+        parser = ScanParser()
+        success = await self._run_command_lines(["iw", "dev", interface, "scan"], parser.feed,
+                                                timeout=15)
+        if not success:
+            return []
         
-        # Sort by signal strength
-        networks.sort(key=lambda x: x.get("signal", -100), reverse=True)
+        networks = [n.to_dict() for n in parser.finish()]
+        self._scan_cache[interface] = (time.monotonic(), networks)
+        logger.debug(f"Scan on {interface}: {parser.bss_count} BSS, {len(networks)} networks")
+        return networks
+
+    async def _scan_dump(self, interface: str) -> List[Dict[str, Any]]:
+        parser = ScanParser()
+        success = await self._run_command_lines(["iw", "dev", interface, "scan", "dump"],
+                                                parser.feed, timeout=5)
+        if not success:
+            return []
         
+        networks = [n.to_dict() for n in parser.finish()]
+        if networks:
+            # Entries may be up to SCAN_DUMP_MAX_AGE old; date them accordingly
+            self._scan_cache[interface] = (time.monotonic() - self.SCAN_DUMP_MAX_AGE, networks)
         return networks
 
     async def connect_wifi(self, ssid: str, password: str, interface: str = "wlan0", 
@@ -327,7 +531,7 @@ class NetworkManager:
             # Create wpa_supplicant config using wpa_passphrase
             if password:
                 # WPA/WPA2 network - use wpa_passphrase to generate proper config
-                success, wpa_config = self._run_command(
+                success, wpa_config = await self._run_command(
                     ["wpa_passphrase", ssid, password]
                 )
                 if not success:
@@ -357,70 +561,27 @@ network={{
                 f.write(full_config)
             
             # Set proper permissions
-            self._run_command(["chmod", "600", config_path])
+            await self._run_command(["chmod", "600", config_path])
             
             logger.info(f"Saved WiFi config to {config_path}")
             
-            # Clean up any existing wpa_supplicant processes and sockets
-            self._run_command(["pkill", "-9", "-f", f"wpa_supplicant.*{interface}"])
-            await asyncio.sleep(1)
-            
-            # Remove stale control interface socket
-            self._run_command(["rm", "-rf", f"/var/run/wpa_supplicant/{interface}"])
-            self._run_command(["rm", "-rf", f"/var/run/wpa_supplicant/wlan*"])
-            
-            # Bring interface down and up to reset
-            self._run_command(["ip", "link", "set", interface, "down"])
-            await asyncio.sleep(1)
-            self._run_command(["ip", "link", "set", interface, "up"])
-            await asyncio.sleep(1)
-            
-            # Start wpa_supplicant with the persistent config (without GROUP=netdev to avoid issues)
-            success, output = self._run_command([
-                "wpa_supplicant", "-B", "-i", interface,
-                "-c", config_path, "-D", "nl80211,wext",
-                "-C", "/var/run/wpa_supplicant"
-            ])
-            
-            if not success:
-                logger.error(f"Failed to start wpa_supplicant: {output}")
-                return False
-            
-            logger.info(f"Started wpa_supplicant for {interface}")
-            
-            # Wait for authentication (up to 10 seconds)
-            auth_success = False
-            for i in range(10):
-                await asyncio.sleep(1)
-                
-                # Check if wpa_supplicant is running
-                success, _ = self._run_command(["pgrep", "-f", f"wpa_supplicant.*{interface}"])
-                if not success:
-                    logger.error("wpa_supplicant stopped unexpectedly")
+            # wpa_passphrase prints the derived key as "psk=<64 hex digits>"
+            psk = None
+            if password:
+                match = re.search(r"^\s*psk=([0-9a-fA-F]{64})\s*$", wpa_config, re.MULTILINE)
+                if not match:
+                    logger.error(f"wpa_passphrase returned no PSK for SSID: {ssid}")
                     return False
-                
-                # Check connection status
-                status_success, status_output = self._run_command(
-                    ["wpa_cli", "-i", interface, "status"]
-                )
-                if status_success and "wpa_state=COMPLETED" in status_output:
-                    auth_success = True
-                    logger.info("WiFi authentication completed successfully")
-                    break
+                psk = match.group(1)
             
-            if not auth_success:
-                logger.error("WiFi authentication timed out or failed")
+            await self._run_command(["ip", "link", "set", interface, "up"])
+            if not await self._wpa_associate(interface, ssid, psk, config_path):
                 return False
             
             # Get IP address
             if method == "dhcp":
                 # Flush existing IP and get new one via DHCP
-                self._run_command(["ip", "addr", "flush", "dev", interface])
-                await asyncio.sleep(1)
-                success, _ = self._run_command(["dhcpcd", "-b", "-t", "30", interface])
-                if not success:
-                    # Try dhclient as fallback
-                    success, _ = self._run_command(["dhclient", "-v", interface])
+                success = await self._acquire_dhcp_lease(interface)
             else:
                 # Static IP configuration
                 if ip_config:
@@ -430,11 +591,11 @@ network={{
                     
                     if ip_address:
                         prefix = self._netmask_to_prefix(netmask)
-                        self._run_command(["ip", "addr", "flush", "dev", interface])
-                        self._run_command(["ip", "addr", "add", f"{ip_address}/{prefix}", "dev", interface])
+                        await self._run_command(["ip", "addr", "flush", "dev", interface])
+                        await self._run_command(["ip", "addr", "add", f"{ip_address}/{prefix}", "dev", interface])
                         if gateway:
-                            self._run_command(["ip", "route", "del", "default"])
-                            self._run_command(["ip", "route", "add", "default", "via", gateway])
+                            await self._run_command(["ip", "route", "del", "default"])
+                            await self._run_command(["ip", "route", "add", "default", "via", gateway])
                         success = True
                     else:
                         success = False
@@ -454,6 +615,62 @@ network={{
             logger.error(f"Failed to connect WiFi: {e}")
             return False
 
+    def _wpa_ctrl(self, interface: str) -> WpaCtrl:
+        return WpaCtrl.for_interface(interface, self.WPA_CTRL_DIR)
+
+    async def _wpa_associate(self, interface: str, ssid: str, psk: Optional[str],
+                             config_path: str) -> bool:
+        """Connect through the wpa_supplicant control socket, starting the daemon if needed.
+
+        Returns as soon as wpa_supplicant reports CTRL-EVENT-CONNECTED.
+        """
+        ctrl = self._wpa_ctrl(interface)
+        try:
+            try:
+                await ctrl.attach()
+                running = True
+            except WpaCtrlError:
+                running = False
+            
+            if running:
+                # Reconfigure the running daemon in place
+                await select_network(ctrl, ssid, psk)
+            else:
+                # A stale control socket is removed by wpa_supplicant itself
+                success, output = await self._run_command([
+                    "wpa_supplicant", "-B", "-i", interface,
+                    "-c", config_path, "-D", "nl80211,wext",
+                    "-C", self.WPA_CTRL_DIR
+                ])
+                if not success:
+                    logger.error(f"Failed to start wpa_supplicant: {output}")
+                    return False
+                logger.info(f"Started wpa_supplicant for {interface}")
+                
+                # The daemon connects from the config file on its own; it may
+                # already be done by the time we are listening
+                await ctrl.attach()
+                if (await ctrl.status()).get("wpa_state") == "COMPLETED":
+                    logger.info("WiFi authentication completed successfully")
+                    return True
+            
+            event = await ctrl.wait_event([EVENT_CONNECTED, EVENT_SSID_TEMP_DISABLED],
+                                          timeout=self.WIFI_CONNECT_TIMEOUT)
+        except WpaCtrlError as e:
+            logger.error(f"wpa_supplicant control error: {e}")
+            return False
+        finally:
+            await ctrl.close()
+        
+        if event is None:
+            logger.error("WiFi authentication timed out")
+            return False
+        if event.startswith(EVENT_SSID_TEMP_DISABLED):
+            logger.error(f"WiFi authentication failed: {event}")
+            return False
+        logger.info("WiFi authentication completed successfully")
+        return True
+
     async def _enable_wifi_autoconnect(self, interface: str = "wlan0") -> bool:
         """Enable WiFi auto-connect on boot using systemd service."""
         try:
@@ -478,8 +695,8 @@ WantedBy=multi-user.target
                 f.write(service_content)
             
             # Enable the service to start on boot
-            self._run_command(["systemctl", "daemon-reload"])
-            self._run_command(["systemctl", "enable", f"wpa_supplicant-{interface}.service"])
+            await self._run_command(["systemctl", "daemon-reload"])
+            await self._run_command(["systemctl", "enable", f"wpa_supplicant-{interface}.service"])
             
             logger.info(f"Enabled auto-connect for {interface}")
             return True
@@ -500,7 +717,7 @@ WantedBy=multi-user.target
         }
         
         # Check if hostapd is running (AP is enabled)
-        success, output = self._run_command(["pgrep", "hostapd"])
+        success, output = await self._run_command(["pgrep", "hostapd"])
         config["enabled"] = success
         
         # First, try to read from /etc/wifi/ap_config (managed by this plugin)
@@ -561,7 +778,7 @@ WantedBy=multi-user.target
             
             if not enabled:
                 # Stop AP mode via systemctl
-                self._run_command(["systemctl", "stop", "wifi-ap"])
+                await self._run_command(["systemctl", "stop", "wifi-ap"])
                 return True
             
             if len(password) < 8:
@@ -577,7 +794,7 @@ CHANNEL={channel}
 IP_ADDRESS={ip_address}
 """
             # Ensure directory exists
-            self._run_command(["mkdir", "-p", "/etc/wifi"])
+            await self._run_command(["mkdir", "-p", "/etc/wifi"])
             
             with open("/etc/wifi/ap_config", "w") as f:
                 f.write(ap_config_content)
@@ -585,7 +802,7 @@ IP_ADDRESS={ip_address}
             logger.info(f"Wrote AP config: SSID={ssid}, channel={channel}, IP={ip_address}")
             
             # Restart wifi-ap.service to apply changes
-            success, _ = self._run_command(["systemctl", "restart", "wifi-ap"])
+            success, _ = await self._run_command(["systemctl", "restart", "wifi-ap"])
             
             return success
             
@@ -604,8 +821,11 @@ IP_ADDRESS={ip_address}
         }
         
         # Check if wpa_supplicant is running for this interface
-        success, _ = self._run_command(["pgrep", "-f", f"wpa_supplicant.*{interface}"])
-        config["enabled"] = success
+        ctrl = self._wpa_ctrl(interface)
+        try:
+            config["enabled"] = await ctrl.ping()
+        finally:
+            await ctrl.close()
         
         # Read wpa_supplicant config
         config_path = "/etc/wpa_supplicant.conf"
@@ -632,22 +852,38 @@ IP_ADDRESS={ip_address}
         
         return config
 
+    async def _wpa_terminate(self, interface: str) -> bool:
+        """Disconnect and stop wpa_supplicant over its control socket."""
+        ctrl = self._wpa_ctrl(interface)
+        try:
+            await ctrl.attach()
+            await ctrl.command("DISCONNECT")
+            await ctrl.wait_event([EVENT_DISCONNECTED], timeout=3)
+            await ctrl.command("TERMINATE")
+            return True
+        except WpaCtrlError as e:
+            logger.debug(f"wpa_supplicant control socket unavailable: {e}")
+            return False
+        finally:
+            await ctrl.close()
+
     async def disconnect_wifi(self, interface: str = "wlan0") -> bool:
         """Disconnect from WiFi and disable auto-connect."""
         try:
             # Stop wpa_supplicant
-            self._run_command(["pkill", "-f", f"wpa_supplicant.*{interface}"])
+            if not await self._wpa_terminate(interface):
+                await self._run_command(["pkill", "-f", f"wpa_supplicant.*{interface}"])
             
             # Disable the service
-            self._run_command(["systemctl", "disable", f"wpa_supplicant-{interface}.service"])
+            await self._run_command(["systemctl", "disable", f"wpa_supplicant-{interface}.service"])
             
             # Remove the service file
             service_path = f"/etc/systemd/system/wpa_supplicant-{interface}.service"
-            self._run_command(["rm", "-f", service_path])
+            await self._run_command(["rm", "-f", service_path])
             
             # Remove the config file
             config_path = "/etc/wpa_supplicant.conf"
-            self._run_command(["rm", "-f", config_path])
+            await self._run_command(["rm", "-f", config_path])
             
             logger.info(f"Disconnected WiFi on {interface}")
             return True
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import os
+import re
+import select
+import socket
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cmdtrace import start_background
+from command import run_command
+
+logger = logging.getLogger(__name__)
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+MEDIA_DIR = "/media"
+LSBLK_COLUMNS = "NAME,PATH,LABEL,FSTYPE,SIZE,MOUNTPOINT,RM,TRAN,MAJ:MIN"
+
+# Memory-backed filesystems are not storage the user manages
+SKIP_FSTYPES = ("tmpfs", "devtmpfs")
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast group of events sent by the kernel itself, before udev sees them
+UEVENT_KERNEL_GROUP = 1
+UEVENT_ACTIONS = ("add", "remove", "change")
+
+_OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+class StorageError(Exception):
+    pass
+
+
+@dataclass
+class MountEntry:
+    """One line of /proc/self/mountinfo."""
+
+    devno: str
+    mount_point: str
+    fstype: str
+    source: str
+
+
+@dataclass
+class BlockDevice:
+    """One node of the lsblk tree, flattened."""
+
+    name: str
+    path: str
+    label: str
+    fstype: str
+    size: int
+    mount_point: str
+    removable: bool
+    transport: str
+    devno: str
+
+
+def _unescape(field: str) -> str:
+    # The kernel writes space, tab, newline and backslash as \ooo
+    return _OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+def parse_mountinfo(text: str) -> List[MountEntry]:
+    """Parse /proc/self/mountinfo into mount entries, in mount order."""
+    mounts = []
+    for line in text.splitlines():
+        head, sep, tail = line.partition(" - ")
+        fields = head.split()
+        rest = tail.split()
+        if not sep or len(fields) < 5 or len(rest) < 2:
+            continue
+        mounts.append(MountEntry(
+            devno=fields[2],
+            mount_point=_unescape(fields[4]),
+            fstype=rest[0],
+            source=_unescape(rest[1]),
+        ))
+    return mounts
+
+
+def _flag(value: Any) -> bool:
+    # util-linux before 2.33 prints booleans as "0"/"1" strings
+    if isinstance(value, str):
+        return value.strip() not in ("", "0", "false")
+    return bool(value)
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_lsblk(text: str) -> List[BlockDevice]:
+    """Flatten ``lsblk -J -b -o LSBLK_COLUMNS`` output into a device list.
+
+    Partitions inherit the transport of their disk, which lsblk only
+    reports on the top-level node.
+    """
+    devices: List[BlockDevice] = []
+
+    def walk(nodes: List[Dict[str, Any]], transport: str) -> None:
+        for node in nodes:
+            tran = node.get("tran") or transport
+            devices.append(BlockDevice(
+                name=node.get("name") or "",
+                path=node.get("path") or f"/dev/{node.get('name', '')}",
+                label=node.get("label") or "",
+                fstype=node.get("fstype") or "",
+                size=_int(node.get("size")),
+                mount_point=node.get("mountpoint") or "",
+                removable=_flag(node.get("rm")),
+                transport=tran,
+                devno=node.get("maj:min") or "",
+            ))
+            walk(node.get("children") or [], tran)
+
+    try:
+        walk(json.loads(text).get("blockdevices") or [], "")
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Cannot parse lsblk output: {e}")
+    return devices
+
+
+def filesystem_usage(stat: os.statvfs_result) -> Tuple[int, int, int, int]:
+    """Return (size, used, available, use_percent) the way df computes them."""
+    size = stat.f_blocks * stat.f_frsize
+    used = (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+    available = stat.f_bavail * stat.f_frsize
+    # Percentage of the space usable by unprivileged users, rounded up
+    usable = used + available
+    use_percent = -(-used * 100 // usable) if usable else 0
+    return size, used, available, use_percent
+
+
+def build_inventory(mounts: List[MountEntry], devices: List[BlockDevice],
+                    statvfs: Callable[[str], os.statvfs_result] = os.statvfs) -> List[Dict[str, Any]]:
+    """Join the mount table with the block devices and filesystem usage.
+
+    Mounted filesystems come first, in mount order, with pseudo and memory
+    filesystems (zero size) left out and each device listed once. Removable
+    and USB filesystems that are not mounted follow with zero usage, so
+    they can be mounted from the UI.
+    """
+    by_devno = {d.devno: d for d in devices if d.devno}
+    by_path = {d.path: d for d in devices}
+    # lsblk's MOUNTPOINT goes stale between runs; the mount table does not
+    mounted = {m.devno for m in mounts}
+    filesystems = []
+    seen = set()
+
+    for mount in mounts:
+        if mount.fstype in SKIP_FSTYPES or mount.devno in seen:
+            continue
+        try:
+            size, used, available, use_percent = filesystem_usage(statvfs(mount.mount_point))
+        except OSError as e:
+            logger.debug(f"statvfs {mount.mount_point} failed: {e}")
+            continue
+        if size == 0:
+            continue
+        seen.add(mount.devno)
+        device = by_devno.get(mount.devno) or by_path.get(mount.source)
+        filesystems.append({
+            "device": device.path if device else mount.source,
+            "mount_point": mount.mount_point,
+            "fstype": mount.fstype,
+            "size": size,
+            "used": used,
+            "available": available,
+            "use_percent": use_percent,
+            "label": device.label if device else "",
+            "removable": device.removable if device else False,
+            "transport": device.transport if device else "",
+        })
+
+    for device in devices:
+        if not device.fstype or device.devno in mounted:
+            continue
+        if not (device.removable or device.transport == "usb") or device.fstype == "swap":
+            continue
+        filesystems.append({
+            "device": device.path,
+            "mount_point": "",
+            "fstype": device.fstype,
+            "size": device.size,
+            "used": 0,
+            "available": 0,
+            "use_percent": 0,
+            "label": device.label,
+            "removable": device.removable,
+            "transport": device.transport,
+        })
+
+    return filesystems
+
+
+def read_mountinfo(path: str = MOUNTINFO_PATH) -> List[MountEntry]:
+    with open(path) as f:
+        return parse_mountinfo(f.read())
+
+
+async def list_block_devices(device: Optional[str] = None) -> Optional[List[BlockDevice]]:
+    """Run lsblk once, for all devices or just ``device`` and its children.
+
+    Returns:
+        The flattened device list, or None if lsblk failed.
+    """
+    args = ["lsblk", "-J", "-b", "-o", LSBLK_COLUMNS]
+    if device:
+        args.append(device)
+    result = await run_command(args, timeout=10)
+    if not result.ok:
+        logger.error(f"lsblk failed: {result.stderr.strip()}")
+        return None
+    return parse_lsblk(result.stdout)
+
+
+async def list_filesystems() -> List[Dict[str, Any]]:
+    """Return the storage inventory at the cost of a single lsblk fork."""
+    devices = await list_block_devices() or []
+    # statvfs can stall on a slow or dead mount, keep it off the event loop
+    return await asyncio.to_thread(
+        lambda: build_inventory(read_mountinfo(MOUNTINFO_PATH), devices, os.statvfs)
+    )
+
+
+@dataclass
+class StorageJob:
+    """A mount or unmount request and its outcome."""
+
+    id: int
+    operation: str
+    device: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    state: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    mount_point: str = ""
+    error: str = ""
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def inventory_key(fs: Dict[str, Any]) -> str:
+    """Key of a filesystem record in StorageChanged: its mount point, or its device if unmounted.
+
+    Mount sources are not unique (bind mounts, "none", "overlay"), mount points are.
+    """
+    return fs["mount_point"] or fs["device"]
+
+
+def _device_path(device: str) -> str:
+    # Sanitize device path
+    return device if device.startswith("/dev/") else "/dev/" + device
+
+
+def parse_uevent(data: bytes) -> Optional[Dict[str, str]]:
+    """Parse one kernel uevent datagram into its environment.
+
+    Kernel messages are an ``action@devpath`` header followed by
+    NUL-separated KEY=VALUE pairs. Anything else, such as the libudev
+    re-broadcast format, returns None.
+    """
+    parts = data.split(b"\0")
+    if b"@" not in parts[0]:
+        return None
+    event = {}
+    for part in parts[1:]:
+        key, sep, value = part.decode(errors="replace").partition("=")
+        if sep:
+            event[key] = value
+    return event if "ACTION" in event else None
+
+
+class StorageManager:
+    """Keeps the storage inventory in memory and pushes changes.
+
+    Block devices are loaded with one lsblk at startup and reloaded when the
+    kernel announces a block device add or change on the uevent netlink
+    socket; removals are applied from the event alone. The mount table is
+    re-read when polling /proc/self/mountinfo reports a change. Without
+    those, every request rebuilds the inventory from scratch.
+    """
+
+    # A hotplug is a burst of events (disk, then each partition); let it
+    # settle so one lsblk covers all of them
+    UEVENT_SETTLE = 0.5
+    UEVENT_RCVBUF = 1 << 20
+
+    # Mounting exFAT or vfat can include a filesystem check
+    MOUNT_TIMEOUT = 120
+    UNMOUNT_TIMEOUT = 60
+    # Finished jobs kept for GetStorageJobs
+    JOB_HISTORY = 32
+
+    def __init__(self):
+        self._initialized = False
+        self._devices: List[BlockDevice] = []
+        self._mounts: List[MountEntry] = []
+        self._published: Dict[str, Dict[str, Any]] = {}
+        self._change_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._uevent_sock: Optional[socket.socket] = None
+        self._mountinfo = None
+        self._mount_poll: Optional[select.epoll] = None
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._publish_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._jobs: "collections.OrderedDict[int, StorageJob]" = collections.OrderedDict()
+        self._job_ids = itertools.count(1)
+        self._job_tasks: Dict[int, asyncio.Task] = {}
+        self._device_locks: Dict[str, asyncio.Lock] = {}
+        self._job_listeners: List[Callable[[StorageJob], None]] = []
+
+    @property
+    def monitoring(self) -> bool:
+        return self._uevent_sock is not None and self._mount_poll is not None
+
+    async def initialize(self):
+        if self._initialized:
+            return
+        logger.info("Initializing StorageManager")
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._start_watching()
+        except OSError as e:
+            logger.warning(f"Storage monitor unavailable, inventory will be rebuilt per request: {e}")
+            self._stop_watching()
+        else:
+            # Subscribed before loading, so a device plugged in meanwhile is not missed
+            self._devices = await list_block_devices() or []
+            self._mounts = self._read_mounts()
+            self._published = await self._inventory()
+        self._initialized = True
+
+    async def cleanup(self):
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        for task in (self._refresh_task, self._publish_task, *self._job_tasks.values()):
+            if task is not None:
+                task.cancel()
+        self._stop_watching()
+
+    def add_change_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Register a callback for inventory changes.
+
+        The callback receives a dict keyed by ``inventory_key`` (the mount
+        point, or the device path of an unmounted filesystem) mapping to
+        the new filesystem record, or to None if it disappeared. Mounting
+        or unmounting moves a filesystem between keys, so it shows up as
+        one key set to None and another to its record. Only changed
+        entries are included.
+        """
+        self._change_listeners.append(callback)
+
+    def _start_watching(self) -> None:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self._uevent_sock = sock
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.UEVENT_RCVBUF)
+        sock.bind((0, UEVENT_KERNEL_GROUP))
+        sock.setblocking(False)
+
+        # The kernel flags mountinfo with POLLPRI|POLLERR after every mount
+        # table change; an epoll set makes that visible to the event loop
+        self._mountinfo = open(MOUNTINFO_PATH)
+        self._mount_poll = select.epoll()
+        self._mount_poll.register(self._mountinfo.fileno(), select.EPOLLPRI | select.EPOLLERR)
+
+        self._loop.add_reader(sock.fileno(), self._on_uevent_readable)
+        self._loop.add_reader(self._mount_poll.fileno(), self._on_mounts_readable)
+
+    def _stop_watching(self) -> None:
+        if self._uevent_sock is not None:
+            if self._loop is not None:
+                self._loop.remove_reader(self._uevent_sock.fileno())
+            self._uevent_sock.close()
+            self._uevent_sock = None
+        if self._mount_poll is not None:
+            if self._loop is not None:
+                self._loop.remove_reader(self._mount_poll.fileno())
+            self._mount_poll.close()
+            self._mount_poll = None
+        if self._mountinfo is not None:
+            self._mountinfo.close()
+            self._mountinfo = None
+
+    def _read_mounts(self) -> List[MountEntry]:
+        self._mountinfo.seek(0)
+        return parse_mountinfo(self._mountinfo.read())
+
+    async def _inventory(self) -> Dict[str, Dict[str, Any]]:
+        # The tables are replaced, never mutated, so the thread sees a consistent pair
+        filesystems = await asyncio.to_thread(build_inventory, self._mounts, self._devices, os.statvfs)
+        return {inventory_key(fs): fs for fs in filesystems}
+
+    async def get_filesystems(self) -> List[Dict[str, Any]]:
+        """Return the inventory with current usage, without forking when monitored."""
+        if not self.monitoring:
+            return await list_filesystems()
+        return list((await self._inventory()).values())
+
+    async def get_device_label(self, device: str) -> str:
+        devices = self._devices if self.monitoring else await list_block_devices(device) or []
+        return next((d.label for d in devices if d.path == device), "")
+
+    def _on_uevent_readable(self) -> None:
+        while self._uevent_sock is not None:
+            try:
+                data = self._uevent_sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # ENOBUFS means events were dropped; reload the device table
+                logger.warning(f"uevent receive error: {e}, reloading block devices")
+                self._schedule_device_refresh()
+                break
+            event = parse_uevent(data)
+            if event is not None:
+                self.handle_uevent(event)
+
+    def handle_uevent(self, event: Dict[str, str]) -> None:
+        """Apply one parsed uevent; only block add, change and remove matter."""
+        action = event.get("ACTION")
+        if event.get("SUBSYSTEM") != "block" or action not in UEVENT_ACTIONS:
+            return
+        logger.debug(f"Block uevent: {action} {event.get('DEVNAME', event.get('DEVPATH'))}")
+        if action == "remove":
+            devno = f"{event.get('MAJOR')}:{event.get('MINOR')}"
+            devices = [d for d in self._devices if d.devno != devno]
+            if len(devices) != len(self._devices):
+                self._devices = devices
+                self._changed()
+            return
+        self._schedule_device_refresh()
+
+    def _schedule_device_refresh(self) -> None:
+        if self._refresh_handle is None:
+            self._refresh_handle = self._loop.call_later(self.UEVENT_SETTLE, self._start_device_refresh)
+
+    def _start_device_refresh(self) -> None:
+        self._refresh_handle = None
+        if self._refresh_task is not None and not self._refresh_task.done():
+            # Let the running lsblk finish, then look again
+            self._schedule_device_refresh()
+            return
+        self._refresh_task = start_background("storage-uevent", self._refresh_devices())
+
+    async def _refresh_devices(self) -> None:
+        devices = await list_block_devices()
+        if devices is not None and devices != self._devices:
+            self._devices = devices
+            self._changed()
+
+    def _on_mounts_readable(self) -> None:
+        if self._mount_poll is None:
+            return
+        self._mount_poll.poll(0)
+        mounts = self._read_mounts()
+        if mounts != self._mounts:
+            self._mounts = mounts
+            self._changed()
+
+    def _changed(self) -> None:
+        self._dirty = True
+        if self._publish_task is None or self._publish_task.done():
+            self._publish_task = asyncio.ensure_future(self._publish())
+
+    async def _publish(self) -> None:
+        while self._dirty:
+            self._dirty = False
+            current = await self._inventory()
+            diff = {key: fs for key, fs in current.items()
+                    if self._published.get(key) != fs}
+            diff.update({key: None for key in self._published if key not in current})
+            self._published = current
+            if not diff:
+                continue
+            logger.debug(f"Storage changed: {sorted(diff)}")
+            for callback in self._change_listeners:
+                callback(diff)
+
+    def add_job_listener(self, callback: Callable[[StorageJob], None]) -> None:
+        """Register a callback called with every job once it has finished."""
+        self._job_listeners.append(callback)
+
+    def start_mount(self, device: str) -> StorageJob:
+        """Queue a mount of ``device`` and return its job without waiting."""
+        device = _device_path(device)
+        return self._start_job("mount", device, {}, lambda: self.mount(device))
+
+    def start_unmount(self, device: str, lazy: bool = False, sync: bool = False) -> StorageJob:
+        """Queue an unmount of ``device`` and return its job without waiting."""
+        device = _device_path(device)
+        options = {"lazy": lazy, "sync": sync}
+        return self._start_job("unmount", device, options,
+                               lambda: self.unmount(device, lazy=lazy, sync=sync))
+
+    def get_jobs(self) -> List[Dict[str, Any]]:
+        """Return queued, running and recently finished jobs, oldest first."""
+        return [job.to_dict() for job in self._jobs.values()]
+
+    def _start_job(self, operation: str, device: str, options: Dict[str, Any],
+                   action: Callable[[], Any]) -> StorageJob:
+        job = StorageJob(next(self._job_ids), operation, device, options)
+        self._jobs[job.id] = job
+        self._job_tasks[job.id] = start_background(f"storage-{operation}", self._run_job(job, action))
+        logger.info(f"Storage job {job.id}: {operation} {device} queued")
+        return job
+
+    async def _run_job(self, job: StorageJob, action: Callable[[], Any]) -> None:
+        # Jobs on one device run in submission order; other devices proceed in parallel
+        lock = self._device_locks.setdefault(job.device, asyncio.Lock())
+        try:
+            async with lock:
+                job.state = "running"
+                job.started = time.time()
+                try:
+                    result = await action()
+                except StorageError as e:
+                    job.state = "failed"
+                    job.error = str(e)
+                except Exception as e:
+                    # e.g. makedirs on a read-only rootfs; the job must still finish
+                    logger.error(f"Storage job {job.id}: {job.operation} {job.device} raised: {e}")
+                    job.state = "failed"
+                    job.error = str(e) or type(e).__name__
+                else:
+                    job.state = "succeeded"
+                    if job.operation == "mount":
+                        job.mount_point = result
+        finally:
+            self._job_tasks.pop(job.id, None)
+            if not job.done:
+                # Cancelled while queued or running
+                job.state = "failed"
+                job.error = job.error or "cancelled"
+            job.finished = time.time()
+            logger.info(f"Storage job {job.id}: {job.operation} {job.device} {job.state}")
+            self._trim_jobs()
+            for callback in self._job_listeners:
+                callback(job)
+
+    def _trim_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:-self.JOB_HISTORY]:
+            del self._jobs[job_id]
+
+    async def mount(self, device: str) -> str:
+        """Mount ``device`` under MEDIA_DIR, named after its label.
+
+        Returns:
+            The mount point.
+
+        Raises:
+            StorageError: If mount fails.
+        """
+        device = _device_path(device)
+        label = await self.get_device_label(device)
+        mount_point = os.path.join(MEDIA_DIR, label or os.path.basename(device))
+        os.makedirs(mount_point, exist_ok=True)
+
+        result = await run_command(["mount", device, mount_point], timeout=self.MOUNT_TIMEOUT)
+        if not result.ok:
+            error = "timed out" if result.timed_out else result.stderr.strip()
+            logger.error(f"Mount of {device} failed: {error}")
+            raise StorageError(error or f"mount exited with {result.returncode}")
+        logger.info(f"Mounted {device} at {mount_point}")
+        return mount_point
+
+    async def unmount(self, device: str, lazy: bool = False, sync: bool = False) -> None:
+        """Unmount ``device``.
+
+        Args:
+            device: Device path or name.
+            lazy: Detach now and finish once the filesystem is no longer busy.
+            sync: Flush dirty data first, so a lazy unmount leaves nothing
+                unwritten when the medium is pulled.
+
+        Raises:
+            StorageError: If umount fails.
+        """
+        device = _device_path(device)
+        if sync:
+            await asyncio.to_thread(os.sync)
+
+        args = ["umount", "-l", device] if lazy else ["umount", device]
+        result = await run_command(args, timeout=self.UNMOUNT_TIMEOUT)
+        if not result.ok:
+            error = "timed out" if result.timed_out else result.stderr.strip()
+            logger.error(f"Unmount of {device} failed: {error}")
+            raise StorageError(error or f"umount exited with {result.returncode}")
+        logger.info(f"Unmounted {device}")
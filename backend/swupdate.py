@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from cpio import CpioStreamParser
+from digest import Sha256
+
+logger = logging.getLogger(__name__)
+
+# Control socket of the swupdate daemon (CONFIG_SOCKET_CTRL_PATH)
+SWUPDATE_SOCKET = "/tmp/sockinstctrl"
+
+# ipc_message from swupdate's include/network_ipc.h, as laid out on 64-bit
+# targets: int magic, int type, then a union whose largest member is
+# instmsg (struct swupdate_request req, unsigned int len, char buf[2048])
+IPC_MAGIC = 0x14052001
+SWUPDATE_API_VERSION = 0x1
+REQ_INSTALL, ACK, NACK, GET_STATUS, POST_UPDATE = 0, 1, 2, 3, 4
+SOURCE_LOCAL = 4
+RUN_DEFAULT, RUN_DRYRUN = 0, 1
+# RECOVERY_STATUS
+IDLE, START, RUN, SUCCESS, FAILURE, DOWNLOAD, DONE, SUBPROCESS, PROGRESS = range(9)
+
+_HEADER = struct.Struct("<ii")
+# apiversion, source, dry_run, pad, len, info, software_set, running_mode,
+# disable_store_swu and padding to the 8 byte alignment of the request
+_INSTALL_REQUEST = struct.Struct("<Iii4xQ512s256s256s?7x")
+_STATUS = struct.Struct("<iii2048s")
+_INSTMSG_SIZE = _INSTALL_REQUEST.size + 4 + 2048
+# The union is padded to the 8 byte alignment of its members
+IPC_MESSAGE_SIZE = _HEADER.size + _INSTMSG_SIZE + (-_INSTMSG_SIZE % 8)
+
+# Bytes kept back from swupdate until the upload has been verified. They
+# include the cpio trailer, so swupdate cannot finish, and switch the boot
+# partition, before TriggerUpdate; dropping the connection instead makes
+# it fail the install and leave the running system as it is.
+STREAM_HOLDBACK = 64 * 1024
+# Chunks ahead of the stream position buffered in memory
+MAX_PENDING = 64 * 1024 * 1024
+
+
+class SwupdateError(Exception):
+    pass
+
+
+def _message(msg_type: int, payload: bytes = b"") -> bytes:
+    return (_HEADER.pack(IPC_MAGIC, msg_type) + payload).ljust(IPC_MESSAGE_SIZE, b"\0")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise SwupdateError("swupdate closed the connection")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_message(sock: socket.socket) -> Tuple[int, bytes]:
+    data = _recv_exact(sock, IPC_MESSAGE_SIZE)
+    magic, msg_type = _HEADER.unpack_from(data)
+    if magic != IPC_MAGIC:
+        raise SwupdateError(f"Bad IPC magic {magic:#x}")
+    return msg_type, data[_HEADER.size:]
+
+
+class SwupdateClient:
+    """Install an update by streaming it into swupdate's control socket."""
+
+    def __init__(self, socket_path: str = SWUPDATE_SOCKET, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.dry_run = False
+        self._sock: Optional[socket.socket] = None
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise SwupdateError(f"Cannot connect to swupdate at {self.socket_path}: {e}")
+        return sock
+
+    def start_install(self, size: int, dry_run: bool = False, info: str = "") -> None:
+        """Send REQ_INSTALL; the image bytes follow through ``send``.
+
+        Raises:
+            SwupdateError: If swupdate is not running or refuses the install.
+        """
+        request = _INSTALL_REQUEST.pack(
+            SWUPDATE_API_VERSION, SOURCE_LOCAL, RUN_DRYRUN if dry_run else RUN_DEFAULT,
+            size, info.encode()[:511], b"", b"", False,
+        )
+        sock = self._connect()
+        try:
+            sock.sendall(_message(REQ_INSTALL, request))
+            msg_type, _ = _recv_message(sock)
+        except (OSError, SwupdateError) as e:
+            sock.close()
+            raise SwupdateError(f"swupdate install request failed: {e}")
+        if msg_type != ACK:
+            sock.close()
+            raise SwupdateError("swupdate refused the install (another update running?)")
+        self._sock = sock
+        self.dry_run = dry_run
+
+    def send(self, data) -> None:
+        if self._sock is None:
+            raise SwupdateError("No install in progress")
+        try:
+            self._sock.sendall(data)
+        except OSError as e:
+            raise SwupdateError(f"swupdate stopped reading the image: {e}")
+
+    def finish(self) -> None:
+        """End the image; swupdate installs what it received."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def abort(self) -> None:
+        """Drop the connection mid-image; swupdate fails the install."""
+        self.finish()
+
+    def get_status(self) -> Dict[str, object]:
+        sock = self._connect()
+        try:
+            sock.sendall(_message(GET_STATUS))
+            _, data = _recv_message(sock)
+        except OSError as e:
+            raise SwupdateError(f"swupdate status request failed: {e}")
+        finally:
+            sock.close()
+        current, last_result, error, desc = _STATUS.unpack_from(data)
+        return {
+            "current": current,
+            "last_result": last_result,
+            "error": error,
+            "desc": desc.split(b"\0", 1)[0].decode(errors="replace"),
+        }
+
+    def wait_result(self, timeout: float = 600.0, interval: float = 0.5) -> Tuple[bool, str]:
+        """Poll GET_STATUS until swupdate is idle again; return (success, message)."""
+        deadline = time.monotonic() + timeout
+        message = ""
+        while True:
+            status = self.get_status()
+            if status["desc"]:
+                message = status["desc"]
+                logger.info(f"swupdate: {message}")
+            if status["current"] == IDLE:
+                return status["last_result"] == SUCCESS, message
+            if time.monotonic() > deadline:
+                raise SwupdateError("Timed out waiting for swupdate")
+            time.sleep(interval)
+
+    def post_update(self) -> None:
+        """Ask swupdate to run its post-update command (normally a reboot)."""
+        sock = self._connect()
+        try:
+            sock.sendall(_message(POST_UPDATE))
+            msg_type, _ = _recv_message(sock)
+        except OSError as e:
+            raise SwupdateError(f"swupdate post-update request failed: {e}")
+        finally:
+            sock.close()
+        if msg_type != ACK:
+            raise SwupdateError("swupdate refused the post-update request")
+
+
+class UpdateStream:
+    """Feeds upload chunks through the hash and cpio index into swupdate.
+
+    Chunks may arrive out of order; those ahead of the stream position are
+    buffered (up to MAX_PENDING bytes) until the gap before them is filled,
+    and repeats of bytes already streamed are ignored. Nothing is written
+    to /data. The last STREAM_HOLDBACK bytes stay in memory until
+    ``commit``; ``abort`` drops the connection without them.
+    """
+
+    def __init__(self, client: SwupdateClient, total_size: int,
+                 on_description: Optional[Callable[[bytes], None]] = None,
+                 holdback: int = STREAM_HOLDBACK):
+        self.client = client
+        self.total_size = total_size
+        self.position = 0
+        self.sha256 = Sha256()
+        self.archive = CpioStreamParser(capture=("sw-description",))
+        self._on_description = on_description
+        self._description_checked = False
+        self._holdback = holdback
+        self._tail = bytearray()
+        self._pending: Dict[int, bytes] = {}
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def received(self) -> int:
+        return self.position
+
+    @property
+    def complete(self) -> bool:
+        return self.position == self.total_size
+
+    def write(self, data: bytes, offset: int) -> None:
+        """Accept one chunk.
+
+        Raises:
+            ValueError: If the chunk lies outside the upload or too far ahead.
+            SwupdateError: If swupdate stopped reading.
+            CpioError: If the upload is not a newc archive.
+        """
+        end = offset + len(data)
+        if offset < 0 or end > self.total_size:
+            raise ValueError(f"Chunk [{offset}, {end}) outside upload of {self.total_size} bytes")
+        with self._lock:
+            if end <= self.position:
+                return
+            if offset > self.position:
+                if offset not in self._pending:
+                    if self._pending_bytes + len(data) > MAX_PENDING:
+                        raise ValueError(f"Chunk at {offset} is too far ahead of the stream at {self.position}")
+                    self._pending[offset] = bytes(data)
+                    self._pending_bytes += len(data)
+                return
+            self._consume(memoryview(data)[self.position - offset:])
+            self._drain_pending()
+
+    def _drain_pending(self) -> None:
+        while True:
+            ready = [start for start in self._pending if start <= self.position]
+            if not ready:
+                return
+            for start in sorted(ready):
+                data = self._pending.pop(start)
+                self._pending_bytes -= len(data)
+                if start + len(data) > self.position:
+                    self._consume(memoryview(data)[self.position - start:])
+
+    def _consume(self, view: memoryview) -> None:
+        self.sha256.update(view)
+        self.archive.feed(view)
+        if not self._description_checked and "sw-description" in self.archive.captured:
+            self._description_checked = True
+            if self._on_description is not None:
+                self._on_description(self.archive.captured["sw-description"])
+        self.position += len(view)
+        self._tail += view
+        if len(self._tail) > self._holdback:
+            cut = len(self._tail) - self._holdback
+            self.client.send(memoryview(self._tail)[:cut])
+            del self._tail[:cut]
+
+    def commit(self) -> None:
+        """Send the held-back bytes and end the stream."""
+        with self._lock:
+            self.client.send(self._tail)
+            self._tail.clear()
+            self.client.finish()
+
+    def abort(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._pending_bytes = 0
+            self._tail.clear()
+            self.sha256.close()
+            self.client.abort()
+
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+ZONEINFO_DIR = Path("/usr/share/zoneinfo")
+
+# Subtrees and files under zoneinfo that are not selectable timezones
+_SKIP_DIRS = {"posix", "right"}
+_SKIP_FILES = {"posixrules", "localtime", "Factory"}
+
+
+def parse_tzdata_zi(path: Path) -> List[str]:
+    """List zone and link names from a compiled tzdata.zi file.
+
+    Zone lines look like ``Z Europe/Berlin 0:53:28 - LMT 1893 Ap``, link
+    lines like ``L Etc/UTC UTC`` (target first, link name second).
+    """
+    names = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Z "):
+                parts = line.split(None, 2)
+                if len(parts) >= 2:
+                    names.append(parts[1])
+            elif line.startswith("L "):
+                parts = line.split()
+                if len(parts) >= 3:
+                    names.append(parts[2])
+    return names
+
+
+def parse_zone_tab(path: Path) -> List[str]:
+    """List timezone names from zone1970.tab or zone.tab (third column)."""
+    names = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 3 and parts[2]:
+                names.append(parts[2])
+    if names:
+        names.append("UTC")
+    return names
+
+
+def walk_zoneinfo(root: Path) -> List[str]:
+    """List timezone names by walking the zoneinfo tree for TZif files."""
+    names = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        if rel_dir == ".":
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS]
+            rel_dir = ""
+        for filename in filenames:
+            if filename in _SKIP_FILES or "." in filename:
+                continue
+            full = os.path.join(dirpath, filename)
+            try:
+                with open(full, "rb") as f:
+                    if f.read(4) != b"TZif":
+                        continue
+            except OSError:
+                continue
+            names.append(os.path.join(rel_dir, filename) if rel_dir else filename)
+    return names
+
+
+def load_timezones(root: Path = ZONEINFO_DIR) -> Optional[List[str]]:
+    """Build the timezone list from tzdata without forking timedatectl.
+
+    Tries ``tzdata.zi``, then ``zone1970.tab``, then walks the tree.
+
+    Args:
+        root: The zoneinfo directory.
+
+    Returns:
+        Timezone names, or None if no source was readable.
+    """
+    for filename, parser in (("tzdata.zi", parse_tzdata_zi), ("zone1970.tab", parse_zone_tab)):
+        path = root / filename
+        try:
+            names = parser(path)
+        except OSError:
+            continue
+        if names:
+            return names
+        logger.warning(f"No timezones found in {path}")
+
+    if root.is_dir():
+        names = walk_zoneinfo(root)
+        if names:
+            return names
+
+    logger.error(f"No timezone data found under {root}")
+    return None
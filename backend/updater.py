@@ -1,15 +1,21 @@
 #!/usr/bin/env python3
 
-import hashlib
+import json
 import logging
 import os
 import re
 import subprocess
-import tempfile
 import threading
+import time
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
+
+from chunkstore import ChunkStore
+from cpio import CpioError, CpioIndex, CpioStreamParser
+from delta import DeltaError, DeltaHeader, apply_delta, read_header
+from digest import Sha256, select_backend
+from swupdate import SWUPDATE_SOCKET, SwupdateClient, SwupdateError, UpdateStream
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +29,20 @@ MAX_UPLOAD_SIZE = 1024 * 1024 * 1024  # 1 GB
 
 DRY_RUN_FILE = Path("/data/updater-dry-run")
 
+# Last installed package, kept as the base for delta updates
+BASE_DIR = DATA_DIR / "updater-base"
+BASE_FILE = BASE_DIR / "software.swu"
+BASE_INFO = BASE_DIR / "software.json"
+
+SW_DESCRIPTION = "sw-description"
+SW_DESCRIPTION_SIG = "sw-description.sig"
+# Read size of the import pass; one buffer is reused for the whole file
+IMPORT_CHUNK_SIZE = 4 * 1024 * 1024
+# Missing ranges listed in the status; the count is always reported
+MAX_REPORTED_RANGES = 32
+# Default minimum spacing of progress notifications; state changes are sent at once
+STATUS_INTERVAL = 0.25
+
 
 class UpdaterState(Enum):
     IDLE = "idle"
@@ -33,16 +53,108 @@ class UpdaterState(Enum):
     ERROR = "error"
 
 
+class VerifyCancelled(Exception):
+    """Raised inside a verification job once the upload has been cancelled."""
+
+
 class UpdaterManager:
     def __init__(self):
         self._state = UpdaterState.IDLE
         self._progress = 0.0
         self._total_size = 0
         self._received_size = 0
-        self._sha256_ctx = hashlib.sha256()
+        self._store: Optional[ChunkStore] = None
+        self._stream: Optional[UpdateStream] = None
+        # Client's name for the file being uploaded; an upload resumes only for the same id
+        self._upload_id = ""
+        # Set once chunks sent before the last StartUpload are kept
+        self._resumed = False
+        # Stream uploads into swupdate instead of staging them on /data
+        self.streaming = False
+        self.swupdate_socket = SWUPDATE_SOCKET
         self._error_message = ""
         self._lock = threading.Lock()
         self._device_board = self._read_device_board()
+        # Neither changes without a reboot or a call to set_dry_run
+        self._current_version = self._read_current_version()
+        self._dry_run = self.is_dry_run()
+        # Keep each installed package as the base for the next delta
+        self.keep_base = True
+        self._base = self._read_base()
+        # Version, SHA-256 and size of the verified package, for keeping it as a base
+        self._package: Optional[dict] = None
+        self._hash_stats = {"backend": select_backend(), "bytes": 0, "seconds": 0.0, "throughput": 0}
+        self._stage: Optional[str] = None
+        self._stage_done = 0
+        self._stage_total = 0
+        self._cancel = threading.Event()
+        self._listeners: List[Callable[[dict], None]] = []
+        self.status_interval = STATUS_INTERVAL
+        self._notify_lock = threading.Lock()
+        self._last_notify = 0.0
+        self._notify_timer: Optional[threading.Timer] = None
+        self._resume_upload()
+
+    def add_status_listener(self, callback: Callable[[dict], None]) -> None:
+        """Register a callback run with the new status, from any thread, when it changes.
+
+        Upload and verification progress is reported at most every
+        ``status_interval`` seconds; state and stage changes are reported at once.
+        """
+        self._listeners.append(callback)
+
+    def _status_changed(self, force: bool = False) -> None:
+        with self._notify_lock:
+            wait = self._last_notify + self.status_interval - time.monotonic()
+            if not force and wait > 0:
+                # Trailing notification, so the last progress step is not lost
+                if self._notify_timer is None:
+                    self._notify_timer = threading.Timer(wait, self._flush_status)
+                    self._notify_timer.daemon = True
+                    self._notify_timer.start()
+                return
+            if self._notify_timer is not None:
+                self._notify_timer.cancel()
+                self._notify_timer = None
+            self._last_notify = time.monotonic()
+        self._notify_listeners()
+
+    def _flush_status(self) -> None:
+        with self._notify_lock:
+            self._notify_timer = None
+            self._last_notify = time.monotonic()
+        self._notify_listeners()
+
+    def _notify_listeners(self) -> None:
+        status = self.get_status()
+        for callback in self._listeners:
+            try:
+                callback(status)
+            except Exception as e:
+                logger.error(f"Updater status listener failed: {e}")
+
+    def _resume_upload(self) -> None:
+        store = ChunkStore.resume(PART_FILE)
+        if store is None:
+            return
+        self._store = store
+        self._upload_id = store.upload_id
+        self._resumed = True
+        self._total_size = store.total_size
+        self._received_size = store.received
+        self._progress = (store.received / store.total_size) * 100.0 if store.total_size else 0.0
+        self._state = UpdaterState.UPLOADING
+        logger.info(f"Resuming upload: {store.received} of {store.total_size} bytes received")
+
+    def _discard_upload(self) -> None:
+        if self._store is not None:
+            self._store.discard()
+            self._store = None
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream = None
+        self._upload_id = ""
+        self._resumed = False
 
     def _read_device_board(self) -> str:
         try:
@@ -68,6 +180,9 @@ class UpdaterManager:
         return self._error_message
 
     def get_current_version(self) -> str:
+        return self._current_version
+
+    def _read_current_version(self) -> str:
         try:
             if VERSION_FILE.exists():
                 with open(VERSION_FILE, "r") as f:
@@ -80,7 +195,26 @@ class UpdaterManager:
             logger.error(f"Failed to read version: {e}")
             return "unknown"
 
+    def _read_base(self) -> Optional[dict]:
+        try:
+            info = json.loads(BASE_INFO.read_text())
+        except (OSError, ValueError):
+            return None
+        if info.get("version") != self._current_version or not BASE_FILE.exists():
+            logger.info(f"No delta base for installed version {self._current_version}")
+            return None
+        return info
+
     def get_status(self) -> dict:
+        # Runs unlocked on chunk and timer threads while verify or cancel
+        # clear the upload, so each reference is read once
+        store, stream = self._store, self._stream
+        if store is not None:
+            missing = store.missing_ranges()
+        elif stream is not None and not stream.complete:
+            missing = [(stream.position, stream.total_size)]
+        else:
+            missing = []
         return {
             "state": self.state,
             "progress": self.progress,
@@ -89,9 +223,21 @@ class UpdaterManager:
             "device_board": self._device_board,
             "total_size": self._total_size,
             "received_size": self._received_size,
-            "dry_run": self.is_dry_run(),
+            "missing_ranges": [list(r) for r in missing[:MAX_REPORTED_RANGES]],
+            "missing_range_count": len(missing),
+            "hash": self._hash_stats,
+            "stage": self._stage_status(),
+            "dry_run": self._dry_run,
+            "mode": "stream" if stream is not None else "staged",
+            "base_version": self._base["version"] if self._base else "",
         }
 
+    def _stage_status(self) -> Optional[dict]:
+        stage = self._stage
+        if stage is None:
+            return None
+        return {"name": stage, "done": self._stage_done, "total": self._stage_total}
+
     @staticmethod
     def is_dry_run() -> bool:
         return DRY_RUN_FILE.exists()
@@ -106,258 +252,548 @@ class UpdaterManager:
                 logger.info("Dry-run mode DISABLED")
         except Exception as e:
             logger.error(f"Failed to set dry-run: {e}")
+        self._dry_run = self.is_dry_run()
+        self._status_changed(force=True)
 
-    def start_upload(self, total_size: int) -> bool:
-        with self._lock:
-            if self._state not in (UpdaterState.IDLE, UpdaterState.ERROR):
-                logger.warning(f"Cannot start upload in state {self._state}")
-                return False
+    def start_upload(self, total_size: int, delta: bool = False, upload_id: str = "") -> bool:
+        """Begin a chunked upload of ``total_size`` bytes.
 
-            if total_size > MAX_UPLOAD_SIZE:
-                self._error_message = f"File too large ({total_size} bytes, max {MAX_UPLOAD_SIZE} bytes)"
-                self._state = UpdaterState.ERROR
-                return False
+        ``upload_id`` identifies the file on the client side (e.g. name,
+        size and modification time). An unfinished upload with the same
+        id and size, even one from before a daemon restart, is continued;
+        anything else starts over. An empty id never resumes. A resumed
+        upload must be finalised with its SHA-256.
 
-            available = self._get_available_space()
-            if available < total_size:
-                self._error_message = f"Not enough space on /data ({available} bytes available, {total_size} needed)"
-                self._state = UpdaterState.ERROR
-                return False
+        A ``delta`` upload is always staged, since it is rebuilt against
+        the kept base package before any checks run.
+        """
+        with self._lock:
+            started = self._start_upload(total_size, delta, upload_id)
+        self._status_changed(force=True)
+        return started
+
+    def _start_upload(self, total_size: int, delta: bool, upload_id: str) -> bool:
+        # Called with the lock held
+        upload = self._store or self._stream
+        if self._state == UpdaterState.UPLOADING and upload is not None:
+            same_kind = delta == (upload is self._store and self._store.delta)
+            if upload_id and upload_id == self._upload_id and upload.total_size == total_size and same_kind:
+                # Same upload restarted by the client: keep what has arrived
+                logger.info(f"Upload resumed: {upload.received} of {total_size} bytes already received")
+                self._resumed = True
+                return True
+            # Another file: what has arrived belongs to something else
+            logger.info("Discarding unfinished upload of another file")
+            self._discard_upload()
+            self._state = UpdaterState.IDLE
 
-            self._total_size = total_size
-            self._received_size = 0
-            self._progress = 0.0
-            self._sha256_ctx = hashlib.sha256()
-            self._error_message = ""
-            self._state = UpdaterState.UPLOADING
+        if self._state not in (UpdaterState.IDLE, UpdaterState.ERROR):
+            logger.warning(f"Cannot start upload in state {self._state}")
+            return False
 
-            try:
-                PART_FILE.unlink(missing_ok=True)
-            except Exception:
-                pass
+        if total_size > MAX_UPLOAD_SIZE:
+            self._error_message = f"File too large ({total_size} bytes, max {MAX_UPLOAD_SIZE} bytes)"
+            self._state = UpdaterState.ERROR
+            return False
 
-            logger.info(f"Upload started: {total_size} bytes")
+        if delta and self._base is None:
+            self._error_message = f"No base package for a delta update of version {self._current_version}"
+            self._state = UpdaterState.ERROR
+            return False
+
+        self._discard_upload()
+        if self.streaming and not delta and self._start_stream(total_size):
+            self._upload_id = upload_id
             return True
 
-    def write_chunk(self, data: bytes, offset: int) -> float:
-        with self._lock:
-            if self._state != UpdaterState.UPLOADING:
-                return self._progress
+        available = self._get_available_space()
+        # The rebuilt package is about the size of the base
+        needed = total_size + (self._base["size"] if delta else 0)
+        if available < needed:
+            self._error_message = f"Not enough space on /data ({available} bytes available, {needed} needed)"
+            self._state = UpdaterState.ERROR
+            return False
 
-            try:
-                mode = "r+b" if PART_FILE.exists() else "wb"
-                if mode == "wb" and offset > 0:
-                    with open(PART_FILE, "wb") as f:
-                        f.seek(offset)
-                        f.write(b"\x00" * offset)
-                    mode = "r+b"
+        try:
+            self._store = ChunkStore.create(PART_FILE, total_size, upload_id, delta=delta)
+        except OSError as e:
+            self._error_message = f"Cannot create upload file: {e}"
+            self._state = UpdaterState.ERROR
+            return False
 
-                with open(PART_FILE, mode) as f:
-                    f.seek(offset)
-                    f.write(data)
+        self._upload_id = upload_id
+        self._total_size = total_size
+        self._received_size = 0
+        self._progress = 0.0
+        self._error_message = ""
+        self._state = UpdaterState.UPLOADING
 
-                self._sha256_ctx.update(data)
-                self._received_size += len(data)
-                self._progress = min(100.0, (self._received_size / self._total_size) * 100.0)
+        logger.info(f"Upload started: {total_size} bytes")
+        return True
 
-            except Exception as e:
-                logger.error(f"Write chunk failed: {e}")
-                self._error_message = f"Write failed: {e}"
-                self._state = UpdaterState.ERROR
+    def _start_stream(self, total_size: int) -> bool:
+        # Called with the lock held
+        client = SwupdateClient(self.swupdate_socket)
+        try:
+            client.start_install(total_size, dry_run=self._dry_run, info="streambox-settings upload")
+        except SwupdateError as e:
+            logger.warning(f"Streaming unavailable, staging on {DATA_DIR} instead: {e}")
+            return False
 
-            return self._progress
+        self._stream = UpdateStream(client, total_size, on_description=self._check_description)
+        self._total_size = total_size
+        self._received_size = 0
+        self._progress = 0.0
+        self._error_message = ""
+        self._state = UpdaterState.UPLOADING
+        logger.info(f"Upload started: {total_size} bytes, streaming into swupdate")
+        return True
 
-    def finalize_upload(self, expected_sha256: str) -> bool:
-        with self._lock:
-            if self._state != UpdaterState.UPLOADING:
-                return False
+    def _check_description(self, content: bytes) -> None:
+        # Reject a package for another board before swupdate installs any of it
+        error = self._check_board(parse_board(content.decode(errors="replace")))
+        if error is not None:
+            raise SwupdateError(error)
+
+    def write_chunk(self, data: bytes, offset: int) -> float:
+        """Store one upload chunk; safe to call from several threads at once.
 
-            self._state = UpdaterState.VERIFYING
+        The manager lock is held only to look up the store and to update
+        the counters, so concurrent chunks are written to disk in parallel.
+        """
+        with self._lock:
+            upload = self._store or self._stream
+            if self._state != UpdaterState.UPLOADING or upload is None:
+                return self._progress
 
-        computed = self._sha256_ctx.hexdigest()
-        logger.info(f"SHA-256 verification: expected={expected_sha256}, computed={computed}")
+        try:
+            upload.write(data, offset)
+        except Exception as e:
+            with self._lock:
+                # A store closed by cancel or finalize is not a write failure
+                failed = upload in (self._store, self._stream) and self._state == UpdaterState.UPLOADING
+                if failed:
+                    logger.error(f"Write chunk failed: {e}")
+                    self._error_message = f"Write failed: {e}"
+                    self._state = UpdaterState.ERROR
+                    if upload is self._stream:
+                        # swupdate must not install a stream with a hole in it
+                        self._discard_upload()
+                progress = self._progress
+            if failed:
+                self._status_changed(force=True)
+            return progress
 
         with self._lock:
-            if computed.lower() != expected_sha256.lower():
-                self._error_message = f"SHA-256 mismatch (expected {expected_sha256[:16]}..., got {computed[:16]}...)"
-                self._state = UpdaterState.ERROR
-                try:
-                    PART_FILE.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                logger.error(self._error_message)
+            if upload in (self._store, self._stream):
+                self._received_size = upload.received
+                self._progress = (self._received_size / self._total_size) * 100.0 if self._total_size else 100.0
+            progress = self._progress
+        self._status_changed()
+        return progress
+
+    def finalize_upload(self, expected_sha256: str, background: bool = False) -> bool:
+        """Verify a complete upload and move it into place.
+
+        An empty ``expected_sha256`` skips the comparison, except for a
+        resumed upload, which is refused without one. With
+        ``background`` the checks run on a worker thread and the return
+        value only says whether they were started; the outcome is the
+        READY or ERROR state, reported through the status listeners.
+        """
+        with self._lock:
+            upload = self._store or self._stream
+            if self._state != UpdaterState.UPLOADING or upload is None:
                 return False
 
-            try:
-                PART_FILE.rename(FINAL_FILE)
-            except Exception as e:
-                self._error_message = f"Failed to finalize: {e}"
-                self._state = UpdaterState.ERROR
-                return False
+            complete = upload.complete
+            ready = False
+            if not complete:
+                missing = upload.total_size - upload.received
+                ranges = len(upload.missing_ranges()) if upload is self._store else 1
+                self._error_message = f"Upload incomplete: {missing} bytes in {ranges} ranges missing"
+                logger.error(self._error_message)
+            elif self._resumed and not expected_sha256:
+                # Chunks from an earlier session are only known to be of this file by the digest
+                self._error_message = "A resumed upload must be finalised with its SHA-256"
+                logger.error(self._error_message)
+            else:
+                ready = True
+                self._begin_verify()
 
-            if not self._verify_cpio_signature():
-                self._error_message = "Invalid update package: missing sw-description.sig"
-                self._state = UpdaterState.ERROR
+        if not ready:
+            self._status_changed(force=True)
+            return False
+
+        if upload is self._stream:
+            return self._run_verify(self._verify_stream, background, upload, expected_sha256)
+        return self._run_verify(self._verify_upload, background, upload, expected_sha256)
+
+    def _verify_upload(self, store: ChunkStore, expected_sha256: str) -> bool:
+        cleanup = [PART_FILE, FINAL_FILE]
+        try:
+            self._set_stage("hash", store.total_size)
+            computed = store.sha256_hexdigest(progress=self._stage_progress)
+            self._hash_stats = store.hash_stats()
+            if expected_sha256:
+                logger.info(f"SHA-256 verification: expected={expected_sha256}, computed={computed}")
+            else:
+                logger.info(f"Upload SHA-256 (computed only): {computed}, skipping comparison")
+
+            if expected_sha256 and computed.lower() != expected_sha256.lower():
+                return self._verify_failed(
+                    f"SHA-256 mismatch (expected {expected_sha256[:16]}..., got {computed[:16]}...)", cleanup)
+
+            with self._lock:
+                store.close()
+                self._store = None
+            # The start call says what the upload is; the content only has to agree
+            header = read_header(PART_FILE)
+            if store.delta and header is None:
+                return self._verify_failed("Upload was started as a delta but is not a delta file", cleanup)
+            if not store.delta and header is not None:
+                return self._verify_failed("Upload is a delta; start it with StartDeltaUpload", cleanup)
+            if header is not None:
+                computed = self._apply_delta(header, PART_FILE, FINAL_FILE)
+                PART_FILE.unlink()
+            else:
+                self._set_stage("copy", store.total_size)
                 try:
-                    FINAL_FILE.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                return False
+                    PART_FILE.rename(FINAL_FILE)
+                except Exception as e:
+                    return self._verify_failed(f"Failed to finalize: {e}", cleanup)
+                self._stage_progress(store.total_size)
+            size = FINAL_FILE.stat().st_size
 
-            pkg_board = self._extract_board_from_sw_description()
-            if pkg_board and self._device_board:
-                pkg_norm = pkg_board.replace("-", "_").replace(".", "_").lower()
-                dev_norm = self._device_board.replace("-", "_").replace(".", "_").lower()
-                if pkg_norm != dev_norm:
-                    self._error_message = (
-                        f"Board mismatch: package is for '{pkg_board}' "
-                        f"but this device is '{self._device_board}'"
-                    )
-                    self._state = UpdaterState.ERROR
-                    logger.error(self._error_message)
-                    try:
-                        FINAL_FILE.unlink(missing_ok=True)
-                    except Exception:
-                        pass
-                    return False
-                logger.info(f"Board match OK: package={pkg_board} device={self._device_board}")
+            self._set_stage("index", size)
+            if not self._verify_cpio_signature():
+                return self._verify_failed("Invalid update package: missing sw-description.sig", cleanup)
+            self._stage_progress(size)
+
+            self._set_stage("board", size)
+            description = self._read_sw_description()
+            error = self._check_board(parse_board(description) if description is not None else None)
+            if error is not None:
+                return self._verify_failed(error, cleanup)
+            self._package = {"version": parse_version(description or ""), "sha256": computed, "size": size}
 
-            self._state = UpdaterState.READY
             logger.info("Upload finalized and verified successfully")
-            return True
+            return self._verify_succeeded(cleanup)
+
+        except VerifyCancelled:
+            return self._verify_cancelled(cleanup)
+        except DeltaError as e:
+            return self._verify_failed(f"Delta update failed: {e}", cleanup)
+        except Exception as e:
+            return self._verify_failed(f"Verification failed: {e}", cleanup)
+
+    def _apply_delta(self, header: DeltaHeader, src: Path, dst: Path, delta_sha256: Optional[Sha256] = None,
+                     archive: Optional[CpioStreamParser] = None) -> str:
+        """Rebuild the package a delta describes against the kept base.
+
+        Returns the SHA-256 of the rebuilt package.
+
+        Raises:
+            DeltaError: If the delta is not for the kept base or does not rebuild cleanly.
+        """
+        base = self._base
+        if base is None:
+            raise DeltaError(f"No base package kept for installed version {self._current_version}")
+        if header.base_version != base["version"] or header.base_sha256 != base["sha256"]:
+            raise DeltaError(f"Delta is for version {header.base_version}, installed version is {base['version']}")
+
+        self._set_stage("patch", header.target_size)
+        logger.info(f"Rebuilding {header.target_size} byte package from delta against {base['version']}")
+        sha256 = Sha256()
+        try:
+            computed = apply_delta(src, BASE_FILE, dst, sha256=sha256, delta_sha256=delta_sha256,
+                                   feed=archive.feed if archive is not None else None,
+                                   progress=self._stage_progress)
+        finally:
+            sha256.close()
+        self._hash_stats = sha256.stats()
+        return computed
+
+    def _verify_stream(self, stream: UpdateStream, expected_sha256: str) -> bool:
+        # All but the held-back tail is already in swupdate; a failed check
+        # drops the connection, so swupdate fails the install
+        try:
+            self._set_stage("hash", stream.total_size)
+            computed = stream.sha256.hexdigest()
+            self._hash_stats = stream.sha256.stats()
+            if expected_sha256:
+                logger.info(f"SHA-256 verification: expected={expected_sha256}, computed={computed}")
+            else:
+                logger.info(f"Upload SHA-256 (computed only): {computed}, skipping comparison")
+
+            if expected_sha256 and computed.lower() != expected_sha256.lower():
+                return self._verify_failed(
+                    f"SHA-256 mismatch (expected {expected_sha256[:16]}..., got {computed[:16]}...)", [])
+            self._stage_progress(stream.total_size)
+
+            self._set_stage("index", stream.total_size)
+            if not stream.archive.done or SW_DESCRIPTION_SIG not in stream.archive.names:
+                return self._verify_failed("Invalid update package: missing sw-description.sig", [])
+            self._stage_progress(stream.total_size)
+
+            # The board was checked when sw-description streamed past
+            self._set_stage("board", stream.total_size)
+            if SW_DESCRIPTION not in stream.archive.captured:
+                logger.error("No sw-description in update package")
+            # Nothing is left on disk to keep as a delta base
+            self._package = None
+
+            logger.info("Streamed upload verified; swupdate is waiting for the last bytes")
+            return self._verify_succeeded([])
+
+        except VerifyCancelled:
+            return self._verify_cancelled([])
+        except Exception as e:
+            return self._verify_failed(f"Verification failed: {e}", [])
+
+    def _begin_verify(self) -> None:
+        # Called with the lock held
+        self._state = UpdaterState.VERIFYING
+        self._error_message = ""
+        self._package = None
+        self._cancel.clear()
+
+    def _run_verify(self, job: Callable[..., bool], background: bool, *args) -> bool:
+        if not background:
+            return job(*args)
+        thread = threading.Thread(target=job, args=args, name="updater-verify", daemon=True)
+        thread.start()
+        return True
+
+    def _set_stage(self, name: str, total: int) -> None:
+        if self._cancel.is_set():
+            raise VerifyCancelled()
+        self._stage = name
+        self._stage_done = 0
+        self._stage_total = total
+        logger.info(f"Verification stage: {name}")
+        self._status_changed(force=True)
+
+    def _stage_progress(self, done: int) -> None:
+        """Record stage progress; raises VerifyCancelled once cancelled."""
+        if self._cancel.is_set():
+            raise VerifyCancelled()
+        self._stage_done = done
+        self._status_changed()
+
+    def _verify_failed(self, error: str, cleanup: List[Path]) -> bool:
+        logger.error(error)
+        with self._lock:
+            self._discard_upload()
+            self._remove(cleanup)
+            self._error_message = error
+            self._state = UpdaterState.ERROR
+            self._stage = None
+        self._status_changed(force=True)
+        return False
+
+    def _verify_succeeded(self, cleanup: List[Path]) -> bool:
+        with self._lock:
+            cancelled = self._cancel.is_set()
+            if cancelled:
+                # Cancelled after the last check: treat it like cancelling READY
+                self._cleanup_cancelled(cleanup)
+            else:
+                self._state = UpdaterState.READY
+                self._stage = None
+        self._status_changed(force=True)
+        return not cancelled
+
+    def _verify_cancelled(self, cleanup: List[Path]) -> bool:
+        with self._lock:
+            self._cleanup_cancelled(cleanup)
+        self._status_changed(force=True)
+        return False
+
+    def _cleanup_cancelled(self, cleanup: List[Path]) -> None:
+        # Called with the lock held
+        self._discard_upload()
+        self._remove(cleanup)
+        self._reset()
+        logger.info("Verification cancelled")
+
+    @staticmethod
+    def _remove(paths: List[Path]) -> None:
+        for path in paths:
+            try:
+                path.unlink(missing_ok=True)
+            except Exception:
+                pass
+
+    def _reset(self) -> None:
+        self._state = UpdaterState.IDLE
+        self._progress = 0.0
+        self._total_size = 0
+        self._received_size = 0
+        self._error_message = ""
+        self._stage = None
 
     def trigger_update(self) -> bool:
         with self._lock:
             if self._state != UpdaterState.READY:
                 return False
 
-            if not FINAL_FILE.exists():
+            stream = self._stream
+            if stream is None and not FINAL_FILE.exists():
                 self._error_message = "Update file not found"
                 self._state = UpdaterState.ERROR
                 return False
 
             self._state = UpdaterState.UPDATING
 
+        self._status_changed(force=True)
         logger.info("Triggering OTA update...")
 
-        thread = threading.Thread(target=self._run_update, daemon=True)
+        if stream is not None:
+            thread = threading.Thread(target=self._run_stream_update, args=(stream,), daemon=True)
+        else:
+            thread = threading.Thread(target=self._run_update, daemon=True)
         thread.start()
         return True
 
     def cancel_upload(self) -> bool:
         with self._lock:
+            if self._state == UpdaterState.VERIFYING:
+                # The worker stops at its next progress step, cleans up and notifies
+                self._cancel.set()
+                logger.info("Cancelling verification")
+                return True
+
             if self._state not in (UpdaterState.UPLOADING, UpdaterState.READY, UpdaterState.ERROR):
                 return False
 
             try:
+                self._discard_upload()
                 PART_FILE.unlink(missing_ok=True)
                 FINAL_FILE.unlink(missing_ok=True)
             except Exception:
                 pass
 
-            self._state = UpdaterState.IDLE
-            self._progress = 0.0
-            self._total_size = 0
-            self._received_size = 0
-            self._error_message = ""
+            self._reset()
             logger.info("Upload cancelled")
-            return True
 
-    def import_local_file(self, filepath: str, expected_sha256: str) -> bool:
+        self._status_changed(force=True)
+        return True
+
+    def import_local_file(self, filepath: str, expected_sha256: str, background: bool = False) -> bool:
+        """Verify an update package already on the device and copy it into place.
+
+        ``background`` works as for ``finalize_upload``.
+        """
         with self._lock:
             if self._state not in (UpdaterState.IDLE, UpdaterState.ERROR):
                 self._error_message = f"Cannot import in state {self._state}"
                 return False
-            self._state = UpdaterState.VERIFYING
-            self._error_message = ""
+            self._discard_upload()
 
-        src = Path(filepath)
-        if not src.exists():
-            with self._lock:
+            src = Path(filepath)
+            found = src.exists()
+            if not found:
                 self._error_message = f"File not found: {filepath}"
                 self._state = UpdaterState.ERROR
+            else:
+                self._begin_verify()
+
+        if not found:
+            self._status_changed(force=True)
             return False
+        return self._run_verify(self._verify_import, background, src, expected_sha256)
 
+    def _verify_import(self, src: Path, expected_sha256: str) -> bool:
+        in_place = src.resolve() == FINAL_FILE.resolve()
+        try:
+            header = read_header(src)
+        except (OSError, DeltaError) as e:
+            return self._verify_failed(f"Import failed: {e}", [])
+        if in_place:
+            # Never remove the source; a rebuilt delta replaces it only at the end
+            cleanup = [] if header is None else [PART_FILE]
+        else:
+            cleanup = [PART_FILE, FINAL_FILE]
+        # Hashing, indexing and copying share one read of the source
+        sha256 = Sha256()
         try:
             file_size = src.stat().st_size
             self._total_size = file_size
             self._received_size = file_size
             self._progress = 100.0
 
-            sha256 = hashlib.sha256()
-            with open(src, "rb") as f:
-                while True:
-                    chunk = f.read(8 * 1024 * 1024)
-                    if not chunk:
-                        break
-                    sha256.update(chunk)
-
-            computed = sha256.hexdigest()
+            if header is not None:
+                PART_FILE.unlink(missing_ok=True)
+                archive = CpioStreamParser(capture=(SW_DESCRIPTION,))
+                target = self._apply_delta(header, src, PART_FILE, delta_sha256=sha256, archive=archive)
+                computed = sha256.hexdigest()
+            elif in_place:
+                logger.info("Source is already at destination, skipping copy")
+                self._set_stage("hash", file_size)
+                computed, archive = import_pass(src, None, sha256=sha256, progress=self._stage_progress)
+            else:
+                self._set_stage("copy", file_size)
+                PART_FILE.unlink(missing_ok=True)
+                computed, archive = import_pass(src, PART_FILE, sha256=sha256, progress=self._stage_progress)
+            if header is None:
+                target = computed
+                self._hash_stats = sha256.stats()
 
             if expected_sha256:
                 logger.info(f"Local import SHA-256: expected={expected_sha256}, computed={computed}")
                 if computed.lower() != expected_sha256.lower():
-                    with self._lock:
-                        self._error_message = f"SHA-256 mismatch (expected {expected_sha256[:16]}..., got {computed[:16]}...)"
-                        self._state = UpdaterState.ERROR
-                    return False
+                    return self._verify_failed(
+                        f"SHA-256 mismatch (expected {expected_sha256[:16]}..., got {computed[:16]}...)", cleanup)
             else:
                 logger.info(f"Local import SHA-256 (computed only): {computed}, skipping comparison")
 
-            src_resolved = src.resolve()
-            dst_resolved = FINAL_FILE.resolve()
-            if src_resolved != dst_resolved:
-                try:
-                    FINAL_FILE.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                import shutil
-                shutil.copy2(str(src), str(FINAL_FILE))
-            else:
-                logger.info("Source is already at destination, skipping copy")
+            size = header.target_size if header is not None else file_size
+            self._set_stage("index", size)
+            if not archive.done or SW_DESCRIPTION_SIG not in archive.names:
+                return self._verify_failed("Invalid update package: missing sw-description.sig", cleanup)
+            self._stage_progress(size)
 
-            if not self._verify_cpio_signature():
-                with self._lock:
-                    self._error_message = "Invalid update package: missing sw-description.sig"
-                    self._state = UpdaterState.ERROR
-                if src_resolved != dst_resolved:
-                    try:
-                        FINAL_FILE.unlink(missing_ok=True)
-                    except Exception:
-                        pass
-                return False
+            self._set_stage("board", size)
+            description = archive.captured.get(SW_DESCRIPTION)
+            if description is None:
+                logger.error("No sw-description in update package")
+            else:
+                error = self._check_board(parse_board(description.decode(errors="replace")))
+                if error is not None:
+                    return self._verify_failed(error, cleanup)
+            version = parse_version(description.decode(errors="replace")) if description is not None else None
+            self._package = {"version": version, "sha256": target, "size": size}
 
-            pkg_board = self._extract_board_from_sw_description()
-            if pkg_board and self._device_board:
-                pkg_norm = pkg_board.replace("-", "_").replace(".", "_").lower()
-                dev_norm = self._device_board.replace("-", "_").replace(".", "_").lower()
-                if pkg_norm != dev_norm:
-                    with self._lock:
-                        self._error_message = (
-                            f"Board mismatch: package is for '{pkg_board}' "
-                            f"but this device is '{self._device_board}'"
-                        )
-                        self._state = UpdaterState.ERROR
-                    logger.error(self._error_message)
-                    if src_resolved != dst_resolved:
-                        try:
-                            FINAL_FILE.unlink(missing_ok=True)
-                        except Exception:
-                            pass
-                    return False
-                logger.info(f"Board match OK: package={pkg_board} device={self._device_board}")
+            if not in_place or header is not None:
+                PART_FILE.rename(FINAL_FILE)
 
-            with self._lock:
-                self._state = UpdaterState.READY
             logger.info("Local file import verified successfully")
-            return True
+            return self._verify_succeeded(cleanup)
 
+        except VerifyCancelled:
+            return self._verify_cancelled(cleanup)
+        except DeltaError as e:
+            return self._verify_failed(f"Delta update failed: {e}", cleanup)
         except Exception as e:
-            with self._lock:
-                self._error_message = f"Import failed: {e}"
-                self._state = UpdaterState.ERROR
             logger.error(f"Local import error: {e}")
-            return False
+            return self._verify_failed(f"Import failed: {e}", cleanup)
+        finally:
+            sha256.close()
+
+    def _check_board(self, pkg_board: Optional[str]) -> Optional[str]:
+        """Return an error message if the package is built for another board."""
+        if not pkg_board or not self._device_board:
+            return None
+        pkg_norm = pkg_board.replace("-", "_").replace(".", "_").lower()
+        dev_norm = self._device_board.replace("-", "_").replace(".", "_").lower()
+        if pkg_norm != dev_norm:
+            return (
+                f"Board mismatch: package is for '{pkg_board}' "
+                f"but this device is '{self._device_board}'"
+            )
+        logger.info(f"Board match OK: package={pkg_board} device={self._device_board}")
+        return None
 
     def _run_update(self):
         if self.is_dry_run():
@@ -371,8 +807,12 @@ class UpdaterManager:
                 self._state = UpdaterState.IDLE
                 self._progress = 0.0
                 self._error_message = ""
+            self._status_changed(force=True)
             return
 
+        if self.keep_base:
+            self._keep_base()
+
         try:
             result = subprocess.run(
                 [UPDATE_SCRIPT],
@@ -391,53 +831,81 @@ class UpdaterManager:
             with self._lock:
                 self._error_message = f"Update failed: {e}"
                 self._state = UpdaterState.ERROR
+            self._status_changed(force=True)
+
+    def _run_stream_update(self, stream: UpdateStream) -> None:
+        client = stream.client
+        try:
+            stream.commit()
+            success, message = client.wait_result()
+        except SwupdateError as e:
+            success, message = False, str(e)
+        with self._lock:
+            self._stream = None
+
+        if not success:
+            error = f"Update failed: {message or 'swupdate reported a failure'}"
+            logger.error(error)
+            with self._lock:
+                self._error_message = error
+                self._state = UpdaterState.ERROR
+            self._status_changed(force=True)
+            return
+
+        if client.dry_run:
+            logger.info("DRY-RUN: swupdate checked the streamed package without installing it")
+            with self._lock:
+                self._reset()
+            self._status_changed(force=True)
+            return
+
+        logger.info("swupdate installed the streamed package, requesting reboot")
+        try:
+            client.post_update()
+        except SwupdateError as e:
+            logger.error(f"Post-update request failed: {e}")
+            with self._lock:
+                self._error_message = f"Update installed, but the reboot request failed: {e}"
+                self._state = UpdaterState.ERROR
+            self._status_changed(force=True)
+
+    def _keep_base(self) -> None:
+        """Hard-link the package being installed as the base for the next delta."""
+        package = self._package
+        if package is None or not package["version"]:
+            logger.warning("Package version unknown, not keeping it as a delta base")
+            return
+        staged = BASE_DIR / "software.swu.new"
+        try:
+            BASE_DIR.mkdir(exist_ok=True)
+            BASE_INFO.unlink(missing_ok=True)
+            staged.unlink(missing_ok=True)
+            os.link(FINAL_FILE, staged)
+            staged.rename(BASE_FILE)
+            BASE_INFO.write_text(json.dumps(package))
+            logger.info(f"Kept version {package['version']} as the delta base")
+        except OSError as e:
+            logger.warning(f"Cannot keep delta base: {e}")
 
     def _verify_cpio_signature(self) -> bool:
         try:
-            result = subprocess.run(
-                ["cpio", "-t", "-F", str(FINAL_FILE)],
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-            return "sw-description.sig" in result.stdout
-        except Exception as e:
+            with CpioIndex(FINAL_FILE) as archive:
+                return SW_DESCRIPTION_SIG in archive
+        except (OSError, CpioError) as e:
             logger.error(f"CPIO verification failed: {e}")
             return False
 
-    def _extract_board_from_sw_description(self) -> Optional[str]:
+    def _read_sw_description(self) -> Optional[str]:
         try:
-            tmpdir = Path(tempfile.mkdtemp(prefix="updater-"))
-            result = subprocess.run(
-                ["cpio", "-i", "-F", str(FINAL_FILE), "sw-description"],
-                capture_output=True,
-                text=True,
-                timeout=30,
-                cwd=str(tmpdir),
-            )
-            desc_file = tmpdir / "sw-description"
-            if not desc_file.exists():
-                logger.error(f"Failed to extract sw-description from cpio")
-                return None
-
-            with open(desc_file, "r") as f:
-                content = f.read()
-
-            desc_file.unlink()
-            tmpdir.rmdir()
-
-            for line in content.split("\n"):
-                line = line.strip()
-                m = re.match(r'^([a-z][a-z0-9_.]*)\s*=\s*\{$', line)
-                if m:
-                    board = m.group(1)
-                    if board != "software":
-                        return board
-            logger.warning("Could not find board name in sw-description")
+            with CpioIndex(FINAL_FILE) as archive:
+                content = archive.read(SW_DESCRIPTION)
+        except (OSError, CpioError) as e:
+            logger.error(f"Failed to read sw-description: {e}")
             return None
-        except Exception as e:
-            logger.error(f"Failed to parse sw-description: {e}")
+        if content is None:
+            logger.error("No sw-description in update package")
             return None
+        return content.decode(errors="replace")
 
     def _get_available_space(self) -> int:
         try:
@@ -445,3 +913,97 @@ class UpdaterManager:
             return stat.f_bavail * stat.f_frsize
         except Exception:
             return 0
+
+
+def parse_board(sw_description: str) -> Optional[str]:
+    """Return the board name a sw-description is written for, if any."""
+    for line in sw_description.split("\n"):
+        line = line.strip()
+        m = re.match(r'^([a-z][a-z0-9_.]*)\s*=\s*\{$', line)
+        if m:
+            board = m.group(1)
+            if board != "software":
+                return board
+    logger.warning("Could not find board name in sw-description")
+    return None
+
+
+def parse_version(sw_description: str) -> Optional[str]:
+    """Return the software version a sw-description declares, if any."""
+    m = re.search(r'^\s*version\s*=\s*"([^"]+)"\s*;', sw_description, re.MULTILINE)
+    return m.group(1) if m else None
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, length: int) -> None:
+    while length:
+        copied = os.copy_file_range(src_fd, dst_fd, length, offset, offset)
+        if copied == 0:
+            raise OSError(f"Source ended early at {offset} bytes")
+        offset += copied
+        length -= copied
+
+
+def import_pass(src: Path, dst: Optional[Path], chunk_size: int = IMPORT_CHUNK_SIZE,
+                sha256: Optional[Sha256] = None,
+                progress: Optional[Callable[[int], None]] = None) -> Tuple[str, CpioStreamParser]:
+    """Hash, index and copy an update package in a single read of the source.
+
+    Each chunk is read once into a reused buffer, hashed and fed to the
+    cpio parser, which keeps sw-description. The copy to ``dst`` is done
+    with copy_file_range() on the same byte range, which the kernel serves
+    from the page cache just filled (or shares extents on reflink
+    filesystems); where that is unsupported the buffer is written instead.
+    When ``dst`` is on the same filesystem it is hard-linked to ``src`` and
+    nothing is copied. Pass ``sha256`` to choose the digest backend or to
+    read its timing afterwards. ``progress`` is called with the bytes done
+    after every chunk; an exception it raises aborts the pass.
+
+    Returns:
+        The SHA-256 hex digest and the parser, whose ``done`` is False if
+        the archive is not a complete newc cpio.
+    """
+    sha256 = sha256 or Sha256()
+    archive = CpioStreamParser(capture=(SW_DESCRIPTION,))
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+
+    with open(src, "rb", buffering=0) as fin:
+        out = None
+        if dst is not None:
+            try:
+                os.link(src, dst)
+            except OSError:
+                out = open(dst, "wb")
+        try:
+            use_copy_range = hasattr(os, "copy_file_range")
+            parsing = True
+            offset = 0
+            while True:
+                n = fin.readinto(buf)
+                if not n:
+                    break
+                chunk = view[:n]
+                sha256.update(chunk)
+                if parsing and not archive.done:
+                    try:
+                        archive.feed(chunk)
+                    except CpioError as e:
+                        logger.error(f"Update package is not a valid cpio archive: {e}")
+                        parsing = False
+                if out is not None:
+                    if use_copy_range:
+                        try:
+                            _copy_range(fin.fileno(), out.fileno(), offset, n)
+                        except OSError as e:
+                            logger.info(f"copy_file_range unavailable ({e}), writing instead")
+                            use_copy_range = False
+                    if not use_copy_range:
+                        out.seek(offset)
+                        out.write(chunk)
+                offset += n
+                if progress is not None:
+                    progress(offset)
+        finally:
+            if out is not None:
+                out.close()
+    return sha256.hexdigest(), archive
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BAND_2G = "2.4GHz"
+BAND_5G = "5GHz"
+BAND_6G = "6GHz"
+BANDS = (BAND_2G, BAND_5G, BAND_6G)
+
+
+def frequency_band(frequency: int) -> Optional[str]:
+    """Map a channel centre frequency in MHz to its band name."""
+    if 2400 <= frequency < 2500:
+        return BAND_2G
+    if 4900 <= frequency < 5925:
+        return BAND_5G
+    if 5925 <= frequency < 7125:
+        return BAND_6G
+    return None
+
+
+def _leading_number(text: str) -> Optional[float]:
+    token = text.split(None, 1)[0] if text.strip() else ""
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+class BssRecord:
+    """One BSS from a scan, kept small since dense scans report hundreds."""
+
+    __slots__ = ("bssid", "ssid", "signal", "frequency", "security", "bands")
+
+    def __init__(self, bssid: str):
+        self.bssid = bssid
+        self.ssid = ""
+        self.signal = 0
+        self.frequency = 0
+        self.security = "open"
+        self.bands = ()
+
+    @property
+    def band(self) -> Optional[str]:
+        return frequency_band(self.frequency)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "bssid": self.bssid,
+            "ssid": self.ssid,
+            "signal": self.signal,
+            "security": self.security,
+            "frequency": self.frequency,
+            "band": self.band,
+            "bands": list(self.bands),
+        }
+
+
+class ScanParser:
+    """Incremental parser for ``iw dev IFACE scan`` output.
+
+    Feed it one line at a time as the command produces them. Each BSS is
+    folded into a per-SSID table as soon as the next one starts, so memory
+    grows with the number of distinct networks, not with the output size.
+    Hidden networks (empty SSID) are dropped; for every SSID the strongest
+    BSSID is kept, together with every band the SSID was seen on.
+    """
+
+    def __init__(self):
+        self._current: Optional[BssRecord] = None
+        self._best: Dict[str, BssRecord] = {}
+        self.bss_count = 0
+
+    def feed(self, line: str) -> None:
+        if line.startswith("BSS "):
+            self._flush()
+            # "BSS aa:bb:cc:dd:ee:ff(on wlan0) -- associated"
+            self._current = BssRecord(line[4:].split("(", 1)[0].strip())
+            return
+
+        current = self._current
+        if current is None:
+            return
+        text = line.strip()
+        if text.startswith("SSID:"):
+            current.ssid = text[5:].strip()
+        elif text.startswith("signal:"):
+            value = _leading_number(text[7:])
+            if value is not None:
+                current.signal = int(value)
+        elif text.startswith("freq:"):
+            value = _leading_number(text[5:])
+            if value is not None:
+                current.frequency = int(value)
+        elif "WPA" in text or "RSN" in text:
+            current.security = "wpa"
+        elif "WEP" in text and current.security != "wpa":
+            current.security = "wep"
+
+    def feed_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.feed(line)
+
+    def _flush(self) -> None:
+        record = self._current
+        self._current = None
+        if record is None:
+            return
+        self.bss_count += 1
+        if not record.ssid:
+            return
+
+        band = record.band
+        best = self._best.get(record.ssid)
+        if best is None:
+            record.bands = (band,) if band else ()
+            self._best[record.ssid] = record
+            return
+        bands = best.bands
+        if band and band not in bands:
+            bands = tuple(b for b in BANDS if b in bands or b == band)
+        if record.signal > best.signal:
+            self._best[record.ssid] = record
+            best = record
+        best.bands = bands
+
+    def finish(self) -> List[BssRecord]:
+        """Return one record per SSID, strongest first."""
+        self._flush()
+        return sorted(self._best.values(), key=lambda r: r.signal, reverse=True)
+
+
+def bucket_by_band(records: Iterable[BssRecord]) -> Dict[str, List[BssRecord]]:
+    """Group records by every band their SSID was seen on, keeping order."""
+    buckets: Dict[str, List[BssRecord]] = {band: [] for band in BANDS}
+    for record in records:
+        for band in record.bands:
+            buckets[band].append(record)
+    return buckets
+
+
+def parse_scan(lines: Iterable[str]) -> List[BssRecord]:
+    """Parse complete ``iw scan`` output given as an iterable of lines."""
+    parser = ScanParser()
+    parser.feed_lines(lines)
+    return parser.finish()
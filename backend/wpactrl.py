@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import tempfile
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CTRL_DIR = "/var/run/wpa_supplicant"
+
+EVENT_CONNECTED = "CTRL-EVENT-CONNECTED"
+EVENT_DISCONNECTED = "CTRL-EVENT-DISCONNECTED"
+EVENT_SSID_TEMP_DISABLED = "CTRL-EVENT-SSID-TEMP-DISABLED"
+
+_socket_ids = itertools.count()
+
+
+class WpaCtrlError(Exception):
+    pass
+
+
+class WpaCtrl:
+    """Asyncio client for a wpa_supplicant control socket.
+
+    Speaks the same datagram protocol as wpa_cli: each request is one
+    datagram and gets one reply. ``attach()`` opens a second socket that
+    receives unsolicited ``<level>CTRL-EVENT-...`` messages, so replies and
+    events never interleave.
+    """
+
+    def __init__(self, path: str, local_dir: Optional[str] = None):
+        self.path = path
+        self._local_dir = local_dir or tempfile.gettempdir()
+        self._cmd: Optional[socket.socket] = None
+        self._events: Optional[socket.socket] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def for_interface(cls, interface: str, ctrl_dir: str = CTRL_DIR) -> "WpaCtrl":
+        return cls(os.path.join(ctrl_dir, interface))
+
+    def _connect(self) -> socket.socket:
+        local = os.path.join(self._local_dir, f"wpa_ctrl_streambox_{os.getpid()}-{next(_socket_ids)}")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(local)
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            self._unlink(local)
+            raise WpaCtrlError(f"Cannot connect to {self.path}: {e}")
+        sock.setblocking(False)
+        return sock
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _close_socket(self, sock: Optional[socket.socket]) -> None:
+        if sock is None:
+            return
+        local = sock.getsockname()
+        sock.close()
+        if local:
+            self._unlink(local)
+
+    async def open(self) -> None:
+        """Connect the request socket.
+
+        Raises:
+            WpaCtrlError: If wpa_supplicant is not listening on the socket.
+        """
+        if self._cmd is None:
+            self._cmd = self._connect()
+
+    async def close(self) -> None:
+        if self._events is not None:
+            try:
+                await self._exchange(self._events, "DETACH", 1.0)
+            except (WpaCtrlError, OSError):
+                pass
+        self._close_socket(self._events)
+        self._close_socket(self._cmd)
+        self._events = None
+        self._cmd = None
+
+    async def __aenter__(self) -> "WpaCtrl":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _exchange(self, sock: socket.socket, command: str, timeout: float) -> str:
+        loop = asyncio.get_running_loop()
+        # Drop a late reply to an earlier request that timed out
+        while True:
+            try:
+                sock.recv(4096)
+            except BlockingIOError:
+                break
+        await loop.sock_sendall(sock, command.encode())
+        while True:
+            try:
+                data = await asyncio.wait_for(loop.sock_recv(sock, 4096), timeout)
+            except asyncio.TimeoutError:
+                raise WpaCtrlError(f"{command.split()[0]} timed out")
+            reply = data.decode(errors="replace")
+            if not reply.startswith("<"):
+                return reply
+
+    async def request(self, command: str, timeout: float = 5.0) -> str:
+        """Send one command and return the raw reply text."""
+        await self.open()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await self._exchange(self._cmd, command, timeout)
+
+    async def command(self, command: str, timeout: float = 5.0) -> None:
+        """Send a command that must answer OK.
+
+        Raises:
+            WpaCtrlError: If the reply is anything else.
+        """
+        reply = (await self.request(command, timeout)).strip()
+        if reply != "OK":
+            raise WpaCtrlError(f"{command.split()[0]} failed: {reply}")
+
+    async def ping(self) -> bool:
+        try:
+            return (await self.request("PING", timeout=1.0)).strip() == "PONG"
+        except WpaCtrlError:
+            return False
+
+    async def status(self) -> Dict[str, str]:
+        """Return the STATUS reply as a dict (wpa_state, ssid, bssid, ...)."""
+        reply = await self.request("STATUS")
+        status = {}
+        for line in reply.splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                status[key] = value
+        return status
+
+    async def attach(self) -> None:
+        """Subscribe to unsolicited events."""
+        if self._events is not None:
+            return
+        sock = self._connect()
+        try:
+            reply = (await self._exchange(sock, "ATTACH", 5.0)).strip()
+        except BaseException:
+            self._close_socket(sock)
+            raise
+        if reply != "OK":
+            self._close_socket(sock)
+            raise WpaCtrlError(f"ATTACH failed: {reply}")
+        self._events = sock
+
+    async def wait_event(self, events: Iterable[str], timeout: float) -> Optional[str]:
+        """Wait for the first event whose name is in ``events``.
+
+        Returns:
+            The event text without its ``<level>`` prefix, or None on timeout.
+        """
+        if self._events is None:
+            raise WpaCtrlError("wait_event() requires attach()")
+        names = tuple(events)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                data = await asyncio.wait_for(loop.sock_recv(self._events, 4096), remaining)
+            except asyncio.TimeoutError:
+                return None
+            message = data.decode(errors="replace")
+            if message.startswith("<"):
+                message = message.split(">", 1)[-1]
+            logger.debug(f"wpa_supplicant event: {message}")
+            if message.startswith(names):
+                return message
+
+
+async def select_network(ctrl: WpaCtrl, ssid: str, psk: Optional[str] = None) -> int:
+    """Replace the configured networks with one network and connect to it.
+
+    Args:
+        ctrl: Open control client.
+        ssid: Network name.
+        psk: 64 hex digit pre-shared key, or None for an open network.
+
+    Returns:
+        The wpa_supplicant network id.
+    """
+    await ctrl.command("REMOVE_NETWORK all")
+    reply = (await ctrl.request("ADD_NETWORK")).strip()
+    try:
+        net_id = int(reply)
+    except ValueError:
+        raise WpaCtrlError(f"ADD_NETWORK failed: {reply}")
+    # Hex SSIDs need no quoting, whatever characters the name contains
+    await ctrl.command(f"SET_NETWORK {net_id} ssid {ssid.encode().hex()}")
+    if psk:
+        await ctrl.command(f"SET_NETWORK {net_id} psk {psk}")
+    else:
+        await ctrl.command(f"SET_NETWORK {net_id} key_mgmt NONE")
+    await ctrl.command(f"SELECT_NETWORK {net_id}")
+    return net_id
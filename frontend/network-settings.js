@@ -47,6 +47,25 @@ const NetworkSettings = {
             });
     },
 
+    applyStatusChange: function (changes) {
+        // Netlink diffs carry the changed interface records; merge them in
+        // place instead of asking the backend for the full status again.
+        var interfaces = (this.currentStatus.interfaces || []).slice();
+        Object.keys(changes.interfaces || {}).forEach(function (name) {
+            var record = changes.interfaces[name];
+            var index = interfaces.findIndex(function (iface) { return iface.name === name; });
+            if (record === null) {
+                if (index >= 0) interfaces.splice(index, 1);
+            } else if (index >= 0) {
+                interfaces[index] = record;
+            } else {
+                interfaces.push(record);
+            }
+        });
+        this.currentStatus.interfaces = interfaces;
+        this.displayNetworkStatus(this.currentStatus);
+    },
+
     displayNetworkStatus: function (status) {
         var statusContainer = document.getElementById("network-status");
         if (!statusContainer) return;
@@ -229,7 +248,8 @@ const NetworkSettings = {
         scanBtn.textContent = "Scanning...";
         networkList.innerHTML = '<p class="sbs-loading">Scanning for networks...</p>';
 
-        callDBus("ScanWifiNetworks", ["wlan0"])
+        // Results up to 30 s old are served from the daemon's scan cache
+        callDBus("ScanWifiNetworks", ["wlan0", 30])
             .done(function (result) {
                 scanBtn.disabled = false;
                 scanBtn.textContent = "Scan";
@@ -268,6 +288,7 @@ const NetworkSettings = {
             html += '<div class="sbs-wifi-item" data-ssid="' + net.ssid + '">';
             html += '  <span class="sbs-wifi-ssid">' + net.ssid + '</span>';
             html += '  <span class="sbs-wifi-security">' + securityIcon + '</span>';
+            html += '  <span class="sbs-wifi-band">' + (net.bands || []).join(" / ") + '</span>';
             html += '  <span class="sbs-wifi-signal ' + signalClass + '">' + net.signal + ' dBm</span>';
             html += '</div>';
         });
@@ -0,0 +1,96 @@
+/**
+ * Incremental SHA-256
+ * crypto.subtle.digest only hashes a whole buffer at once; an update
+ * package is hashed here slice by slice as it is read for upload.
+ */
+
+function Sha256() {
+    this._h = new Int32Array([
+        0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+        0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+    ]);
+    this._block = new Uint8Array(64);
+    this._blockLength = 0;
+    this._w = new Int32Array(64);
+    this._bytes = 0;
+    this._hex = null;
+}
+
+Sha256.K = new Int32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+]);
+
+// Hash the 64-byte blocks of data starting at offset; returns the offset after the last one
+Sha256.prototype._compress = function (data, offset, end) {
+    var w = this._w, h = this._h, k = Sha256.K;
+    var a, b, c, d, e, f, g, hh, i, t1, t2, x, y;
+    for (; offset + 64 <= end; offset += 64) {
+        for (i = 0; i < 16; i++) {
+            var j = offset + i * 4;
+            w[i] = (data[j] << 24) | (data[j + 1] << 16) | (data[j + 2] << 8) | data[j + 3];
+        }
+        for (i = 16; i < 64; i++) {
+            x = w[i - 15];
+            y = w[i - 2];
+            w[i] = (((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3)) + w[i - 16] +
+                (((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10)) + w[i - 7] | 0;
+        }
+        a = h[0]; b = h[1]; c = h[2]; d = h[3]; e = h[4]; f = h[5]; g = h[6]; hh = h[7];
+        for (i = 0; i < 64; i++) {
+            t1 = hh + (((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7))) +
+                ((e & f) ^ (~e & g)) + k[i] + w[i] | 0;
+            t2 = (((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10))) +
+                ((a & b) ^ (a & c) ^ (b & c)) | 0;
+            hh = g; g = f; f = e; e = d + t1 | 0;
+            d = c; c = b; b = a; a = t1 + t2 | 0;
+        }
+        h[0] = h[0] + a | 0; h[1] = h[1] + b | 0; h[2] = h[2] + c | 0; h[3] = h[3] + d | 0;
+        h[4] = h[4] + e | 0; h[5] = h[5] + f | 0; h[6] = h[6] + g | 0; h[7] = h[7] + hh | 0;
+    }
+    return offset;
+};
+
+Sha256.prototype.update = function (data) {
+    if (this._hex !== null) throw new Error("SHA-256 already finalised");
+    var offset = 0;
+    this._bytes += data.length;
+    if (this._blockLength) {
+        offset = Math.min(64 - this._blockLength, data.length);
+        this._block.set(data.subarray(0, offset), this._blockLength);
+        this._blockLength += offset;
+        if (this._blockLength < 64) return;
+        this._compress(this._block, 0, 64);
+        this._blockLength = 0;
+    }
+    offset = this._compress(data, offset, data.length);
+    this._block.set(data.subarray(offset), 0);
+    this._blockLength = data.length - offset;
+};
+
+Sha256.prototype.hexdigest = function () {
+    if (this._hex !== null) return this._hex;
+    // Padding: 0x80, zeroes, then the length in bits as a 64-bit big-endian number
+    var bits = this._bytes * 8;
+    var padLength = (this._blockLength < 56 ? 56 : 120) - this._blockLength;
+    var pad = new Uint8Array(padLength + 8);
+    pad[0] = 0x80;
+    var high = Math.floor(bits / 0x100000000), low = bits >>> 0;
+    for (var i = 0; i < 4; i++) {
+        pad[padLength + i] = (high >>> (24 - i * 8)) & 0xff;
+        pad[padLength + 4 + i] = (low >>> (24 - i * 8)) & 0xff;
+    }
+    this.update(pad);
+    var hex = "";
+    for (var n = 0; n < 8; n++) {
+        hex += ("00000000" + (this._h[n] >>> 0).toString(16)).slice(-8);
+    }
+    this._hex = hex;
+    return hex;
+};
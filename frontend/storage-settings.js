@@ -54,6 +54,26 @@ const StorageSettings = {
             });
     },
 
+    applyChanges: function (changes) {
+        // StorageChanged carries only the changed filesystems, keyed by
+        // mount point (device when unmounted); merge them in place instead
+        // of reloading everything.
+        var filesystems = (this.storageInfo.filesystems || []).slice();
+        Object.keys(changes.filesystems || {}).forEach(function (key) {
+            var record = changes.filesystems[key];
+            var index = filesystems.findIndex(function (fs) { return (fs.mount_point || fs.device) === key; });
+            if (record === null) {
+                if (index >= 0) filesystems.splice(index, 1);
+            } else if (index >= 0) {
+                filesystems[index] = record;
+            } else {
+                filesystems.push(record);
+            }
+        });
+        this.storageInfo.filesystems = filesystems;
+        this.displayStorageInfo(this.storageInfo);
+    },
+
     displayStorageInfo: function (info) {
         var tbody = document.getElementById("storage-devices");
         var usbTbody = document.getElementById("usb-devices");
@@ -68,8 +88,9 @@ const StorageSettings = {
         var usbDevices = [];
 
         filesystems.forEach(function (fs) {
-            // Check if USB device
-            var isUsb = fs.device && (fs.device.includes("/sd") || fs.device.includes("usb"));
+            // Removable media: USB disks and SD cards
+            var isUsb = fs.removable || fs.transport === "usb" ||
+                (fs.device && (fs.device.includes("/sd") || fs.device.includes("usb")));
 
             if (isUsb && usbTbody) {
                 usbDevices.push(fs);
@@ -145,16 +166,12 @@ const StorageSettings = {
     },
 
     mountDevice: function (device) {
+        var self = this;
         showNotification("info", "Mounting " + device + "...");
 
         callDBus("MountDevice", [device])
             .done(function (result) {
-                if (result) {
-                    showNotification("success", "Device mounted successfully");
-                    StorageSettings.loadStorageInfo();
-                } else {
-                    showNotification("error", "Failed to mount device");
-                }
+                self.watchJob(Array.isArray(result) ? result[0] : result);
             })
             .fail(function (error) {
                 showNotification("error", "Mount failed: " + error.message);
@@ -162,19 +179,68 @@ const StorageSettings = {
     },
 
     unmountDevice: function (device) {
+        var self = this;
         showNotification("info", "Unmounting " + device + "...");
 
-        callDBus("UnmountDevice", [device])
+        // Flush before unmounting so the medium can be pulled right after
+        callDBus("UnmountDevice", [device, false, true])
             .done(function (result) {
-                if (result) {
-                    showNotification("success", "Device unmounted successfully");
-                    StorageSettings.loadStorageInfo();
-                } else {
-                    showNotification("error", "Failed to unmount device");
-                }
+                self.watchJob(Array.isArray(result) ? result[0] : result);
             })
             .fail(function (error) {
                 showNotification("error", "Unmount failed: " + error.message);
             });
+    },
+
+    // Jobs started here that are still polled, and jobs whose outcome was shown
+    _pendingJobs: {},
+    _reportedJobs: {},
+    JOB_POLL_INTERVAL: 1000,
+
+    watchJob: function (id) {
+        // StorageJobFinished normally reports the job; polling covers a missed signal
+        var self = this;
+        self._pendingJobs[id] = true;
+
+        function poll() {
+            if (!self._pendingJobs[id]) return;
+            callDBus("GetStorageJobs")
+                .done(function (result) {
+                    var jobs = JSON.parse(Array.isArray(result) ? result[0] : result);
+                    var job = jobs.filter(function (j) { return j.id === id; })[0];
+                    if (!job) {
+                        // Already trimmed from the list: the outcome is unknown, the table is not
+                        delete self._pendingJobs[id];
+                        self.loadStorageInfo();
+                    } else if (job.state === "succeeded" || job.state === "failed") {
+                        self.onJobFinished(job);
+                    } else {
+                        setTimeout(poll, self.JOB_POLL_INTERVAL);
+                    }
+                })
+                .fail(function () {
+                    setTimeout(poll, self.JOB_POLL_INTERVAL);
+                });
+        }
+
+        setTimeout(poll, self.JOB_POLL_INTERVAL);
+    },
+
+    onJobFinished: function (job) {
+        // Reported by both the signal and the poll; show it once
+        if (this._reportedJobs[job.id]) return;
+        this._reportedJobs[job.id] = true;
+        delete this._pendingJobs[job.id];
+        // Mount and unmount run as backend jobs. StorageChanged normally
+        // updates the table already; reloading also covers a backend
+        // without hotplug monitoring and costs no process when cached.
+        this.loadStorageInfo();
+        var action = job.operation === "mount" ? "Mount" : "Unmount";
+        if (job.state === "succeeded") {
+            var where = job.mount_point ? " at " + job.mount_point : "";
+            showNotification("success", action + " of " + job.device + " finished" + where);
+        } else {
+            showNotification("error", action + " of " + job.device + " failed: " + job.error);
+        }
     }
 };
@@ -52,11 +52,11 @@ function connectDBus() {
 }
 
 function setupDBusSignals() {
-    dbusProxy.addEventListener("signal", function (event, args) {
-        const signalName = args[0];
-        const signalData = args[1];
+    // A cockpit.dbus() client only delivers signals to subscribers
+    dbusProxy.subscribe({ path: DBUS_OBJECT, interface: DBUS_INTERFACE }, function (path, iface, signal, args) {
+        const signalData = args[0];
 
-        switch (signalName) {
+        switch (signal) {
             case "BasicSettingsChanged":
                 console.log("Basic settings changed:", signalData);
                 BasicSettings.refresh();
@@ -67,6 +67,23 @@ function setupDBusSignals() {
             case "TvserverConfigChanged":
                 console.log("TVServer config changed:", signalData);
                 break;
+            case "NetworkConfigChanged":
+                var changes = JSON.parse(signalData || "{}");
+                if (changes.source === "netlink") {
+                    NetworkSettings.applyStatusChange(changes);
+                } else {
+                    NetworkSettings.refresh();
+                }
+                break;
+            case "StorageChanged":
+                StorageSettings.applyChanges(JSON.parse(signalData || "{}"));
+                break;
+            case "StorageJobFinished":
+                StorageSettings.onJobFinished(JSON.parse(signalData || "{}"));
+                break;
+            case "UpdaterStatusChanged":
+                UpdaterSettings.updateUI(JSON.parse(signalData || "{}"));
+                break;
         }
     });
 }
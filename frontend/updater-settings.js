@@ -1,10 +1,18 @@
 var UpdaterSettings = {
-    CHUNK_SIZE: 4 * 1024 * 1024,
-    UPLOAD_PATH: "/data/software.swu.upload",
-    _statusInterval: null,
+    CHUNK_SIZE: 1024 * 1024,
+    // UploadChunk calls kept in flight; the backend writes them in parallel
+    UPLOAD_WINDOW: 4,
     _file: null,
     _uploading: false,
-    _proc: null,
+    _upload: null,
+    _verifying: false,
+    STAGE_LABELS: {
+        hash: "Computing SHA-256 checksum",
+        copy: "Copying package",
+        patch: "Rebuilding package from delta",
+        index: "Checking package signature",
+        board: "Checking board compatibility"
+    },
 
     init: function () {
         console.log("Initializing Updater Settings");
@@ -73,8 +81,8 @@ var UpdaterSettings = {
     },
 
     handleFile: function (file) {
-        if (!file || !file.name.endsWith(".swu")) {
-            showNotification("error", "Please select a .swu update package");
+        if (!file || !(file.name.endsWith(".swu") || file.name.endsWith(".swudelta"))) {
+            showNotification("error", "Please select a .swu update package or .swudelta delta");
             return;
         }
 
@@ -95,70 +103,142 @@ var UpdaterSettings = {
         self._uploading = true;
         self.setUIState("uploading");
 
-        var proc = cockpit.script(
-            "cat > " + self.UPLOAD_PATH,
-            [],
-            { binary: true, superuser: "try", err: "message" }
-        );
-        self._proc = proc;
+        var upload = { cancelled: false };
+        self._upload = upload;
 
-        var offset = 0;
-        var reading = false;
+        function fail(message) {
+            if (upload.cancelled) return;
+            upload.cancelled = true;
+            self._upload = null;
+            self._uploading = false;
+            showNotification("error", "Upload failed: " + message);
+            self.loadStatus();
+        }
 
-        function sendNextChunk() {
-            if (offset >= file.size) {
-                proc.input(new Uint8Array(0), false);
-                return;
+        // A delta is rebuilt on the device against the installed package
+        var method = file.name.endsWith(".swudelta") ? "StartDeltaUpload" : "StartUpload";
+        // Chunks already on the device are kept only for the same file
+        var uploadId = file.name + ":" + file.size + ":" + file.lastModified;
+        callDBus(method, [file.size, uploadId])
+            .done(function () {
+                callDBus("GetUpdaterStatus")
+                    .done(function (result) {
+                        var status = JSON.parse(Array.isArray(result) ? result[0] : result);
+                        // A resumed upload only needs the ranges still missing
+                        var ranges = status.missing_ranges.length === status.missing_range_count
+                            ? status.missing_ranges : [[0, file.size]];
+                        self._sendChunks(file, upload, ranges, fail);
+                    })
+                    .fail(function (error) {
+                        fail(error.message);
+                    });
+            })
+            .fail(function (error) {
+                fail(error.message);
+            });
+    },
+
+    _sendChunks: function (file, upload, ranges, fail) {
+        var self = this;
+        // The whole file is read in order for the SHA-256; only the parts
+        // of each slice in ranges are sent
+        var chunks = [];
+        for (var start = 0; start < file.size; start += self.CHUNK_SIZE) {
+            var end = Math.min(start + self.CHUNK_SIZE, file.size);
+            var parts = [];
+            ranges.forEach(function (range) {
+                var from = Math.max(start, range[0]);
+                var to = Math.min(end, range[1]);
+                if (from < to) parts.push([from, to]);
+            });
+            chunks.push({ start: start, end: end, parts: parts });
+        }
+
+        var sha256 = new Sha256();
+        // Slices that finished reading ahead of one still being read
+        var readAhead = {};
+        var hashed = 0;
+        var next = 0;
+        var inFlight = 0;
+        var progress = 0;
+
+        function hashInOrder() {
+            while (readAhead[hashed]) {
+                sha256.update(readAhead[hashed]);
+                delete readAhead[hashed];
+                hashed++;
             }
-            if (reading) return;
-            reading = true;
+        }
 
-            var end = Math.min(offset + self.CHUNK_SIZE, file.size);
-            var slice = file.slice(offset, end);
-            var reader = new FileReader();
+        function done() {
+            inFlight--;
+            pump();
+        }
 
+        function sendChunk(index) {
+            var chunk = chunks[index];
+            var reader = new FileReader();
             reader.onload = function (e) {
-                reading = false;
-                offset = end;
-                self.updateProgressBar((offset / file.size) * 100);
-                proc.input(new Uint8Array(e.target.result), true);
-                sendNextChunk();
+                if (upload.cancelled) return;
+                var bytes = new Uint8Array(e.target.result);
+                readAhead[index] = bytes;
+                hashInOrder();
+
+                var pending = chunk.parts.length;
+                if (!pending) {
+                    done();
+                    return;
+                }
+                chunk.parts.forEach(function (part) {
+                    var data = cockpit.base64_encode(bytes.subarray(part[0] - chunk.start, part[1] - chunk.start));
+                    callDBus("UploadChunk", [data, part[0]])
+                        .done(function (result) {
+                            progress = Math.max(progress, Array.isArray(result) ? result[0] : result);
+                            self.updateProgressBar(progress);
+                            if (--pending === 0) done();
+                        })
+                        .fail(function (error) {
+                            fail(error.message);
+                        });
+                });
             };
-
             reader.onerror = function () {
-                proc.close("internal-error");
+                fail("cannot read " + file.name);
             };
-
-            reader.readAsArrayBuffer(slice);
+            reader.readAsArrayBuffer(file.slice(chunk.start, chunk.end));
         }
 
-        sendNextChunk();
+        function pump() {
+            if (upload.cancelled) return;
+            // Read no further ahead of the hash than two windows
+            while (inFlight < self.UPLOAD_WINDOW && next < chunks.length && next < hashed + 2 * self.UPLOAD_WINDOW) {
+                inFlight++;
+                sendChunk(next);
+                next++;
+            }
+            if (inFlight === 0 && next >= chunks.length) {
+                self._upload = null;
+                self._finalizeUpload(sha256.hexdigest());
+            }
+        }
 
-        proc.then(function () {
-            self._proc = null;
-            self._verifyUploaded();
-        }).fail(function (error) {
-            self._proc = null;
-            self._uploading = false;
-            showNotification("error", "Upload failed: " + (error.message || error));
-            self.loadStatus();
-        });
+        pump();
     },
 
-    _verifyUploaded: function () {
+    _finalizeUpload: function (sha256) {
         var self = this;
         self.setUIState("verifying");
 
-        callDBus("ImportLocalFile", [self.UPLOAD_PATH, ""])
+        // Verification runs in the background; UpdaterStatusChanged reports the outcome
+        callDBus("FinalizeUpload", [sha256])
             .done(function (result) {
                 self._uploading = false;
-                if (result) {
-                    showNotification("success", "Upload verified. Ready to update.");
-                    self.loadStatus();
+                if (Array.isArray(result) ? result[0] : result) {
+                    self._verifying = true;
                 } else {
                     showNotification("error", "Verification failed.");
-                    self.loadStatus();
                 }
+                self.loadStatus();
             })
             .fail(function (error) {
                 self._uploading = false;
@@ -179,7 +259,6 @@ var UpdaterSettings = {
                 if (result) {
                     self.setUIState("updating");
                     showNotification("success", "Update triggered. Device will reboot shortly...");
-                    self._startStatusPolling();
                 } else {
                     showNotification("error", "Failed to trigger update");
                 }
@@ -192,10 +271,11 @@ var UpdaterSettings = {
     cancelUpload: function () {
         var self = this;
 
-        if (self._proc) {
-            self._proc.close("cancelled");
-            self._proc = null;
+        if (self._upload) {
+            self._upload.cancelled = true;
+            self._upload = null;
         }
+        self._verifying = false;
 
         callDBus("CancelUpload")
             .done(function () {
@@ -235,6 +315,16 @@ var UpdaterSettings = {
 
         this.setUIState(status.state);
         this.updateProgressBar(status.progress || 0);
+        this.updateVerifyStage(status.stage);
+
+        if (this._verifying && status.state !== "verifying") {
+            this._verifying = false;
+            if (status.state === "ready") {
+                showNotification("success", "Upload verified. Ready to update.");
+            } else if (status.state === "error") {
+                showNotification("error", "Verification failed.");
+            }
+        }
 
         var errorEl = document.getElementById("updater-error");
         if (errorEl) {
@@ -274,6 +364,7 @@ var UpdaterSettings = {
                 break;
             case "verifying":
                 if (verifySection) verifySection.style.display = "block";
+                if (cancelBtn) cancelBtn.style.display = "inline-block";
                 break;
             case "ready":
                 if (readySection) readySection.style.display = "block";
@@ -297,13 +388,15 @@ var UpdaterSettings = {
         if (text) text.textContent = progress.toFixed(1) + "%";
     },
 
-    _startStatusPolling: function () {
-        var self = this;
-        if (self._statusInterval) clearInterval(self._statusInterval);
-
-        self._statusInterval = setInterval(function () {
-            self.loadStatus();
-        }, 5000);
+    updateVerifyStage: function (stage) {
+        var label = document.getElementById("updater-verify-stage");
+        var bar = document.getElementById("updater-verify-bar");
+        var text = document.getElementById("updater-verify-text");
+        if (!stage) return;
+        var percent = stage.total ? (stage.done / stage.total) * 100 : 0;
+        if (label) label.textContent = (this.STAGE_LABELS[stage.name] || stage.name) + "...";
+        if (bar) bar.style.width = percent.toFixed(1) + "%";
+        if (text) text.textContent = percent.toFixed(1) + "%";
     },
 
     formatSize: function (bytes) {
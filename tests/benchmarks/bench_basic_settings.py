@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Wall-clock latency of GetBasicSettings against stubbed system commands.
+
+Each stubbed command sleeps for a fixed fork/exec cost. "before" replays
+the previous behaviour (hostnamectl, timedatectl twice and localectl run
+one after another); "after" is the current get_basic_settings.
+
+Usage: python3 tests/benchmarks/bench_basic_settings.py [--cost-ms 30] [--runs 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "backend"))
+
+from basic import BasicSettingsManager  # noqa: E402
+
+STUB_OUTPUT = {
+    "hostnamectl": "streambox",
+    "timedatectl": "Timezone=UTC\nNTP=yes",
+    "localectl": "   System Locale: LANG=en_US.UTF-8",
+}
+
+
+def make_manager(cost: float, with_files: bool, tmpdir: Path) -> BasicSettingsManager:
+    manager = BasicSettingsManager()
+
+    async def stub_run_command(args):
+        await asyncio.sleep(cost)
+        return True, STUB_OUTPUT.get(args[0], "")
+
+    manager._run_command = stub_run_command
+    if with_files:
+        (tmpdir / "hostname").write_text("streambox\n")
+        (tmpdir / "locale.conf").write_text("LANG=en_US.UTF-8\n")
+        manager.HOSTNAME_FILE = tmpdir / "hostname"
+        manager.LOCALE_CONF_FILE = tmpdir / "locale.conf"
+    else:
+        manager.HOSTNAME_FILE = tmpdir / "missing-hostname"
+        manager.LOCALE_CONF_FILE = tmpdir / "missing-locale.conf"
+    return manager
+
+
+async def sequential(manager: BasicSettingsManager) -> dict:
+    return {
+        "hostname": await manager.get_hostname(),
+        "timezone": await manager.get_timezone(),
+        "locale": await manager.get_locale(),
+        "ntp_server": await manager.get_ntp_server(),
+    }
+
+
+async def measure(func, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name: str, samples: list) -> None:
+    print(f"{name:<28} median {statistics.median(samples):7.1f} ms   "
+          f"max {max(samples):7.1f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cost-ms", type=float, default=30.0,
+                        help="simulated cost of one command (default 30)")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    cost = args.cost_ms / 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = Path(tmp)
+        before = make_manager(cost, with_files=False, tmpdir=tmpdir)
+        after_no_files = make_manager(cost, with_files=False, tmpdir=tmpdir)
+        after = make_manager(cost, with_files=True, tmpdir=tmpdir)
+
+        print(f"stubbed command cost: {args.cost_ms:.1f} ms, runs: {args.runs}")
+        report("before (sequential)", await measure(lambda: sequential(before), args.runs))
+        report("after (no /etc files)",
+               await measure(after_no_files.get_basic_settings, args.runs))
+        report("after", await measure(after.get_basic_settings, args.runs))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Bytes transferred and rebuild time of a delta update against a full package.
+
+Generates two synthetic swupdate archives. The base is version 2.4.0 with
+a --size MiB random rootfs image. The target is 2.4.1, with a new
+signature, an added boot script and the image edited in --edits places.
+Half of the edits replace --change KiB; the others insert that much,
+so the rest of the image shifts. --rewrite MiB in the middle of the
+image are then replaced outright, the worst case for the generator,
+which has to roll its checksum across every byte of that region.
+Random data stands in for a compressed image, which deltas cannot
+shrink further.
+
+Reports the full and delta sizes, the transfer time of each at --link
+Mbit/s, the time write_delta takes on the build host, and the time
+apply_delta takes on this machine to rebuild and hash the target, as
+UpdaterManager does. Put --dir on the device you care about.
+
+Usage: python3 tests/benchmarks/bench_delta.py [--size 64] [--edits 4] [--change 256] [--rewrite 0]
+                                             [--link 10] [--dir /data]
+"""
+
+import argparse
+import hashlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from delta import BLOCK_SIZE, apply_delta, write_delta  # noqa: E402
+from fakes.swu import SW_DESCRIPTION, write_swu  # noqa: E402
+
+
+def make_packages(workdir: Path, size: int, edits: int, change: int, rewrite: int = 0, seed: int = 1):
+    rng = random.Random(seed)
+    image = rng.randbytes(size)
+    edited = bytearray(image)
+    # Edit back to front so earlier offsets stay valid
+    for n, offset in enumerate(sorted(rng.sample(range(0, size - change), edits), reverse=True)):
+        length = change if n % 2 else 0
+        edited[offset:offset + length] = rng.randbytes(change)
+    if rewrite:
+        start = max(0, (len(edited) - rewrite) // 2)
+        edited[start:start + rewrite] = rng.randbytes(min(rewrite, len(edited)))
+
+    base = workdir / "base.swu"
+    target = workdir / "target.swu"
+    write_swu(base, [
+        ("sw-description", SW_DESCRIPTION.replace(b"2.4.1", b"2.4.0")),
+        ("sw-description.sig", rng.randbytes(256)),
+        ("rootfs.ext4.gz", image),
+    ])
+    write_swu(target, [
+        ("sw-description", SW_DESCRIPTION),
+        ("sw-description.sig", rng.randbytes(256)),
+        ("boot.scr", b"setenv bootargs console=ttyS0 quiet\n"),
+        ("rootfs.ext4.gz", bytes(edited)),
+    ])
+    return base, target
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=64, help="rootfs image size in MiB")
+    parser.add_argument("--edits", type=int, default=4, help="edited places in the image")
+    parser.add_argument("--change", type=int, default=256, help="KiB replaced or inserted per edit")
+    parser.add_argument("--rewrite", type=int, default=0, help="MiB replaced in one region of the image")
+    parser.add_argument("--block", type=int, default=BLOCK_SIZE, help="delta block size in bytes")
+    parser.add_argument("--link", type=float, default=10.0, help="upload link speed in Mbit/s")
+    parser.add_argument("--dir", default=None, help="directory for the packages")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-delta-", dir=args.dir) as workdir:
+        workdir = Path(workdir)
+        base, target = make_packages(workdir, args.size * 1024 * 1024, args.edits, args.change * 1024,
+                                     args.rewrite * 1024 * 1024)
+        delta = workdir / "update.swudelta"
+
+        start = time.perf_counter()
+        delta_size = write_delta(base, target, delta, "2.4.0", block_size=args.block)
+        generate = time.perf_counter() - start
+
+        full_size = target.stat().st_size
+        rate = args.link * 1e6 / 8
+        print(f"target: {full_size / 2**20:.1f} MiB, {args.edits} edits of {args.change} KiB, "
+              f"{args.rewrite} MiB rewritten, {args.block} byte blocks")
+        print(f"  full: {full_size:>12} bytes  {full_size / rate:8.1f} s at {args.link} Mbit/s")
+        print(f" delta: {delta_size:>12} bytes  {delta_size / rate:8.1f} s at {args.link} Mbit/s "
+              f"({delta_size / full_size:.1%} of full)")
+        print(f"generate: {generate:.3f} s  {full_size / 2**20 / generate:8.1f} MiB/s")
+
+        expected = hashlib.sha256(target.read_bytes()).hexdigest()
+        out = workdir / "rebuilt.swu"
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            computed = apply_delta(delta, base, out)
+            times.append(time.perf_counter() - start)
+            assert computed == expected, "rebuilt package differs"
+            out.unlink()
+        print(f"rebuild: median {statistics.median(times):7.3f} s  "
+              f"{full_size / 2**20 / min(times):8.1f} MiB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
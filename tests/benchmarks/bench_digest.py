@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""SHA-256 throughput of each digest backend over a local file.
+
+Hashes --file, or a generated file of --size MiB in --dir, with every
+backend available here. Reads use --chunk KiB, the same pattern as
+import_pass and ChunkStore. "af_alg" sends each chunk to the kernel
+crypto API and reports the driver behind it (sha256-ce on ARMv8 with
+crypto extensions). Where AF_ALG is missing it is skipped, as on most
+containers. The first run of each backend warms the page cache and is
+not counted.
+
+Usage: python3 tests/benchmarks/bench_digest.py [--size 1024] [--file PATH] [--chunk 4096] [--runs 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from digest import AF_ALG, BACKENDS, Sha256, available_backends, kernel_sha256_driver  # noqa: E402
+
+
+def hash_file(path: Path, backend: str, chunk_size: int) -> Sha256:
+    sha256 = Sha256(backend)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            sha256.update(view[:n])
+    sha256.hexdigest()
+    return sha256
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=1024, help="generated file size in MiB")
+    parser.add_argument("--file", default=None, help="hash this file instead of a generated one")
+    parser.add_argument("--dir", default=None, help="directory for the generated file")
+    parser.add_argument("--chunk", type=int, default=4096, help="read size in KiB")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = available_backends()
+    for name in BACKENDS:
+        if name not in backends:
+            print(f"{name}: not available, skipped")
+    if AF_ALG in backends:
+        print(f"af_alg driver: {kernel_sha256_driver()}")
+
+    with tempfile.TemporaryDirectory(prefix="bench-digest-", dir=args.dir) as workdir:
+        path = Path(args.file) if args.file else Path(workdir) / "data.bin"
+        if not args.file:
+            block = os.urandom(1024 * 1024)
+            with open(path, "wb") as f:
+                for _ in range(args.size):
+                    f.write(block)
+        size = path.stat().st_size
+        print(f"file: {size / 2**20:.0f} MiB at {path}, {args.chunk} KiB reads")
+
+        expected = None
+        for backend in backends:
+            digest = hash_file(path, backend, args.chunk * 1024).hexdigest()
+            if expected is None:
+                expected = digest
+            assert digest == expected, f"{backend} digest differs"
+
+            walls, rates = [], []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                sha256 = hash_file(path, backend, args.chunk * 1024)
+                walls.append(time.perf_counter() - start)
+                rates.append(sha256.throughput)
+            best = min(walls)
+            print(f"{backend:>8}: median {statistics.median(walls):7.3f} s  "
+                  f"{size / 2**20 / best:8.1f} MiB/s with reads, "
+                  f"{max(rates) / 2**20:8.1f} MiB/s hashing only")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
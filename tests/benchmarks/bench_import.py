@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Wall time of importing a local update package.
+
+Generates a synthetic swupdate archive of --size MiB (sw-description, its
+signature and one large image) in --dir. "before" replays the previous
+import: a hashing pass with 8 MiB reads, shutil.copy2, then "cpio -t" and
+"cpio -i sw-description" over the copy (skipped when cpio is missing).
+"after" is updater.import_pass, which hashes, indexes and copies in one
+read. Put --dir on the device you care about (tmpfs hides the I/O cost),
+and pass --drop-caches as root so every run starts cold.
+
+Usage: python3 tests/benchmarks/bench_import.py [--size 1024] [--dir /data] [--runs 3]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from fakes.swu import default_entries, write_swu  # noqa: E402
+from updater import import_pass  # noqa: E402
+
+
+def drop_caches() -> None:
+    os.sync()
+    Path("/proc/sys/vm/drop_caches").write_text("3\n")
+
+
+def import_before(src: Path, dst: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(src, "rb") as f:
+        while True:
+            chunk = f.read(8 * 1024 * 1024)
+            if not chunk:
+                break
+            sha256.update(chunk)
+    shutil.copy2(str(src), str(dst))
+    if shutil.which("cpio"):
+        subprocess.run(["cpio", "-t", "-F", str(dst)], capture_output=True, check=True)
+        with tempfile.TemporaryDirectory(prefix="bench-") as tmpdir:
+            subprocess.run(["cpio", "-i", "-F", str(dst), "sw-description"],
+                           capture_output=True, cwd=tmpdir, check=True)
+    return sha256.hexdigest()
+
+
+def import_after(src: Path, dst: Path) -> str:
+    digest, archive = import_pass(src, dst)
+    archive.finish()
+    return digest
+
+
+def measure(fn, src: Path, dst: Path, runs: int, cold: bool) -> list:
+    times = []
+    for _ in range(runs):
+        dst.unlink(missing_ok=True)
+        if cold:
+            drop_caches()
+        start = time.perf_counter()
+        fn(src, dst)
+        times.append(time.perf_counter() - start)
+    dst.unlink(missing_ok=True)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=1024, help="archive size in MiB")
+    parser.add_argument("--dir", default=None, help="directory for the source package")
+    parser.add_argument("--dest-dir", default=None,
+                        help="destination directory (default: a subdirectory of --dir)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--drop-caches", action="store_true", help="drop the page cache before each run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-import-", dir=args.dir) as workdir:
+        src = Path(workdir) / "update.swu"
+        dest_dir = Path(args.dest_dir or Path(workdir) / "dest")
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        dst = dest_dir / "software.swu"
+
+        size = write_swu(src, default_entries(image_size=args.size * 1024 * 1024))
+        print(f"archive: {size / 2**20:.0f} MiB at {src}, destination {dst}")
+        if not shutil.which("cpio"):
+            print("cpio not installed: 'before' omits its two cpio passes")
+
+        # Same directory tree, so "after" may hard-link; force a real copy
+        # to compare like with like unless the destination is elsewhere
+        link = os.link
+        if args.dest_dir is None:
+            def no_link(*_args):
+                raise OSError("benchmark: copy instead of link")
+            os.link = no_link
+        try:
+            assert import_before(src, dst) == import_after(src, dst)
+            results = {
+                "before": measure(import_before, src, dst, args.runs, args.drop_caches),
+                "after": measure(import_after, src, dst, args.runs, args.drop_caches),
+            }
+        finally:
+            os.link = link
+
+    for name, times in results.items():
+        best = min(times)
+        print(f"{name:>6}: median {statistics.median(times):7.3f} s  best {best:7.3f} s  "
+              f"{size / 2**20 / best:8.1f} MiB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Upload throughput of UploadChunk at several client window sizes.
+
+dbus-python is not needed: a stand-in session bus carries the calls. It
+copies each payload the way marshalling into a message and back out
+does, adds --latency ms to each direction, and delivers calls one at a
+time to a "main loop" thread, the way the GLib loop runs every exported
+method. Replies then go back to the client. The client keeps --windows
+calls in flight and sends --size MiB in --chunk KiB chunks.
+
+"serial" is the old handler, which calls write_chunk on the main loop
+thread. "parallel" is the current handler, which hands write_chunk to a
+worker thread through the AsyncDispatcher. Put --dir on the device you
+care about; tmpfs hides the disk cost.
+
+Usage: python3 tests/benchmarks/bench_upload.py [--size 256] [--chunk 1024] [--windows 1 2 4 8] [--dir /data]
+"""
+
+import argparse
+import asyncio
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+import updater  # noqa: E402
+from dispatch import AsyncDispatcher  # noqa: E402
+from updater import UpdaterManager  # noqa: E402
+
+
+class LoopbackBus:
+    """Stand-in session bus: copied payloads, fixed latency, one main loop thread."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._main = queue.Queue()
+        self._wire = asyncio.new_event_loop()
+        self._threads = [
+            threading.Thread(target=self._run_main, daemon=True),
+            threading.Thread(target=self._wire.run_forever, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run_main(self) -> None:
+        while True:
+            item = self._main.get()
+            if item is None:
+                return
+            func, args = item
+            func(*args)
+
+    def call_in_main(self, func, *args) -> bool:
+        self._main.put((func, args))
+        return False
+
+    def _send(self, func, *args) -> None:
+        if self.latency:
+            self._wire.call_soon_threadsafe(self._wire.call_later, self.latency, self.call_in_main, func, *args)
+        else:
+            self.call_in_main(func, *args)
+
+    def call(self, handler, data: bytes, offset: int, on_reply) -> None:
+        """Deliver a method call to ``handler`` on the main loop and route the reply back."""
+        message = bytes(bytearray(data))
+
+        def deliver():
+            def reply(value):
+                if self.latency:
+                    self._wire.call_soon_threadsafe(self._wire.call_later, self.latency, on_reply, value)
+                else:
+                    on_reply(value)
+            handler(bytes(message), offset, reply)
+
+        self._send(deliver)
+
+    def close(self) -> None:
+        self._main.put(None)
+        self._wire.call_soon_threadsafe(self._wire.stop)
+
+
+def serial_handler(manager):
+    def handle(data, offset, reply):
+        reply(manager.write_chunk(data, offset))
+    return handle
+
+
+def parallel_handler(manager, dispatcher):
+    def handle(data, offset, reply):
+        async def run():
+            return await asyncio.to_thread(manager.write_chunk, data, offset)
+        dispatcher.submit(run(), reply, lambda e: reply(e))
+    return handle
+
+
+def upload(bus: LoopbackBus, handler, payload: bytes, chunk_size: int, window: int) -> float:
+    slots = threading.Semaphore(window)
+    done = threading.Event()
+    pending = [len(range(0, len(payload), chunk_size))]
+    lock = threading.Lock()
+    view = memoryview(payload)
+
+    def on_reply(value):
+        if isinstance(value, BaseException):
+            raise value
+        slots.release()
+        with lock:
+            pending[0] -= 1
+            if not pending[0]:
+                done.set()
+
+    start = time.perf_counter()
+    for offset in range(0, len(payload), chunk_size):
+        slots.acquire()
+        bus.call(handler, view[offset:offset + chunk_size], offset, on_reply)
+    done.wait()
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=256, help="upload size in MiB")
+    parser.add_argument("--chunk", type=int, default=1024, help="chunk size in KiB")
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=1.0, help="one-way bus latency in ms")
+    parser.add_argument("--dir", default=None, help="directory for the part file")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size * 1024 * 1024)
+    chunk_size = args.chunk * 1024
+    bus = LoopbackBus(args.latency / 1000.0)
+    dispatcher = AsyncDispatcher(call_in_main=bus.call_in_main)
+    dispatcher.start()
+    print(f"upload: {args.size} MiB in {args.chunk} KiB chunks, {args.latency} ms each way")
+
+    with tempfile.TemporaryDirectory(prefix="bench-upload-", dir=args.dir) as workdir:
+        updater.PART_FILE = Path(workdir) / "software.swu.part"
+        updater.FINAL_FILE = Path(workdir) / "software.swu"
+        manager = UpdaterManager()
+        manager._get_available_space = lambda: len(payload)
+        handlers = {
+            "serial": serial_handler(manager),
+            "parallel": parallel_handler(manager, dispatcher),
+        }
+        for name, handler in handlers.items():
+            for window in args.windows:
+                times = []
+                for _ in range(args.runs):
+                    manager.cancel_upload()
+                    assert manager.start_upload(len(payload))
+                    times.append(upload(bus, handler, payload, chunk_size, window))
+                    assert manager.get_status()["missing_range_count"] == 0
+                best = min(times)
+                print(f"{name:>8} window {window}: median {statistics.median(times):7.3f} s  "
+                      f"{args.size / best:8.1f} MiB/s")
+        manager.cancel_upload()
+
+    dispatcher.stop()
+    bus.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
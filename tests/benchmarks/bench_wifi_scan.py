@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Parse time and peak memory of iw scan parsing on a dense capture.
+
+The capture is built by replicating the BSS blocks of
+tests/fixtures/iw/scan.txt with distinct BSSIDs, spread over --ssids
+networks. "before" replays the previous parser (whole output in one
+string, split into lines, regex per field); "after" streams the same
+output line by line from a file through wifiscan.ScanParser, as the
+daemon does with the iw pipe.
+
+Usage: python3 tests/benchmarks/bench_wifi_scan.py [--bss 1500] [--ssids 200] [--runs 5]
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+from wifiscan import ScanParser  # noqa: E402
+
+FIXTURE = ROOT / "tests" / "fixtures" / "iw" / "scan.txt"
+
+
+def build_capture(bss: int, ssids: int) -> str:
+    blocks = re.split(r"(?m)^(?=BSS )", FIXTURE.read_text())[1:]
+    out = []
+    for i in range(bss):
+        block = blocks[i % len(blocks)]
+        mac = f"02:00:{(i >> 16) & 0xff:02x}:{(i >> 8) & 0xff:02x}:{i & 0xff:02x}:00"
+        block = re.sub(r"^BSS \S+?\(", f"BSS {mac}(", block)
+        block = re.sub(r"SSID: .*", f"SSID: net-{i % ssids}", block)
+        block = re.sub(r"signal: -\d+", f"signal: -{40 + i % 50}", block)
+        out.append(block)
+    return "".join(out)
+
+
+def parse_before(output: str) -> list:
+    networks = []
+    current_network = None
+    for line in output.split("\n"):
+        line = line.strip()
+        if line.startswith("BSS "):
+            if current_network:
+                networks.append(current_network)
+            bssid = line.split()[1].replace("(", "").replace(")", "")
+            current_network = {"bssid": bssid, "ssid": "", "signal": 0,
+                               "security": "open", "frequency": 0}
+        elif current_network:
+            if line.startswith("SSID:"):
+                current_network["ssid"] = line[5:].strip()
+            elif line.startswith("signal:"):
+                match = re.search(r"(-?\d+)", line)
+                if match:
+                    current_network["signal"] = int(match.group(1))
+            elif line.startswith("freq:"):
+                match = re.search(r"(\d+)", line)
+                if match:
+                    current_network["frequency"] = int(match.group(1))
+            elif "WPA" in line or "RSN" in line:
+                current_network["security"] = "wpa"
+            elif "WEP" in line:
+                current_network["security"] = "wep"
+    if current_network:
+        networks.append(current_network)
+    networks = [n for n in networks if n.get("ssid", "").strip()]
+    networks.sort(key=lambda x: x.get("signal", -100), reverse=True)
+    return networks
+
+
+def run_before(path: Path) -> int:
+    # The old code received the whole stdout as one decoded string
+    return len(parse_before(path.read_text()))
+
+
+def run_after(path: Path) -> int:
+    parser = ScanParser()
+    with open(path) as f:
+        for line in f:
+            parser.feed(line.rstrip("\n"))
+    return len(parser.finish())
+
+
+def measure(func, path: Path, runs: int):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        count = func(path)
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, times, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bss", type=int, default=1500, help="BSS entries in the capture")
+    parser.add_argument("--ssids", type=int, default=200, help="distinct SSIDs")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scan.txt"
+        path.write_text(build_capture(args.bss, args.ssids))
+        print(f"capture: {args.bss} BSS, {path.stat().st_size / 1024:.0f} KiB, runs: {args.runs}")
+        for name, func in (("before (buffer + regex)", run_before),
+                           ("after (streaming)", run_after)):
+            count, times, peak = measure(func, path, args.runs)
+            print(f"{name:<24} median {statistics.median(times):7.1f} ms   "
+                  f"peak {peak / 1024:8.0f} KiB   {count} networks")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,15 @@ import pytest
 import asyncio
 import sys
 from pathlib import Path
+from unittest.mock import patch
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
 
+import updater  # noqa: E402
+from updater import UpdaterManager  # noqa: E402
+
+DEVICE_BOARD = "streambox-t6"
+
 
 @pytest.fixture
 def event_loop():
@@ -23,3 +29,19 @@ def mock_config_file(tmp_path):
     profiles_dir.mkdir()
     
     return config_file, profiles_dir
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Stage updater uploads under tmp_path instead of /data."""
+    with patch.object(updater, "PART_FILE", tmp_path / "software.swu.part"), \
+            patch.object(updater, "FINAL_FILE", tmp_path / "software.swu"):
+        yield tmp_path
+
+
+@pytest.fixture
+def manager(data_dir):
+    """An UpdaterManager on a streambox-t6 board, staging into data_dir."""
+    manager = UpdaterManager()
+    manager._device_board = DEVICE_BOARD
+    return manager
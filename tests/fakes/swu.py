@@ -0,0 +1,58 @@
+"""Generated swupdate-style cpio newc archives for tests and benchmarks."""
+
+import os
+
+SW_DESCRIPTION = b"""software =
+{
+\tversion = "2.4.1";
+\tstreambox_t6 = {
+\t\thardware-compatibility: [ "1.0" ];
+\t\timages: ( { filename = "rootfs.ext4.gz"; device = "/dev/mmcblk0p2"; } );
+\t};
+}
+"""
+
+
+def _header(name, size, ino, mode=0o100644, magic=b"070701"):
+    fields = (ino, mode, 0, 0, 1, 1760000000, size, 0, 0, 0, 0, len(name) + 1, 0)
+    return magic + b"".join(b"%08X" % value for value in fields)
+
+
+def _pad(n):
+    return b"\0" * (-n % 4)
+
+
+def write_swu(path, entries, magic=b"070701", chunk_size=1024 * 1024):
+    """Write a newc archive of ``entries``: (name, bytes) or (name, size, byte).
+
+    A (name, size, byte) entry streams ``size`` copies of one byte, so large
+    images can be generated without holding them in memory.
+    """
+    with open(path, "wb") as f:
+        for ino, entry in enumerate(entries, start=1):
+            name = entry[0].encode()
+            size = len(entry[1]) if len(entry) == 2 else entry[1]
+            head = _header(name, size, ino, magic=magic) + name + b"\0"
+            f.write(head + _pad(len(head)))
+            if len(entry) == 2:
+                f.write(entry[1])
+            else:
+                block = bytes([entry[2]]) * chunk_size
+                left = size
+                while left:
+                    f.write(block[:min(left, chunk_size)])
+                    left -= min(left, chunk_size)
+            f.write(_pad(size))
+        trailer = _header(b"TRAILER!!!", 0, 0, mode=0) + b"TRAILER!!!\0"
+        f.write(trailer + _pad(len(trailer)))
+        # cpio pads archives to 512 byte blocks
+        f.write(b"\0" * (-f.tell() % 512))
+    return os.path.getsize(path)
+
+
+def default_entries(image_size=64 * 1024):
+    return [
+        ("sw-description", SW_DESCRIPTION),
+        ("sw-description.sig", b"\x30\x82" + b"\x5a" * 254),
+        ("rootfs.ext4.gz", image_size, 0xA5),
+    ]
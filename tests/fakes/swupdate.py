@@ -0,0 +1,91 @@
+"""Minimal swupdate control socket for tests.
+
+Speaks the ipc_message protocol of swupdate's network_ipc.h over a real
+AF_UNIX stream socket. An install request is acknowledged and the image
+read until the client closes the connection; the install succeeds if
+what arrived is a complete newc archive of the announced size.
+"""
+
+import os
+import socket
+import threading
+
+from cpio import CpioStreamParser
+from swupdate import (
+    ACK, FAILURE, GET_STATUS, IDLE, NACK, POST_UPDATE, REQ_INSTALL, RUN, RUN_DRYRUN, SUCCESS,
+    _INSTALL_REQUEST, _STATUS, _message, _recv_message,
+)
+
+
+class FakeSwupdate:
+    def __init__(self, path, refuse=False):
+        self.path = str(path)
+        self.refuse = refuse
+        self.received = bytearray()
+        self.requests = []
+        self.results = []
+        self.post_updates = 0
+        self.current = IDLE
+        self.last_result = IDLE
+        self.installed = threading.Event()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(4)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._sock is None:
+            return
+        self._sock.shutdown(socket.SHUT_RDWR)
+        self._sock.close()
+        self._sock = None
+        self._thread.join(timeout=5)
+        os.unlink(self.path)
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            msg_type, payload = _recv_message(conn)
+            if msg_type == REQ_INSTALL:
+                self._install(conn, payload)
+            elif msg_type == GET_STATUS:
+                desc = b"" if self.last_result == IDLE else b"fake swupdate result"
+                conn.sendall(_message(GET_STATUS, _STATUS.pack(self.current, self.last_result, 0, desc)))
+            elif msg_type == POST_UPDATE:
+                self.post_updates += 1
+                conn.sendall(_message(ACK))
+
+    def _install(self, conn, payload):
+        fields = _INSTALL_REQUEST.unpack_from(payload)
+        self.requests.append({"source": fields[1], "dry_run": fields[2] == RUN_DRYRUN, "len": fields[3]})
+        if self.refuse or self.current != IDLE:
+            conn.sendall(_message(NACK))
+            return
+        self.current = RUN
+        self.received = bytearray()
+        conn.sendall(_message(ACK))
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                break
+            self.received += data
+        archive = CpioStreamParser()
+        archive.feed(self.received)
+        ok = archive.done and len(self.received) == fields[3]
+        self.results.append(ok)
+        self.last_result = SUCCESS if ok else FAILURE
+        self.current = IDLE
+        self.installed.set()
+
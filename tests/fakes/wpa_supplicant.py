@@ -0,0 +1,110 @@
+"""Minimal wpa_supplicant control socket for tests.
+
+Answers the commands the daemon sends over a real AF_UNIX datagram socket
+and plays association events to attached clients.
+"""
+
+import asyncio
+import os
+import socket
+
+BSSID = "02:00:00:00:01:00"
+
+
+class FakeWpaSupplicant:
+    def __init__(self, path, psk=None, connect_delay=0.05, connected=False):
+        self.path = str(path)
+        self.psk = psk
+        self.connect_delay = connect_delay
+        self.commands = []
+        self.networks = {}
+        self.state = "COMPLETED" if connected else "DISCONNECTED"
+        self.terminated = False
+        self._attached = set()
+        self._sock = None
+        self._next_id = 0
+
+    async def start(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    async def stop(self):
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        os.unlink(self.path)
+
+    def send_event(self, text, level=2):
+        for addr in list(self._attached):
+            try:
+                self._sock.sendto(f"<{level}>{text}".encode(), addr)
+            except OSError:
+                self._attached.discard(addr)
+
+    def _on_readable(self):
+        while self._sock is not None:
+            try:
+                data, addr = self._sock.recvfrom(4096)
+            except BlockingIOError:
+                return
+            command = data.decode()
+            self.commands.append(command)
+            reply = self._handle(command, addr)
+            if reply is not None:
+                self._sock.sendto(reply.encode(), addr)
+
+    def _handle(self, command, addr):
+        name, _, args = command.partition(" ")
+        if name == "PING":
+            return "PONG\n"
+        if name == "ATTACH":
+            self._attached.add(addr)
+            return "OK\n"
+        if name == "DETACH":
+            self._attached.discard(addr)
+            return "OK\n"
+        if name == "STATUS":
+            return f"wpa_state={self.state}\n"
+        if name == "REMOVE_NETWORK":
+            self.networks.clear()
+            return "OK\n"
+        if name == "ADD_NETWORK":
+            net_id = self._next_id
+            self._next_id += 1
+            self.networks[net_id] = {}
+            return f"{net_id}\n"
+        if name == "SET_NETWORK":
+            net_id, key, value = args.split(" ", 2)
+            if int(net_id) not in self.networks:
+                return "FAIL\n"
+            self.networks[int(net_id)][key] = value
+            return "OK\n"
+        if name == "SELECT_NETWORK":
+            net_id = int(args)
+            if net_id not in self.networks:
+                return "FAIL\n"
+            asyncio.get_running_loop().call_later(self.connect_delay, self._associate, net_id)
+            return "OK\n"
+        if name == "DISCONNECT":
+            self.state = "DISCONNECTED"
+            asyncio.get_running_loop().call_soon(
+                self.send_event, f"CTRL-EVENT-DISCONNECTED bssid={BSSID} reason=3 locally_generated=1")
+            return "OK\n"
+        if name == "TERMINATE":
+            self.terminated = True
+            return "OK\n"
+        return "UNKNOWN COMMAND\n"
+
+    def _associate(self, net_id):
+        network = self.networks.get(net_id, {})
+        ssid = bytes.fromhex(network.get("ssid", "")).decode()
+        if self.psk is not None and network.get("psk") != self.psk:
+            self.send_event(f'CTRL-EVENT-SSID-TEMP-DISABLED id={net_id} ssid="{ssid}" '
+                            f'auth_failures=1 duration=10 reason=WRONG_KEY')
+            return
+        self.state = "COMPLETED"
+        self.send_event(f"CTRL-EVENT-CONNECTED - Connection to {BSSID} completed [id={net_id} id_str=]")
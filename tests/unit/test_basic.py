@@ -67,7 +67,7 @@ async def test_get_timezone_default(basic_manager):
 
 @pytest.mark.asyncio
 async def test_set_timezone_valid(basic_manager):
-    with patch.object(basic_manager, 'get_available_timezones', return_value=["UTC", "America/New_York"]):
+    with patch.object(basic_manager, '_load_timezones', return_value=["UTC", "America/New_York"]):
         with patch.object(basic_manager, '_run_command', return_value=(True, "")):
             success = await basic_manager.set_timezone("America/New_York")
             assert success is True
@@ -75,11 +75,29 @@ async def test_set_timezone_valid(basic_manager):
 
 @pytest.mark.asyncio
 async def test_set_timezone_invalid(basic_manager):
-    with patch.object(basic_manager, 'get_available_timezones', return_value=["UTC"]):
+    with patch.object(basic_manager, '_load_timezones', return_value=["UTC"]):
         success = await basic_manager.set_timezone("Invalid/Timezone")
         assert success is False
 
 
+@pytest.mark.asyncio
+async def test_available_timezones_cached(basic_manager):
+    with patch.object(basic_manager, '_load_timezones', return_value=["UTC", "Europe/Paris"]) as load:
+        assert await basic_manager.get_available_timezones() == ["Europe/Paris", "UTC"]
+        assert await basic_manager.get_available_timezones() == ["Europe/Paris", "UTC"]
+        assert await basic_manager._timezones.contains("Europe/Paris") is True
+        load.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_available_timezones_from_tzdata(basic_manager, tmp_path):
+    (tmp_path / "tzdata.zi").write_text("Z Europe/Paris 0:9:21 - LMT 1891\nL Etc/UTC UTC\n")
+    basic_manager.ZONEINFO_DIR = tmp_path
+    with patch.object(basic_manager, '_run_command') as run:
+        assert await basic_manager.get_available_timezones() == ["Europe/Paris", "UTC"]
+        run.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_get_locale(basic_manager):
     with patch.object(basic_manager, '_run_command', return_value=(True, "LANG=en_US.UTF-8\nLC_CTYPE=\"en_US.UTF-8\"")):
@@ -96,7 +114,7 @@ async def test_get_locale_default(basic_manager):
 
 @pytest.mark.asyncio
 async def test_set_locale_valid(basic_manager):
-    with patch.object(basic_manager, 'get_available_locales', return_value=["en_US.utf8", "zh_CN.utf8"]):
+    with patch.object(basic_manager, '_load_locales', return_value=["en_US.utf8", "zh_CN.utf8"]):
         with patch.object(basic_manager, '_run_command', return_value=(True, "")):
             success = await basic_manager.set_locale("en_US.utf8")
             assert success is True
@@ -104,7 +122,7 @@ async def test_set_locale_valid(basic_manager):
 
 @pytest.mark.asyncio
 async def test_set_locale_invalid(basic_manager):
-    with patch.object(basic_manager, 'get_available_locales', return_value=["en_US.utf8"]):
+    with patch.object(basic_manager, '_load_locales', return_value=["en_US.utf8"]):
         success = await basic_manager.set_locale("invalid_locale")
         assert success is False
 
@@ -139,16 +157,53 @@ async def test_set_ntp_server_disable(basic_manager):
 
 @pytest.mark.asyncio
 async def test_get_basic_settings(basic_manager):
-    with patch.object(basic_manager, 'get_hostname', return_value="test-host"):
-        with patch.object(basic_manager, 'get_timezone', return_value="UTC"):
-            with patch.object(basic_manager, 'get_locale', return_value="en_US.UTF-8"):
-                with patch.object(basic_manager, 'get_ntp_server', return_value="yes"):
-                    settings = await basic_manager.get_basic_settings()
-                    
-                    assert settings["hostname"] == "test-host"
-                    assert settings["timezone"] == "UTC"
-                    assert settings["locale"] == "en_US.UTF-8"
-                    assert settings["ntp_server"] == "yes"
+    with patch.object(basic_manager, '_read_hostname', return_value="test-host"):
+        with patch.object(basic_manager, '_read_locale', return_value="en_US.UTF-8"):
+            with patch.object(basic_manager, '_get_time_settings', return_value=("UTC", "yes")):
+                settings = await basic_manager.get_basic_settings()
+                
+                assert settings["hostname"] == "test-host"
+                assert settings["timezone"] == "UTC"
+                assert settings["locale"] == "en_US.UTF-8"
+                assert settings["ntp_server"] == "yes"
+
+
+@pytest.mark.asyncio
+async def test_get_time_settings_single_call(basic_manager):
+    with patch.object(basic_manager, '_run_command', return_value=(True, "Timezone=Europe/Berlin\nNTP=no")) as run:
+        timezone, ntp_server = await basic_manager._get_time_settings()
+        
+        assert timezone == "Europe/Berlin"
+        assert ntp_server == "no"
+        run.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_time_settings_default(basic_manager):
+    with patch.object(basic_manager, '_run_command', return_value=(False, "")):
+        assert await basic_manager._get_time_settings() == ("UTC", "yes")
+
+
+@pytest.mark.asyncio
+async def test_read_hostname_and_locale_from_files(basic_manager, tmp_path):
+    hostname_file = tmp_path / "hostname"
+    hostname_file.write_text("box-1\n")
+    locale_file = tmp_path / "locale.conf"
+    locale_file.write_text('LANG="de_DE.UTF-8"\n')
+    basic_manager.HOSTNAME_FILE = hostname_file
+    basic_manager.LOCALE_CONF_FILE = locale_file
+    
+    with patch.object(basic_manager, '_run_command') as run:
+        assert await basic_manager._read_hostname() == "box-1"
+        assert await basic_manager._read_locale() == "de_DE.UTF-8"
+        run.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_read_hostname_falls_back_to_hostnamectl(basic_manager, tmp_path):
+    basic_manager.HOSTNAME_FILE = tmp_path / "missing"
+    with patch.object(basic_manager, '_run_command', return_value=(True, "from-ctl")):
+        assert await basic_manager._read_hostname() == "from-ctl"
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+import pytest
+
+from catalog import CachedCatalog
+
+
+class CountingLoader:
+    def __init__(self, entries):
+        self.entries = entries
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.entries
+
+
+@pytest.fixture
+def watched(tmp_path):
+    path = tmp_path / "catalog-source"
+    path.write_text("v1")
+    return path
+
+
+@pytest.mark.asyncio
+async def test_catalog_built_once(watched):
+    loader = CountingLoader(["b", "a", "a"])
+    catalog = CachedCatalog("test", loader, [watched])
+
+    assert await catalog.list() == ["a", "b"]
+    assert await catalog.contains("a") is True
+    assert await catalog.contains("c") is False
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_rebuilt_on_mtime_change(watched):
+    loader = CountingLoader(["a"])
+    catalog = CachedCatalog("test", loader, [watched])
+    await catalog.list()
+
+    loader.entries = ["a", "b"]
+    stat = watched.stat()
+    os.utime(watched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert await catalog.list() == ["a", "b"]
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_catalog_rebuilt_when_watched_path_appears(tmp_path):
+    loader = CountingLoader(["a"])
+    path = tmp_path / "later"
+    catalog = CachedCatalog("test", loader, [path])
+    await catalog.list()
+
+    path.write_text("now")
+    await catalog.list()
+
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_catalog_fallback_not_cached(watched):
+    loader = CountingLoader(None)
+    catalog = CachedCatalog("test", loader, [watched], fallback=["UTC"])
+
+    assert await catalog.list() == ["UTC"]
+    assert await catalog.contains("UTC") is True
+
+    loader.entries = ["UTC", "Asia/Tokyo"]
+    assert await catalog.contains("Asia/Tokyo") is True
+    assert loader.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_catalog_concurrent_loads_coalesced(watched):
+    loader = CountingLoader(["a"])
+    catalog = CachedCatalog("test", loader, [watched])
+
+    await asyncio.gather(*(catalog.contains("a") for _ in range(5)))
+
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_invalidate(watched):
+    loader = CountingLoader(["a"])
+    catalog = CachedCatalog("test", loader, [watched])
+    await catalog.list()
+
+    catalog.invalidate()
+    await catalog.list()
+
+    assert loader.calls == 2
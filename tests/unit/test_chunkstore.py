@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from chunkstore import ChunkStore, RangeSet
+from fakes.swu import default_entries, write_swu
+from updater import UpdaterManager, UpdaterState
+
+
+def test_range_set_merges_and_counts_new_bytes():
+    ranges = RangeSet()
+    assert ranges.add(10, 20) == 10
+    assert ranges.add(30, 40) == 10
+    assert ranges.add(15, 35) == 10
+    assert ranges.to_list() == [[10, 40]]
+    assert ranges.add(40, 50) == 10
+    assert ranges.add(0, 5) == 5
+    assert ranges.to_list() == [[0, 5], [10, 50]]
+    assert ranges.add(12, 18) == 0
+    assert ranges.total == 45
+
+
+def test_range_set_missing():
+    ranges = RangeSet([(0, 5), (10, 50)])
+    assert ranges.missing(60) == [(5, 10), (50, 60)]
+    assert ranges.missing(50) == [(5, 10)]
+    assert ranges.prefix_end() == 5
+    assert RangeSet().missing(8) == [(0, 8)]
+    assert RangeSet([(3, 8)]).prefix_end() == 0
+
+
+def _chunks(data, size):
+    return [(data[i:i + size], i) for i in range(0, len(data), size)]
+
+
+def test_out_of_order_and_retried_chunks_hash_in_file_order(tmp_path):
+    data = os.urandom(100_003)
+    chunks = _chunks(data, 4096)
+    random.Random(7).shuffle(chunks)
+    chunks += chunks[:5]
+    store = ChunkStore.create(tmp_path / "software.swu.part", len(data))
+
+    for chunk, offset in chunks:
+        store.write(chunk, offset)
+
+    assert store.complete
+    assert store.sha256_hexdigest() == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "software.swu.part").read_bytes() == data
+
+
+@pytest.mark.parametrize("workers", [2, 8])
+def test_concurrent_writers(tmp_path, workers):
+    data = os.urandom(1_000_000)
+    chunks = _chunks(data, 8192)
+    random.Random(workers).shuffle(chunks)
+    store = ChunkStore.create(tmp_path / "software.swu.part", len(data))
+
+    with ThreadPoolExecutor(workers) as pool:
+        new = sum(pool.map(lambda chunk: store.write(*chunk), chunks + chunks[:20]))
+
+    assert new == len(data)
+    assert store.sha256_hexdigest() == hashlib.sha256(data).hexdigest()
+    resumed_state = json.loads((tmp_path / "software.swu.part.ranges").read_text())
+    assert resumed_state["ranges"] == [[0, len(data)]]
+
+
+def test_write_after_close(tmp_path):
+    store = ChunkStore.create(tmp_path / "part", 10)
+    store.close()
+    with pytest.raises(ValueError):
+        store.write(b"abc", 0)
+
+
+def test_part_file_is_sparse(tmp_path):
+    path = tmp_path / "software.swu.part"
+    store = ChunkStore.create(path, 256 * 1024 * 1024)
+    store.write(b"tail", 256 * 1024 * 1024 - 4)
+
+    assert path.stat().st_size == 256 * 1024 * 1024
+    assert path.stat().st_blocks * 512 < 1024 * 1024
+    assert store.missing_ranges() == [(0, 256 * 1024 * 1024 - 4)]
+
+
+def test_chunk_outside_file(tmp_path):
+    store = ChunkStore.create(tmp_path / "part", 10)
+    with pytest.raises(ValueError):
+        store.write(b"abc", 8)
+
+
+def test_resume_after_restart(tmp_path):
+    path = tmp_path / "software.swu.part"
+    data = os.urandom(50_000)
+    store = ChunkStore.create(path, len(data))
+    store.write(data[20_000:30_000], 20_000)
+    store.write(data[:10_000], 0)
+    del store
+
+    resumed = ChunkStore.resume(path)
+    assert resumed.missing_ranges() == [(10_000, 20_000), (30_000, 50_000)]
+    resumed.write(data[10_000:20_000], 10_000)
+    resumed.write(data[30_000:], 30_000)
+    assert resumed.sha256_hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_resume_rejects_mismatched_part(tmp_path):
+    path = tmp_path / "software.swu.part"
+    ChunkStore.create(path, 1000)
+    path.write_bytes(b"short")
+    assert ChunkStore.resume(path) is None
+    assert ChunkStore.resume(tmp_path / "absent.part") is None
+
+
+UPLOAD_ID = "update.swu:1760000000000"
+
+
+def test_manager_resumes_and_reports_missing_ranges(data_dir):
+    write_swu(data_dir / "update.swu", default_entries(image_size=30_000))
+    data = (data_dir / "update.swu").read_bytes()
+    manager = UpdaterManager()
+    with patch.object(manager, "_get_available_space", return_value=len(data)):
+        assert manager.start_upload(len(data), upload_id=UPLOAD_ID)
+    manager.write_chunk(data[10_000:], 10_000)
+
+    # Daemon restart
+    manager = UpdaterManager()
+    status = manager.get_status()
+    assert status["state"] == UpdaterState.UPLOADING.value
+    assert status["missing_ranges"] == [[0, 10_000]]
+    assert status["missing_range_count"] == 1
+
+    assert manager.start_upload(len(data), upload_id=UPLOAD_ID)
+    assert not manager.finalize_upload(hashlib.sha256(data).hexdigest())
+    assert "10000 bytes in 1 ranges missing" in manager.error_message
+    assert manager.write_chunk(data[:10_000], 0) == 100.0
+    assert manager.get_status()["missing_ranges"] == []
+
+    # Only the digest shows the chunks from before the restart belong to this file
+    assert not manager.finalize_upload("")
+    assert "must be finalised with its SHA-256" in manager.error_message
+    assert manager.state == "uploading"
+    assert manager.finalize_upload(hashlib.sha256(data).hexdigest())
+    assert (data_dir / "software.swu").read_bytes() == data
+
+
+@pytest.mark.parametrize("upload_id", ["", "other.swu:1760000000000"])
+def test_manager_does_not_resume_other_file(data_dir, upload_id):
+    data = os.urandom(30_000)
+    manager = UpdaterManager()
+    with patch.object(UpdaterManager, "_get_available_space", return_value=1 << 20):
+        assert manager.start_upload(len(data), upload_id=UPLOAD_ID)
+        manager.write_chunk(data[10_000:], 10_000)
+
+        # Daemon restart, then a file of the same size
+        manager = UpdaterManager()
+        assert manager.start_upload(len(data), upload_id=upload_id)
+
+    assert manager.get_status()["missing_ranges"] == [[0, len(data)]]
+    assert json.loads((data_dir / "software.swu.part.ranges").read_text())["upload_id"] == upload_id
+
+
+def test_manager_new_size_starts_over(data_dir):
+    manager = UpdaterManager()
+    with patch.object(manager, "_get_available_space", return_value=1 << 20):
+        manager.start_upload(1000)
+        manager.write_chunk(b"x" * 500, 0)
+        manager.cancel_upload()
+        assert manager.start_upload(2000)
+
+    assert manager.get_status()["missing_ranges"] == [[0, 2000]]
+    assert json.loads((data_dir / "software.swu.part.ranges").read_text()) == {
+        "total_size": 2000, "upload_id": "", "delta": False, "ranges": []}
+
+
+def test_manager_parallel_chunks_without_expected_digest(data_dir):
+    write_swu(data_dir / "update.swu", default_entries(image_size=200_000))
+    data = (data_dir / "update.swu").read_bytes()
+    manager = UpdaterManager()
+    manager._device_board = "streambox-t6"
+    with patch.object(manager, "_get_available_space", return_value=len(data)):
+        assert manager.start_upload(len(data))
+
+    with ThreadPoolExecutor(4) as pool:
+        progress = list(pool.map(lambda chunk: manager.write_chunk(*chunk), _chunks(data, 16384)))
+
+    assert max(progress) == 100.0
+    assert manager.finalize_upload("")
+    assert manager.state == UpdaterState.READY.value
+    assert (data_dir / "software.swu").read_bytes() == data
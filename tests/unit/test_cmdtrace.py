@@ -0,0 +1,91 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+import cmdtrace
+from cmdtrace import CommandTrace, run_in_method, start_background, summarize
+from command import CommandResult, CommandRunner
+
+
+def _result(program, duration, returncode=0, stdout_bytes=0):
+    return CommandResult([program], returncode, "", "", duration, stdout_bytes=stdout_bytes)
+
+
+def test_ring_buffer_keeps_newest():
+    trace = CommandTrace(capacity=3)
+    for i in range(5):
+        trace.record(_result(f"cmd{i}", 0.01))
+
+    assert [e["program"] for e in trace.entries()] == ["cmd2", "cmd3", "cmd4"]
+    assert [e["program"] for e in trace.entries(limit=1)] == ["cmd4"]
+
+
+@pytest.mark.asyncio
+async def test_commands_attributed_to_dbus_method():
+    trace = CommandTrace()
+    runner = CommandRunner()
+    runner.add_observer(trace.record)
+
+    async def handler(code):
+        await runner.run([sys.executable, "-c", code])
+
+    await asyncio.gather(
+        asyncio.ensure_future(run_in_method("GetBasicSettings", handler("print('x' * 10)"))),
+        asyncio.ensure_future(run_in_method("ConnectWifi", handler("raise SystemExit(2)"))),
+    )
+    await runner.run(["streambox-no-such-command"])
+
+    by_method = {e["method"]: e for e in trace.entries()}
+    assert by_method["GetBasicSettings"]["stdout_bytes"] == 11
+    assert by_method["GetBasicSettings"]["returncode"] == 0
+    assert by_method["ConnectWifi"]["returncode"] == 2
+    assert by_method[None]["program"] == "streambox-no-such-command"
+
+
+@pytest.mark.asyncio
+async def test_background_task_not_charged_to_starting_method():
+    trace = CommandTrace()
+    runner = CommandRunner()
+    runner.add_observer(trace.record)
+    started = []
+
+    async def handler():
+        started.append(start_background("wifi-scan", runner.run([sys.executable, "-c", "pass"])))
+        await runner.run([sys.executable, "-c", "pass"])
+
+    await run_in_method("SetWifiScan", handler())
+    await started[0]
+
+    assert sorted(e["method"] for e in trace.entries()) == ["SetWifiScan", "background:wifi-scan"]
+
+
+def test_summarize_ranks_by_total_time():
+    entries = [
+        {"program": "iw", "duration": 3.0, "returncode": 0, "timed_out": False,
+         "stdout_bytes": 4096, "method": "ScanWifiNetworks"},
+        {"program": "ip", "duration": 0.01, "returncode": 0, "timed_out": False,
+         "stdout_bytes": 100, "method": "GetNetworkStatus"},
+        {"program": "ip", "duration": 0.02, "returncode": 1, "timed_out": False,
+         "stdout_bytes": 0, "method": "SetWiredNetwork"},
+    ]
+
+    by_total = summarize(entries)
+    assert [g["program"] for g in by_total] == ["iw", "ip"]
+    assert by_total[1]["failures"] == 1
+    assert by_total[1]["mean"] == pytest.approx(0.015)
+    assert [g["program"] for g in summarize(entries, by="count")] == ["ip", "iw"]
+    assert len(summarize(entries, top=1)) == 1
+
+
+def test_cli_reads_busctl_json(tmp_path, capsys):
+    entries = [{"program": "lsblk", "duration": 0.2, "returncode": 0, "timed_out": False,
+                "stdout_bytes": 2048, "method": "GetStorageInfo", "timestamp": 0}]
+    path = tmp_path / "trace.json"
+    path.write_text(json.dumps({"type": "s", "data": [json.dumps(entries)]}))
+
+    assert cmdtrace.main(["--file", str(path), "--top", "5"]) == 0
+    out = capsys.readouterr().out
+    assert "1 commands traced" in out
+    assert "lsblk" in out and "GetStorageInfo" in out
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from command import CommandRunner
+
+
+@pytest.fixture
+def runner():
+    return CommandRunner(max_concurrency=4)
+
+
+@pytest.mark.asyncio
+async def test_run_success(runner):
+    result = await runner.run([sys.executable, "-c", "print('hello')"])
+
+    assert result.ok is True
+    assert result.returncode == 0
+    assert result.stdout.strip() == "hello"
+    assert result.duration > 0
+
+
+@pytest.mark.asyncio
+async def test_run_failure_captures_stderr(runner):
+    result = await runner.run(
+        [sys.executable, "-c", "import sys; sys.stderr.write('bad'); sys.exit(3)"]
+    )
+
+    assert result.ok is False
+    assert result.returncode == 3
+    assert result.stderr == "bad"
+
+
+@pytest.mark.asyncio
+async def test_run_command_not_found(runner):
+    result = await runner.run(["streambox-no-such-command"])
+
+    assert result.ok is False
+    assert result.returncode == 127
+
+
+@pytest.mark.asyncio
+async def test_run_timeout_kills_child(runner):
+    start = time.monotonic()
+    result = await runner.run([sys.executable, "-c", "import time; time.sleep(10)"], timeout=0.3)
+
+    assert result.timed_out is True
+    assert result.ok is False
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.asyncio
+async def test_run_stdin_input(runner):
+    result = await runner.run(
+        [sys.executable, "-c", "import sys; print(sys.stdin.read().upper())"], input=b"abc"
+    )
+
+    assert result.stdout.strip() == "ABC"
+
+
+@pytest.mark.asyncio
+async def test_independent_commands_overlap(runner):
+    sleep = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(runner.run(sleep) for _ in range(3)))
+    elapsed = time.monotonic() - start
+
+    assert all(r.ok for r in results)
+    assert elapsed < 1.2
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    runner = CommandRunner(max_concurrency=1)
+    sleep = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+
+    start = time.monotonic()
+    await asyncio.gather(runner.run(sleep), runner.run(sleep))
+
+    assert time.monotonic() - start >= 0.6
+
+
+@pytest.mark.asyncio
+async def test_cancel_kills_child(runner, tmp_path):
+    pid_file = tmp_path / "pid"
+    script = (
+        "import os, time; "
+        f"open({str(pid_file)!r}, 'w').write(str(os.getpid())); "
+        "time.sleep(30)"
+    )
+    task = asyncio.ensure_future(runner.run([sys.executable, "-c", script]))
+
+    for _ in range(100):
+        if pid_file.exists() and pid_file.read_text():
+            break
+        await asyncio.sleep(0.05)
+    pid = int(pid_file.read_text())
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+@pytest.mark.asyncio
+async def test_run_lines_streams_stdout(runner):
+    lines = []
+    result = await runner.run_lines(
+        [sys.executable, "-c", "print('a'); print('b'); import sys; sys.stderr.write('warn')"],
+        lines.append,
+    )
+
+    assert result.ok is True
+    assert lines == ["a", "b"]
+    assert result.stdout == ""
+    assert result.stderr == "warn"
+
+
+@pytest.mark.asyncio
+async def test_run_lines_timeout(runner):
+    lines = []
+    result = await runner.run_lines(
+        [sys.executable, "-u", "-c", "print('first'); import time; time.sleep(10)"],
+        lines.append, timeout=0.5,
+    )
+
+    assert result.timed_out is True
+    assert lines == ["first"]
@@ -0,0 +1,168 @@
+import hashlib
+import os
+from unittest.mock import patch
+
+import pytest
+
+import updater
+from cpio import CpioError, CpioIndex, CpioStreamParser, parse_header
+from fakes.swu import SW_DESCRIPTION, default_entries, write_swu
+from updater import UpdaterState, import_pass, parse_board
+
+
+@pytest.fixture
+def swu(tmp_path):
+    path = tmp_path / "update.swu"
+    write_swu(path, default_entries(image_size=300_001))
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 110, 4096, 1 << 20])
+def test_stream_parser_any_chunking(swu, chunk_size):
+    data = swu.read_bytes()
+    parser = CpioStreamParser(capture=("sw-description",))
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+
+    parser.finish()
+    assert parser.names == ["sw-description", "sw-description.sig", "rootfs.ext4.gz"]
+    assert parser.captured == {"sw-description": SW_DESCRIPTION}
+    image = parser.entries[2]
+    assert image.size == 300_001
+    assert data[image.offset:image.offset + image.size] == b"\xa5" * 300_001
+
+
+def test_stream_parser_crc_magic(tmp_path):
+    path = tmp_path / "crc.swu"
+    write_swu(path, default_entries(), magic=b"070702")
+    parser = CpioStreamParser()
+    parser.feed(path.read_bytes())
+    assert parser.done
+
+
+def test_stream_parser_truncated(swu):
+    parser = CpioStreamParser()
+    parser.feed(swu.read_bytes()[:5000])
+    with pytest.raises(CpioError):
+        parser.finish()
+
+
+def test_index_walks_headers(swu):
+    with CpioIndex(swu) as archive:
+        assert archive.names == ["sw-description", "sw-description.sig", "rootfs.ext4.gz"]
+        assert "sw-description.sig" in archive
+        assert archive.read("sw-description") == SW_DESCRIPTION
+        assert archive.read("missing") is None
+        image = archive.find("rootfs.ext4.gz")
+
+    # Same byte ranges as the streaming parser
+    parser = CpioStreamParser()
+    parser.feed(swu.read_bytes())
+    assert image == parser.entries[2]
+
+
+@pytest.mark.parametrize("cut", [0, 50, 2000, -600])
+def test_index_truncated(swu, tmp_path, cut):
+    truncated = tmp_path / "truncated.swu"
+    truncated.write_bytes(swu.read_bytes()[:cut])
+    with pytest.raises(CpioError):
+        CpioIndex(truncated)
+
+
+def test_bad_magic():
+    with pytest.raises(CpioError):
+        parse_header(b"PK\x03\x04" + b"0" * 106)
+
+
+def test_parse_board():
+    assert parse_board(SW_DESCRIPTION.decode()) == "streambox_t6"
+    assert parse_board("software = {\n}\n") is None
+
+
+@pytest.mark.parametrize("copy_range", [True, False])
+def test_import_pass_copies_and_hashes(swu, tmp_path, copy_range):
+    dst = tmp_path / "out" / "software.swu"
+    dst.parent.mkdir()
+    data = swu.read_bytes()
+
+    # A different directory on the same filesystem would be hard-linked
+    with patch.object(updater.os, "link", side_effect=OSError("EXDEV")):
+        if copy_range:
+            digest, archive = import_pass(swu, dst, chunk_size=65536)
+        else:
+            with patch.object(updater.os, "copy_file_range", side_effect=OSError("ENOSYS")):
+                digest, archive = import_pass(swu, dst, chunk_size=65536)
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert dst.read_bytes() == data
+    assert archive.done
+    assert archive.captured["sw-description"] == SW_DESCRIPTION
+
+
+def test_import_pass_links_on_same_filesystem(swu, tmp_path):
+    dst = tmp_path / "software.swu"
+    import_pass(swu, dst)
+    assert os.path.samefile(swu, dst)
+
+
+def test_finalize_upload_reads_only_headers(swu, manager):
+    data = swu.read_bytes()
+
+    with patch.object(manager, "_get_available_space", return_value=len(data)), \
+            patch.object(updater.subprocess, "run") as run:
+        assert manager.start_upload(len(data))
+        manager.write_chunk(data, 0)
+        assert manager.finalize_upload(hashlib.sha256(data).hexdigest())
+
+    run.assert_not_called()
+    assert manager.state == UpdaterState.READY.value
+
+
+def test_finalize_upload_board_mismatch(swu, data_dir, manager):
+    manager._device_board = "other_board"
+    data = swu.read_bytes()
+
+    with patch.object(manager, "_get_available_space", return_value=len(data)):
+        manager.start_upload(len(data))
+        manager.write_chunk(data, 0)
+        assert not manager.finalize_upload(hashlib.sha256(data).hexdigest())
+
+    assert "Board mismatch" in manager.error_message
+    assert not (data_dir / "software.swu").exists()
+
+
+def test_import_local_file(swu, data_dir, manager):
+    digest = hashlib.sha256(swu.read_bytes()).hexdigest()
+
+    with patch.object(updater.subprocess, "run") as run:
+        assert manager.import_local_file(str(swu), digest)
+
+    run.assert_not_called()
+    assert manager.state == UpdaterState.READY.value
+    assert (data_dir / "software.swu").read_bytes() == swu.read_bytes()
+    assert not (data_dir / "software.swu.part").exists()
+
+
+def test_import_local_file_board_mismatch(swu, data_dir, manager):
+    manager._device_board = "other_board"
+
+    assert not manager.import_local_file(str(swu), "")
+    assert "Board mismatch" in manager.error_message
+    assert not (data_dir / "software.swu").exists()
+    assert not (data_dir / "software.swu.part").exists()
+
+
+def test_import_local_file_requires_signature(tmp_path, manager):
+    unsigned = tmp_path / "unsigned.swu"
+    write_swu(unsigned, [e for e in default_entries() if e[0] != "sw-description.sig"])
+
+    assert not manager.import_local_file(str(unsigned), "")
+    assert manager.error_message == "Invalid update package: missing sw-description.sig"
+
+
+def test_import_local_file_rejects_non_cpio(tmp_path, manager):
+    bogus = tmp_path / "bogus.swu"
+    bogus.write_bytes(b"PK\x03\x04" + os.urandom(4096))
+
+    assert not manager.import_local_file(str(bogus), "")
+    assert manager.state == UpdaterState.ERROR.value
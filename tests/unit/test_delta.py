@@ -0,0 +1,215 @@
+import hashlib
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+import updater
+from delta import DeltaApplier, DeltaError, apply_delta, read_header, write_delta
+from fakes.swu import SW_DESCRIPTION, write_swu
+from updater import UpdaterManager
+
+
+def _image(seed, size=300_000):
+    return random.Random(seed).randbytes(size)
+
+
+@pytest.fixture
+def packages(tmp_path):
+    """Base 2.4.0 and target 2.4.1: edited image, one region shifted, one file added."""
+    image = _image(1)
+    edited = image[:100_000] + _image(2, 5000) + image[100_000:200_000] + image[203_000:]
+    base = tmp_path / "base.swu"
+    target = tmp_path / "target.swu"
+    write_swu(base, [
+        ("sw-description", SW_DESCRIPTION.replace(b"2.4.1", b"2.4.0")),
+        ("sw-description.sig", b"\x30\x82" + b"\x11" * 254),
+        ("rootfs.ext4.gz", image),
+    ])
+    write_swu(target, [
+        ("sw-description", SW_DESCRIPTION),
+        ("sw-description.sig", b"\x30\x82" + b"\x22" * 254),
+        ("boot.scr", b"setenv bootargs quiet\n"),
+        ("rootfs.ext4.gz", edited),
+    ])
+    return base, target
+
+
+@pytest.fixture
+def delta(packages, tmp_path):
+    base, target = packages
+    path = tmp_path / "update.swudelta"
+    write_delta(base, target, path, "2.4.0")
+    return path
+
+
+def test_roundtrip_is_small(packages, delta, tmp_path):
+    base, target = packages
+    assert delta.stat().st_size < target.stat().st_size // 10
+    header = read_header(delta)
+    assert header.base_version == "2.4.0"
+    assert header.base_sha256 == hashlib.sha256(base.read_bytes()).hexdigest()
+
+    out = tmp_path / "out.swu"
+    computed = apply_delta(delta, base, out, chunk_size=4096)
+    assert out.read_bytes() == target.read_bytes()
+    assert computed == hashlib.sha256(target.read_bytes()).hexdigest()
+
+
+def test_applier_accepts_any_chunking(packages, delta):
+    base, target = packages
+    data = delta.read_bytes()
+    out = bytearray()
+    with open(base, "rb") as f:
+        applier = DeltaApplier(f.fileno(), out.extend)
+        for start in range(0, len(data), 7):
+            applier.feed(data[start:start + 7])
+        applier.finish()
+    assert bytes(out) == target.read_bytes()
+
+
+def test_matches_found_after_large_unaligned_change(tmp_path):
+    # 100 KB of new data, not a block multiple, then the base shifted by it
+    image = _image(3)
+    base = tmp_path / "base.bin"
+    target = tmp_path / "target.bin"
+    base.write_bytes(image)
+    target.write_bytes(image[:50_000] + _image(4, 100_003) + image[50_000:])
+    path = tmp_path / "update.swudelta"
+    assert write_delta(base, target, path, "2.4.0") < 100_003 + 2 * 4096
+
+    out = tmp_path / "out.bin"
+    apply_delta(path, base, out)
+    assert out.read_bytes() == target.read_bytes()
+
+
+def test_full_package_is_not_a_delta(packages):
+    assert read_header(packages[0]) is None
+
+
+@pytest.mark.parametrize("damage", ["truncate", "copy_outside_base", "unknown_record"])
+def test_malformed_delta_rejected(packages, delta, tmp_path, damage):
+    base, _ = packages
+    data = bytearray(delta.read_bytes())
+    header_size = len(read_header(delta).pack())
+    if damage == "truncate":
+        data = data[:len(data) // 2]
+    elif damage == "copy_outside_base":
+        data[header_size:] = bytes([1]) + (10 ** 9).to_bytes(8, "little") + (16).to_bytes(8, "little") + bytes([0])
+    else:
+        data[header_size] = 9
+    delta.write_bytes(data)
+    with pytest.raises(DeltaError):
+        apply_delta(delta, base, tmp_path / "out.swu")
+
+
+@pytest.fixture
+def device(packages, data_dir):
+    """A device running 2.4.0 that kept the 2.4.0 package as its delta base."""
+    base, _ = packages
+    base_dir = data_dir / "updater-base"
+    version_file = data_dir / "sw-versions"
+    version_file.write_text("VERSION=2.4.0\n")
+    with patch.object(updater, "BASE_DIR", base_dir), \
+            patch.object(updater, "BASE_FILE", base_dir / "software.swu"), \
+            patch.object(updater, "BASE_INFO", base_dir / "software.json"), \
+            patch.object(updater, "VERSION_FILE", version_file):
+        base_dir.mkdir()
+        (base_dir / "software.swu").write_bytes(base.read_bytes())
+        (base_dir / "software.json").write_text(json.dumps({
+            "version": "2.4.0",
+            "sha256": hashlib.sha256(base.read_bytes()).hexdigest(),
+            "size": base.stat().st_size,
+        }))
+        yield data_dir
+
+
+@pytest.fixture
+def manager(device, manager):
+    """The shared manager, created once the device's base package is in place."""
+    return manager
+
+
+@pytest.fixture
+def stages(manager):
+    """The names of the stages the manager reports, in order."""
+    stages = []
+
+    def record(status):
+        stage = status["stage"]
+        if stage and stages[-1:] != [stage["name"]]:
+            stages.append(stage["name"])
+
+    manager.add_status_listener(record)
+    return stages
+
+
+def test_delta_upload_rebuilds_package(packages, delta, device, manager, stages):
+    _, target = packages
+    assert manager.get_status()["base_version"] == "2.4.0"
+    data = delta.read_bytes()
+    with patch.object(manager, "_get_available_space", return_value=10 ** 9):
+        assert manager.start_upload(len(data), delta=True)
+    manager.write_chunk(data, 0)
+    assert manager.finalize_upload(hashlib.sha256(data).hexdigest())
+
+    assert manager.state == "ready"
+    assert stages == ["hash", "patch", "index", "board"]
+    assert (device / "software.swu").read_bytes() == target.read_bytes()
+    assert not (device / "software.swu.part").exists()
+
+
+@pytest.mark.parametrize("as_delta", [False, True])
+def test_upload_must_match_how_it_was_started(packages, delta, device, manager, as_delta):
+    # A delta sent with StartUpload, or a full package with StartDeltaUpload
+    data = (packages[1] if as_delta else delta).read_bytes()
+    with patch.object(manager, "_get_available_space", return_value=10 ** 9):
+        assert manager.start_upload(len(data), delta=as_delta)
+    manager.write_chunk(data, 0)
+    assert not manager.finalize_upload(hashlib.sha256(data).hexdigest())
+
+    assert manager.state == "error"
+    assert ("not a delta file" if as_delta else "start it with StartDeltaUpload") in manager.error_message
+    assert not (device / "software.swu").exists()
+
+
+def test_delta_import_rebuilds_package(packages, delta, device, manager, stages):
+    _, target = packages
+    assert manager.import_local_file(str(delta), hashlib.sha256(delta.read_bytes()).hexdigest())
+    assert stages == ["patch", "index", "board"]
+    assert (device / "software.swu").read_bytes() == target.read_bytes()
+
+
+def test_delta_for_other_base_rejected(delta, device):
+    (device / "updater-base" / "software.json").write_text(json.dumps(
+        {"version": "2.4.0", "sha256": "00" * 32, "size": 1}))
+    manager = UpdaterManager()
+    assert not manager.import_local_file(str(delta), "")
+    assert manager.state == "error"
+    assert "Delta is for version 2.4.0" in manager.error_message
+    assert not (device / "software.swu").exists()
+
+
+def test_delta_upload_needs_base(device):
+    (device / "sw-versions").write_text("VERSION=2.3.9\n")
+    manager = UpdaterManager()
+    assert manager.get_status()["base_version"] == ""
+    assert not manager.start_upload(1000, delta=True)
+    assert "No base package" in manager.error_message
+
+
+def test_installed_package_becomes_next_base(packages, device, manager):
+    _, target = packages
+    assert manager.import_local_file(str(target), "")
+    with patch.object(updater, "UPDATE_SCRIPT", "true"), \
+            patch.object(manager, "is_dry_run", return_value=False):
+        manager._run_update()
+
+    info = json.loads((device / "updater-base" / "software.json").read_text())
+    assert info["version"] == "2.4.1"
+    assert info["sha256"] == hashlib.sha256(target.read_bytes()).hexdigest()
+    assert (device / "updater-base" / "software.swu").read_bytes() == target.read_bytes()
+
+    (device / "sw-versions").write_text("VERSION=2.4.1\n")
+    assert UpdaterManager().get_status()["base_version"] == "2.4.1"
@@ -0,0 +1,181 @@
+import hashlib
+import os
+from unittest.mock import patch
+
+import pytest
+
+import digest
+import updater
+from chunkstore import ChunkStore
+from digest import AF_ALG, HASHLIB, Sha256, af_alg_available, kernel_sha256_driver, select_backend
+from fakes.swu import default_entries, write_swu
+from updater import UpdaterManager
+
+PROC_CRYPTO = """name         : sha256
+driver       : sha256-generic
+module       : kernel
+priority     : 100
+type         : shash
+
+name         : sha256
+driver       : sha256-ce
+module       : sha2_ce
+priority     : 200
+type         : shash
+
+name         : sha256
+driver       : sha256-arm64
+module       : kernel
+priority     : 125
+type         : shash
+
+name         : cbc(aes)
+driver       : cbc-aes-ce
+priority     : 300
+type         : skcipher
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_backend():
+    with patch.object(digest, "_selected", None):
+        yield
+
+
+def test_kernel_driver_highest_priority(tmp_path):
+    proc_crypto = tmp_path / "crypto"
+    proc_crypto.write_text(PROC_CRYPTO)
+    assert kernel_sha256_driver(proc_crypto) == "sha256-ce"
+    assert kernel_sha256_driver(tmp_path / "absent") is None
+
+
+@pytest.mark.parametrize("available,driver,expected", [
+    (True, "sha256-ce", AF_ALG),
+    (True, "sha256-generic", HASHLIB),
+    (False, "sha256-ce", HASHLIB),
+])
+def test_auto_selection(available, driver, expected):
+    with patch.object(digest, "af_alg_available", return_value=available), \
+            patch.object(digest, "kernel_sha256_driver", return_value=driver):
+        assert select_backend() == expected
+
+
+def test_unavailable_backend_rejected():
+    with patch.object(digest, "af_alg_available", return_value=False):
+        with pytest.raises(ValueError):
+            select_backend(AF_ALG)
+    with pytest.raises(ValueError):
+        select_backend("md5")
+
+
+def test_hashlib_backend_counts_bytes():
+    data = os.urandom(300_000)
+    sha256 = Sha256(HASHLIB)
+    sha256.update(data[:100_000])
+    sha256.update(memoryview(data)[100_000:])
+    assert sha256.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert sha256.stats()["bytes"] == len(data)
+    assert sha256.stats()["backend"] == HASHLIB
+    with pytest.raises(ValueError):
+        sha256.update(b"more")
+
+
+def test_af_alg_socket_failure_falls_back():
+    with patch.object(digest, "_KernelHash", side_effect=OSError("EMFILE")):
+        sha256 = Sha256(AF_ALG)
+    assert sha256.backend == HASHLIB
+    assert sha256.hexdigest() == hashlib.sha256().hexdigest()
+
+
+class FakeKernelHash:
+    """Stands in for the AF_ALG sockets; counts how often they are closed."""
+
+    instances = []
+
+    def __init__(self):
+        self._impl = hashlib.sha256()
+        self.closed = 0
+        self.instances.append(self)
+
+    def update(self, data):
+        self._impl.update(data)
+
+    def digest(self):
+        self.close()
+        return self._impl.digest()
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.fixture
+def kernel_hashes():
+    FakeKernelHash.instances = []
+    with patch.object(digest, "_KernelHash", FakeKernelHash), \
+            patch.object(digest, "_selected", AF_ALG), \
+            patch.object(updater, "select_backend", return_value=AF_ALG):
+        yield FakeKernelHash.instances
+
+
+def test_close_is_a_no_op_for_hashlib():
+    sha256 = Sha256(HASHLIB)
+    sha256.update(b"abc")
+    sha256.close()
+    sha256.close()
+    assert sha256.stats()["bytes"] == 3
+
+
+@pytest.mark.parametrize("discard", [False, True])
+def test_chunk_store_closes_kernel_hash(tmp_path, kernel_hashes, discard):
+    store = ChunkStore.create(tmp_path / "software.swu.part", 1000)
+    store.write(b"x" * 500, 0)
+    if discard:
+        store.discard()
+    else:
+        store.close()
+    assert [h.closed for h in kernel_hashes] == [1]
+
+
+def test_cancelled_upload_closes_kernel_hash(tmp_path, kernel_hashes):
+    with patch.object(updater, "PART_FILE", tmp_path / "software.swu.part"), \
+            patch.object(updater, "FINAL_FILE", tmp_path / "software.swu"):
+        manager = UpdaterManager()
+        with patch.object(manager, "_get_available_space", return_value=1 << 20):
+            assert manager.start_upload(1000)
+        manager.write_chunk(b"x" * 500, 0)
+        assert manager.cancel_upload()
+    assert [h.closed for h in kernel_hashes] == [1]
+
+
+def test_failed_import_closes_kernel_hash(tmp_path, kernel_hashes):
+    swu = tmp_path / "update.swu"
+    write_swu(swu, default_entries(image_size=1000))
+    with patch.object(updater, "PART_FILE", tmp_path / "software.swu.part"), \
+            patch.object(updater, "FINAL_FILE", tmp_path / "software.swu"), \
+            patch.object(updater, "import_pass", side_effect=OSError("read error")):
+        assert not UpdaterManager().import_local_file(str(swu), "")
+    assert [h.closed for h in kernel_hashes] == [1]
+
+
+@pytest.mark.skipif(not af_alg_available(), reason="AF_ALG sha256 not available")
+@pytest.mark.parametrize("size", [0, 1, 65536, 5 * 1024 * 1024 + 3])
+def test_af_alg_matches_hashlib(size):
+    data = os.urandom(size)
+    sha256 = Sha256(AF_ALG)
+    for start in range(0, size, 1024 * 1024):
+        sha256.update(data[start:start + 1024 * 1024])
+    assert sha256.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_status_reports_import_hash_throughput(tmp_path):
+    swu = tmp_path / "update.swu"
+    write_swu(swu, default_entries(image_size=1_000_000))
+    with patch.object(updater, "PART_FILE", tmp_path / "software.swu.part"), \
+            patch.object(updater, "FINAL_FILE", tmp_path / "software.swu"):
+        manager = UpdaterManager()
+        assert manager.get_status()["hash"]["throughput"] == 0
+        assert manager.import_local_file(str(swu), hashlib.sha256(swu.read_bytes()).hexdigest())
+
+    stats = manager.get_status()["hash"]
+    assert stats["bytes"] == swu.stat().st_size
+    assert stats["throughput"] > 0
@@ -0,0 +1,99 @@
+import asyncio
+import queue
+import time
+
+import pytest
+
+from dispatch import AsyncDispatcher
+
+
+@pytest.fixture
+def main_queue():
+    return queue.Queue()
+
+
+@pytest.fixture
+def dispatcher(main_queue):
+    def call_in_main(func, *args):
+        main_queue.put((func, args))
+        return False
+
+    d = AsyncDispatcher(call_in_main=call_in_main)
+    d.start()
+    yield d
+    d.stop()
+
+
+def _drain(main_queue, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    for _ in range(count):
+        func, args = main_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+        func(*args)
+
+
+def _timed_call(dispatcher, coro, results, name):
+    start = time.monotonic()
+
+    def on_result(value):
+        results[name] = (value, time.monotonic() - start)
+
+    def on_error(e):
+        results[name] = (e, time.monotonic() - start)
+
+    dispatcher.submit(coro, on_result, on_error)
+
+
+def test_submit_delivers_result_on_main(dispatcher, main_queue):
+    async def work():
+        return 42
+
+    results = {}
+    _timed_call(dispatcher, work(), results, "work")
+    _drain(main_queue, 1)
+
+    assert results["work"][0] == 42
+
+
+def test_submit_delivers_error_on_main(dispatcher, main_queue):
+    async def fail():
+        raise ValueError("boom")
+
+    results = {}
+    _timed_call(dispatcher, fail(), results, "fail")
+    _drain(main_queue, 1)
+
+    assert isinstance(results["fail"][0], ValueError)
+
+
+def test_fast_call_not_blocked_by_slow_call(dispatcher, main_queue):
+    async def slow():
+        await asyncio.sleep(1.0)
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    baseline = {}
+    _timed_call(dispatcher, fast(), baseline, "fast")
+    _drain(main_queue, 1)
+
+    results = {}
+    _timed_call(dispatcher, slow(), results, "slow")
+    _timed_call(dispatcher, fast(), results, "fast")
+
+    # Only the fast reply should be ready well before the slow call ends
+    _drain(main_queue, 1, timeout=0.5)
+    assert "fast" in results
+    assert "slow" not in results
+
+    _drain(main_queue, 1)
+    assert results["slow"][0] == "slow"
+    assert results["fast"][1] < baseline["fast"][1] + 0.1
+    assert results["fast"][1] < results["slow"][1]
+
+
+def test_run_sync(dispatcher):
+    async def work():
+        return "done"
+
+    assert dispatcher.run_sync(work(), timeout=5) == "done"
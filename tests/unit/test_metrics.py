@@ -0,0 +1,118 @@
+import sys
+
+import pytest
+
+from command import CommandResult, CommandRunner
+from metrics import LatencyHistogram, Metrics, instrument_methods
+
+
+def test_histogram_quantiles():
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.observe(0.004)
+    for _ in range(10):
+        histogram.observe(0.2)
+
+    assert 0.0025 < histogram.quantile(0.5) <= 0.004
+    assert 0.1 < histogram.quantile(0.95) <= 0.2
+    assert histogram.quantile(0.99) <= 0.2
+    assert histogram.summary()["count"] == 100
+
+
+def test_histogram_overflow_uses_max():
+    histogram = LatencyHistogram()
+    histogram.observe(120.0)
+    assert histogram.quantile(0.99) == 120.0
+
+
+def _service(registry):
+    class Service:
+        def Sync(self, value):
+            if value < 0:
+                raise ValueError("negative")
+            return value * 2
+        Sync._dbus_is_method = True
+
+        def Async(self, value, reply_handler, error_handler):
+            self.pending = (reply_handler, error_handler)
+        Async._dbus_is_method = True
+
+        def helper(self):
+            return "untouched"
+
+    return instrument_methods(Service, registry,
+                              is_method=lambda f: getattr(f, "_dbus_is_method", False))
+
+
+def test_instrument_sync_methods():
+    registry = Metrics()
+    service = _service(registry)()
+
+    assert service.Sync(2) == 4
+    with pytest.raises(ValueError):
+        service.Sync(-1)
+    assert service.helper() == "untouched"
+
+    sync = registry.snapshot()["methods"]["Sync"]
+    assert sync["count"] == 2
+    assert sync["errors"] == 1
+    assert sync["in_flight"] == 0
+    assert "helper" not in registry.snapshot()["methods"]
+
+
+def test_instrument_async_methods_until_callback():
+    registry = Metrics()
+    cls = _service(registry)
+    service = cls()
+    replies = []
+
+    service.Async(1, reply_handler=replies.append, error_handler=replies.append)
+    assert registry.snapshot()["methods"]["Async"]["in_flight"] == 1
+
+    service.pending[0]("done")
+    assert replies == ["done"]
+    entry = registry.snapshot()["methods"]["Async"]
+    assert (entry["in_flight"], entry["count"], entry["errors"]) == (0, 1, 0)
+
+    service.Async(1, reply_handler=replies.append, error_handler=replies.append)
+    service.pending[1](RuntimeError("boom"))
+    assert registry.snapshot()["methods"]["Async"]["errors"] == 1
+    # Decorator metadata survives wrapping
+    assert cls.Async._dbus_is_method is True
+    assert cls.Async.__name__ == "Async"
+
+
+@pytest.mark.asyncio
+async def test_command_observer_records_child_time():
+    registry = Metrics()
+    runner = CommandRunner()
+    runner.add_observer(registry.observe_command)
+
+    await runner.run([sys.executable, "-c", "pass"])
+    await runner.run([sys.executable, "-c", "raise SystemExit(1)"])
+    await runner.run(["streambox-no-such-command"])
+
+    commands = registry.snapshot()["commands"]
+    name = sys.executable.rsplit("/", 1)[-1]
+    assert commands[name]["count"] == 2
+    assert commands[name]["failures"] == 1
+    assert commands[name]["total_seconds"] > 0
+    assert commands["streambox-no-such-command"]["failures"] == 1
+
+
+def test_prometheus_textfile(tmp_path):
+    registry = Metrics()
+    start = registry.method_started("GetNetworkStatus")
+    registry.method_finished("GetNetworkStatus", start)
+    registry.observe_command(CommandResult(["/usr/sbin/ip", "addr"], 0, "", "", 0.003))
+
+    path = tmp_path / "streambox.prom"
+    registry.write_textfile(path)
+    text = path.read_text()
+
+    assert '# TYPE streambox_dbus_method_duration_seconds histogram' in text
+    assert 'streambox_dbus_method_duration_seconds_count{method="GetNetworkStatus"} 1' in text
+    assert 'streambox_dbus_method_duration_seconds_bucket{method="GetNetworkStatus",le="+Inf"} 1' in text
+    assert 'streambox_command_duration_seconds_bucket{command="ip",le="0.005"} 1' in text
+    assert 'streambox_command_failures_total{command="ip"} 0' in text
+    assert not list(tmp_path.glob(".*.tmp"))
@@ -0,0 +1,212 @@
+import asyncio
+import socket
+import struct
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import netlink
+from netlink import (
+    NLMSG_DONE, RTM_DELLINK, RTM_NEWADDR, RTM_NEWLINK, AddrInfo, LinkInfo,
+    NetlinkMonitor, NetworkState, RouteInfo, parse_messages,
+)
+from network import NetworkManager
+
+# Recorded from a live kernel: full RTM_GETLINK/GETADDR/GETROUTE dumps, and
+# the multicast events seen while bringing ifb0 up with 198.51.100.7/24 and
+# a metric 900 default route, then tearing it down again.
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "netlink"
+
+
+def _fixture(name):
+    return (FIXTURES / name).read_bytes()
+
+
+def _dumped_state():
+    state = NetworkState()
+    for name in ("dump_link.bin", "dump_addr.bin", "dump_route.bin"):
+        for msg_type, _seq, payload in parse_messages(_fixture(name)):
+            if msg_type != NLMSG_DONE:
+                state.apply(msg_type, payload)
+    return state
+
+
+def _apply_events(state, name):
+    changed = False
+    for msg_type, _seq, payload in parse_messages(_fixture(name)):
+        changed |= state.apply(msg_type, payload)
+    return changed
+
+
+def test_parse_link_dump():
+    messages = list(parse_messages(_fixture("dump_link.bin")))
+
+    assert messages[-1] == (NLMSG_DONE, 1, None)
+    links = {p.name: p for t, _s, p in messages if t == RTM_NEWLINK}
+    assert set(links) == {"lo", "ifb0", "ifb1", "eth0"}
+    assert links["eth0"] == LinkInfo(4, "eth0", "UP", "02:fc:00:00:00:01")
+    assert links["ifb0"].operstate == "DOWN"
+
+
+def test_parse_truncated_buffer_stops():
+    data = _fixture("dump_addr.bin")
+    messages = list(parse_messages(data[:-5]))
+    assert len(messages) < len(list(parse_messages(data)))
+
+
+def test_dumped_state_matches_ip_json():
+    links, routes = _dumped_state().to_ip_json()
+
+    eth0 = next(link for link in links if link["ifname"] == "eth0")
+    assert eth0["operstate"] == "UP"
+    assert eth0["addr_info"] == [{"family": "inet", "local": "192.0.2.2", "prefixlen": 24}]
+    assert routes == [{"dst": "default", "dev": "eth0", "gateway": "192.0.2.1"}]
+
+
+def test_events_update_state_and_reverse():
+    state = _dumped_state()
+    before = state.to_ip_json()
+
+    assert _apply_events(state, "events_ifb0_up.bin")
+    links, routes = state.to_ip_json()
+    ifb0 = next(link for link in links if link["ifname"] == "ifb0")
+    assert ifb0["addr_info"] == [{"family": "inet", "local": "198.51.100.7", "prefixlen": 24}]
+    assert routes[-1] == {"dst": "default", "dev": "ifb0", "gateway": "198.51.100.1"}
+
+    assert _apply_events(state, "events_ifb0_down.bin")
+    assert state.to_ip_json() == before
+
+
+def test_repeated_message_is_not_a_change():
+    state = NetworkState()
+    link = LinkInfo(2, "eth0", "UP", "aa:bb:cc:dd:ee:01")
+    assert state.apply(RTM_NEWLINK, link)
+    assert not state.apply(RTM_NEWLINK, LinkInfo(2, "eth0", "UP", "aa:bb:cc:dd:ee:01"))
+    assert not state.apply(RTM_NEWADDR, AddrInfo(2, socket.AF_INET6, "fe80::1", 64))
+
+
+def test_ipv4ll_address_is_not_a_lease():
+    state = NetworkState()
+    state.apply(RTM_NEWLINK, LinkInfo(2, "eth0", "UP", "aa:bb:cc:dd:ee:01"))
+    state.apply(RTM_NEWADDR, AddrInfo(2, socket.AF_INET, "169.254.23.9", 16))
+    assert not state.has_ipv4_address("eth0")
+
+    state.apply(RTM_NEWADDR, AddrInfo(2, socket.AF_INET, "192.168.1.20", 24))
+    assert state.has_ipv4_address("eth0")
+
+
+def test_dellink_drops_addresses_and_routes():
+    state = NetworkState()
+    state.apply(RTM_NEWLINK, LinkInfo(3, "wlan0", "UP", ""))
+    state.apply(RTM_NEWADDR, AddrInfo(3, socket.AF_INET, "10.0.0.5", 16))
+    state.apply(netlink.RTM_NEWROUTE, RouteInfo(socket.AF_INET, 0, 254, 3, "10.0.0.1", 600))
+
+    assert state.apply(RTM_DELLINK, LinkInfo(3, "wlan0", "DOWN", ""))
+    assert state.to_ip_json() == ([], [])
+
+
+def test_dump_request_layout():
+    request = netlink.build_dump_request(netlink.RTM_GETADDR, 7, socket.AF_INET)
+    length, msg_type, flags, seq, _pid = struct.unpack_from("=IHHII", request)
+
+    assert length == len(request) == 20
+    assert (msg_type, seq) == (netlink.RTM_GETADDR, 7)
+    assert flags == netlink.NLM_F_REQUEST | netlink.NLM_F_DUMP
+    assert request[16] == socket.AF_INET
+
+
+def test_monitor_reads_queued_events():
+    changes = []
+    monitor = NetlinkMonitor(on_change=lambda: changes.append(True))
+    monitor.state = _dumped_state()
+    reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    reader.setblocking(False)
+    monitor._sock = reader
+    try:
+        writer.send(_fixture("events_ifb0_up.bin"))
+        monitor._on_readable()
+        assert changes == [True]
+        assert monitor.state.has_ipv4_address("ifb0")
+
+        monitor._on_readable()
+        assert changes == [True]
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_network_manager_publishes_only_changed_interfaces():
+    manager = NetworkManager()
+    manager._monitor = NetlinkMonitor(on_change=manager._on_netlink_change)
+    manager._monitor.state = _dumped_state()
+    diffs = []
+    manager.add_change_listener(diffs.append)
+
+    with patch.object(NetworkManager, "ALLOWED_INTERFACES", ["eth0", "ifb0"]):
+        manager._published = {i["name"]: i for i in manager._interfaces_from_state()}
+        _apply_events(manager._monitor.state, "events_ifb0_up.bin")
+        manager._on_netlink_change()
+        manager._on_netlink_change()
+
+    assert len(diffs) == 1
+    assert list(diffs[0]) == ["ifb0"]
+    assert diffs[0]["ifb0"]["ip_address"] == "198.51.100.7"
+    assert diffs[0]["ifb0"]["netmask"] == "255.255.255.0"
+
+
+@pytest.fixture
+def monitored_manager():
+    manager = NetworkManager()
+    monitor = NetlinkMonitor(on_change=manager._on_netlink_change)
+    monitor.state = _dumped_state()
+    reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    reader.setblocking(False)
+    monitor._sock = reader
+    manager._monitor = monitor
+    yield manager, writer
+    reader.close()
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_dhcp_lease_returns_on_address_event(monitored_manager):
+    manager, writer = monitored_manager
+    loop = asyncio.get_running_loop()
+    loop.add_reader(manager._monitor._sock.fileno(), manager._monitor._on_readable)
+    commands = []
+
+    async def run(args, timeout=30):
+        commands.append(args)
+        if args[0] == "dhcpcd":
+            loop.call_later(0.05, writer.send, _fixture("events_ifb0_up.bin"))
+        return True, ""
+
+    try:
+        with patch.object(manager, '_run_command', side_effect=run):
+            assert await manager._acquire_dhcp_lease("ifb0") is True
+    finally:
+        loop.remove_reader(manager._monitor._sock.fileno())
+
+    assert commands[1] == ["dhcpcd", "-b", "-t", "30", "ifb0"]
+    assert 0.04 < manager.time_to_address["ifb0"] < 1
+    assert manager._address_waiters["ifb0"] == []
+
+
+@pytest.mark.asyncio
+async def test_dhcp_lease_deadline(monitored_manager):
+    manager, _writer = monitored_manager
+    manager.dhcp_timeout = 0.1
+
+    with patch.object(manager, '_run_command', return_value=(True, "")):
+        assert await manager._acquire_dhcp_lease("ifb0") is False
+    assert "ifb0" not in manager.time_to_address
+
+
+@pytest.mark.asyncio
+async def test_wait_for_ipv4_sees_queued_events(monitored_manager):
+    manager, writer = monitored_manager
+    # Events already queued when the wait starts are applied first
+    writer.send(_fixture("events_ifb0_up.bin"))
+
+    assert await manager.wait_for_ipv4("ifb0", timeout=0) is not None
@@ -0,0 +1,256 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from unittest.mock import patch
+
+from network import NetworkManager
+
+IP_ADDR = json.dumps([
+    {"ifindex": 1, "ifname": "lo", "operstate": "UNKNOWN", "address": "00:00:00:00:00:00",
+     "addr_info": [{"family": "inet", "local": "127.0.0.1", "prefixlen": 8}]},
+    {"ifindex": 2, "ifname": "eth0", "operstate": "UP", "address": "aa:bb:cc:dd:ee:01",
+     "addr_info": [{"family": "inet6", "local": "fe80::1", "prefixlen": 64},
+                   {"family": "inet", "local": "192.168.1.10", "prefixlen": 24}]},
+    {"ifindex": 3, "ifname": "wlan0", "operstate": "UP", "address": "aa:bb:cc:dd:ee:02",
+     "addr_info": [{"family": "inet", "local": "10.0.0.5", "prefixlen": 16}]},
+    {"ifindex": 4, "ifname": "wlan1", "operstate": "DOWN", "address": "aa:bb:cc:dd:ee:03",
+     "addr_info": []},
+])
+
+IP_ROUTE = json.dumps([
+    {"dst": "default", "gateway": "192.168.1.1", "dev": "eth0"},
+    {"dst": "default", "gateway": "10.0.0.1", "dev": "wlan0", "metric": 600},
+])
+
+
+@pytest.fixture
+def network_manager():
+    return NetworkManager()
+
+
+def _fake_ip(calls):
+    async def run(args, timeout=30):
+        calls.append(args)
+        if args[:3] == ["ip", "-j", "addr"]:
+            return True, IP_ADDR
+        if args[:3] == ["ip", "-j", "route"]:
+            return True, IP_ROUTE
+        return False, ""
+    return run
+
+
+@pytest.mark.asyncio
+async def test_get_interfaces_single_snapshot(network_manager):
+    calls = []
+    with patch.object(network_manager, '_run_command', side_effect=_fake_ip(calls)):
+        interfaces = await network_manager.get_interfaces()
+
+    assert len(calls) == 2
+    assert [i["name"] for i in interfaces] == ["eth0", "wlan0", "wlan1"]
+
+    eth0, wlan0, wlan1 = interfaces
+    assert eth0["type"] == "wired"
+    assert eth0["state"] == "up"
+    assert eth0["mac"] == "aa:bb:cc:dd:ee:01"
+    assert eth0["ip_address"] == "192.168.1.10"
+    assert eth0["netmask"] == "255.255.255.0"
+    assert eth0["gateway"] == "192.168.1.1"
+    assert wlan0["netmask"] == "255.255.0.0"
+    assert wlan0["gateway"] == "10.0.0.1"
+    assert wlan1["ip_address"] is None
+    assert wlan1["gateway"] == "192.168.1.1"
+
+
+@pytest.mark.asyncio
+async def test_get_interface_ip(network_manager):
+    calls = []
+    with patch.object(network_manager, '_run_command', side_effect=_fake_ip(calls)):
+        info = await network_manager._get_interface_ip("wlan0")
+
+    assert info == {"ip_address": "10.0.0.5", "netmask": "255.255.0.0", "gateway": "10.0.0.1"}
+
+
+@pytest.mark.asyncio
+async def test_get_interfaces_fallback_without_json(network_manager):
+    async def run(args, timeout=30):
+        if args == ["ip", "link", "show"]:
+            return True, "1: lo: <LOOPBACK>\n2: eth0: <BROADCAST>\n"
+        return False, ""
+
+    with patch.object(network_manager, '_run_command', side_effect=run):
+        interfaces = await network_manager.get_interfaces()
+
+    assert [i["name"] for i in interfaces] == ["eth0"]
+    assert interfaces[0]["state"] == "unknown"
+
+
+def test_prefix_to_netmask(network_manager):
+    assert network_manager._prefix_to_netmask(24) == "255.255.255.0"
+    assert network_manager._prefix_to_netmask(20) == "255.255.240.0"
+
+
+def test_netmask_to_prefix(network_manager):
+    assert network_manager._netmask_to_prefix("255.255.255.0") == 24
+    assert network_manager._netmask_to_prefix("bogus") == 24
+
+
+@pytest.mark.asyncio
+async def test_scan_wifi_networks_streams_iw_output(network_manager):
+    scan = (Path(__file__).resolve().parent.parent / "fixtures" / "iw" / "scan.txt").read_text()
+
+    async def run_lines(args, on_line, timeout=30):
+        assert args == ["iw", "dev", "wlan0", "scan"]
+        for line in scan.splitlines():
+            on_line(line)
+        return True
+
+    with patch.object(network_manager, '_run_command', return_value=(True, "")), \
+         patch.object(network_manager, '_run_command_lines', side_effect=run_lines):
+        networks = await network_manager.scan_wifi_networks("wlan0")
+
+    assert [n["ssid"] for n in networks] == ["HomeNet", "Office 6E", "Cafe Guest", "Legacy"]
+    assert networks[0]["bssid"] == "a0:b1:c2:d3:e4:02"
+    assert networks[0]["bands"] == ["2.4GHz", "5GHz"]
+
+
+def _fake_iw(calls, delay=0):
+    scan = (Path(__file__).resolve().parent.parent / "fixtures" / "iw" / "scan.txt").read_text()
+
+    async def run_lines(args, on_line, timeout=30):
+        calls.append(args)
+        await asyncio.sleep(delay)
+        if args[-1] == "dump":
+            return True
+        for line in scan.splitlines():
+            on_line(line)
+        return True
+    return run_lines
+
+
+@pytest.mark.asyncio
+async def test_scan_cache_serves_fresh_results(network_manager):
+    calls = []
+    with patch.object(network_manager, '_run_command', return_value=(True, "")), \
+         patch.object(network_manager, '_run_command_lines', side_effect=_fake_iw(calls)):
+        first = await network_manager.scan_wifi_networks("wlan0", max_age=0)
+        second = await network_manager.scan_wifi_networks("wlan0", max_age=60)
+        third = await network_manager.scan_wifi_networks("wlan0", max_age=0)
+
+    assert first == second == third
+    assert [c[-1] for c in calls] == ["scan", "scan"]
+
+
+@pytest.mark.asyncio
+async def test_scan_concurrent_requests_share_one_scan(network_manager):
+    calls = []
+    with patch.object(network_manager, '_run_command', return_value=(True, "")), \
+         patch.object(network_manager, '_run_command_lines', side_effect=_fake_iw(calls, 0.05)):
+        results = await asyncio.gather(
+            *(network_manager.scan_wifi_networks("wlan0") for _ in range(5))
+        )
+
+    assert calls == [["iw", "dev", "wlan0", "scan"]]
+    assert all(r == results[0] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_scan_cancelled_caller_does_not_abort_shared_scan(network_manager):
+    calls = []
+    with patch.object(network_manager, '_run_command', return_value=(True, "")), \
+         patch.object(network_manager, '_run_command_lines', side_effect=_fake_iw(calls, 0.05)):
+        first = asyncio.ensure_future(network_manager.scan_wifi_networks("wlan0"))
+        second = asyncio.ensure_future(network_manager.scan_wifi_networks("wlan0"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        networks = await second
+
+    assert len(calls) == 1
+    assert networks[0]["ssid"] == "HomeNet"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("flags,scans", [("0x1002\n", 0), ("0x1003\n", 1)])
+async def test_background_scan_leaves_down_link_alone(network_manager, tmp_path, flags, scans):
+    (tmp_path / "wlan0").mkdir()
+    (tmp_path / "wlan0" / "flags").write_text(flags)
+    calls = []
+    commands = []
+
+    async def run(args, timeout=30):
+        commands.append(args)
+        return True, ""
+
+    with patch.object(network_manager, "SYS_CLASS_NET", tmp_path), \
+         patch.object(network_manager, '_run_command', side_effect=run), \
+         patch.object(network_manager, '_run_command_lines', side_effect=_fake_iw(calls)):
+        task = asyncio.ensure_future(network_manager._background_scan("wlan0", 60))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    assert len(calls) == scans
+    assert (["ip", "link", "set", "wlan0", "up"] in commands) == bool(scans)
+
+
+@pytest.mark.asyncio
+async def test_scan_uses_passive_dump_when_allowed(network_manager):
+    scan = (Path(__file__).resolve().parent.parent / "fixtures" / "iw" / "scan.txt").read_text()
+    calls = []
+
+    async def run_lines(args, on_line, timeout=30):
+        calls.append(args)
+        for line in scan.splitlines():
+            on_line(line)
+        return True
+
+    with patch.object(network_manager, '_run_command', return_value=(True, "")) as run, \
+         patch.object(network_manager, '_run_command_lines', side_effect=run_lines):
+        networks = await network_manager.scan_wifi_networks("wlan0", max_age=60)
+        again = await network_manager.scan_wifi_networks("wlan0", max_age=60)
+        forced = await network_manager.scan_wifi_networks("wlan0", max_age=10)
+
+    assert networks == again == forced
+    assert calls == [["iw", "dev", "wlan0", "scan", "dump"], ["iw", "dev", "wlan0", "scan"]]
+    run.assert_called_once_with(["ip", "link", "set", "wlan0", "up"])
+
+
+@pytest.mark.asyncio
+async def test_wait_for_ipv4_polls_without_netlink(network_manager):
+    network_manager.ADDRESS_POLL_INTERVAL = 0.01
+    replies = iter([None, None, "192.168.1.10"])
+
+    async def get_ip(interface):
+        return {"ip_address": next(replies), "netmask": None, "gateway": None}
+
+    with patch.object(network_manager, '_get_interface_ip', side_effect=get_ip):
+        elapsed = await network_manager.wait_for_ipv4("eth0", timeout=1)
+
+    assert elapsed is not None and elapsed >= 0.02
+
+
+@pytest.mark.asyncio
+async def test_wait_for_ipv4_ignores_ipv4ll(network_manager):
+    network_manager.ADDRESS_POLL_INTERVAL = 0.01
+
+    async def get_ip(interface):
+        return {"ip_address": "169.254.23.9", "netmask": "255.255.0.0", "gateway": None}
+
+    with patch.object(network_manager, '_get_interface_ip', side_effect=get_ip):
+        assert await network_manager.wait_for_ipv4("eth0", timeout=0.05) is None
+
+
+@pytest.mark.asyncio
+async def test_set_wired_dhcp_falls_back_to_dhclient(network_manager):
+    calls = []
+
+    async def run(args, timeout=30):
+        calls.append(args)
+        return args[0] != "dhcpcd", ""
+
+    with patch.object(network_manager, '_run_command', side_effect=run), \
+         patch.object(network_manager, 'wait_for_ipv4', return_value=0.5):
+        assert await network_manager.set_wired_config({"method": "dhcp"}) is True
+
+    assert [c[0] for c in calls] == ["ip", "dhcpcd", "dhclient"]
+    assert network_manager.time_to_address["eth0"] == 0.5
@@ -0,0 +1,409 @@
+import asyncio
+import json
+import operator
+import os
+import select
+import socket
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+
+import storage
+from cmdtrace import current_method, run_in_method
+from command import CommandResult
+from storage import (
+    StorageManager, build_inventory, filesystem_usage, parse_lsblk, parse_mountinfo, parse_uevent,
+)
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "storage"
+MOUNTINFO = (FIXTURES / "mountinfo.txt").read_text()
+LSBLK = (FIXTURES / "lsblk.json").read_text()
+
+# f_bsize, f_frsize, f_blocks, f_bfree, f_bavail, f_files, f_ffree, f_favail, f_flag, f_namemax
+USAGE = {
+    "/": os.statvfs_result((4096, 4096, 1000000, 400000, 350000, 0, 0, 0, 0, 255)),
+    "/data": os.statvfs_result((4096, 4096, 6000000, 5700000, 5400000, 0, 0, 0, 0, 255)),
+    "/media/SD CARD": os.statvfs_result((32768, 32768, 1948000, 974000, 974000, 0, 0, 0, 0, 255)),
+    "/proc": os.statvfs_result((4096, 4096, 0, 0, 0, 0, 0, 0, 0, 255)),
+    "/sys": os.statvfs_result((4096, 4096, 0, 0, 0, 0, 0, 0, 0, 255)),
+}
+
+
+def _statvfs(path):
+    if path not in USAGE:
+        raise FileNotFoundError(path)
+    return USAGE[path]
+
+
+def test_parse_mountinfo_unescapes_paths():
+    mounts = parse_mountinfo(MOUNTINFO)
+
+    assert len(mounts) == 8
+    assert mounts[0] == storage.MountEntry("179:2", "/", "ext4", "/dev/root")
+    assert mounts[-1].mount_point == "/media/SD CARD"
+    assert mounts[-1].fstype == "vfat"
+
+
+def test_parse_lsblk_flattens_and_inherits_transport():
+    devices = {d.name: d for d in parse_lsblk(LSBLK)}
+
+    assert list(devices) == ["mmcblk0", "mmcblk0p1", "mmcblk0p2", "mmcblk0p3",
+                             "mmcblk1", "mmcblk1p1", "sda", "sda1", "zram0"]
+    assert devices["sda1"].transport == "usb"
+    assert devices["sda1"].removable is True
+    assert devices["mmcblk0p2"].size == 4294967296
+    assert devices["mmcblk0p2"].mount_point == "/"
+
+
+def test_parse_lsblk_accepts_string_values():
+    text = ('{"blockdevices": [{"name": "sdb1", "path": "/dev/sdb1", "label": "", '
+            '"fstype": "vfat", "size": "1024", "mountpoint": null, "rm": "1", '
+            '"tran": "usb", "maj:min": "8:17"}]}')
+    (device,) = parse_lsblk(text)
+
+    assert device.size == 1024
+    assert device.removable is True
+
+
+def test_parse_lsblk_garbage():
+    assert parse_lsblk("lsblk: unknown column") == []
+
+
+def test_filesystem_usage_matches_df():
+    size, used, available, use_percent = filesystem_usage(USAGE["/"])
+
+    assert size == 4096000000
+    assert used == 2457600000
+    assert available == 1433600000
+    # df rounds up: 600000 / 950000 = 63.2%
+    assert use_percent == 64
+
+
+def test_build_inventory():
+    filesystems = build_inventory(parse_mountinfo(MOUNTINFO), parse_lsblk(LSBLK), _statvfs)
+
+    assert [f["mount_point"] for f in filesystems] == ["/", "/data", "/media/SD CARD", ""]
+    root, data, sdcard, stick = filesystems
+    # /dev/root is resolved to the partition through its device number
+    assert root["device"] == "/dev/mmcblk0p2"
+    assert root["label"] == "rootfs"
+    assert data["use_percent"] == 6
+    assert sdcard["label"] == "SD CARD"
+    assert sdcard["removable"] is True
+    assert stick == {
+        "device": "/dev/sda1", "mount_point": "", "fstype": "exfat",
+        "size": 15551430656, "used": 0, "available": 0, "use_percent": 0,
+        "label": "STICK", "removable": True, "transport": "usb",
+    }
+
+
+def test_build_inventory_skips_unreadable_mounts():
+    def statvfs(path):
+        if path == "/data":
+            raise PermissionError(path)
+        return _statvfs(path)
+
+    filesystems = build_inventory(parse_mountinfo(MOUNTINFO), [], statvfs)
+
+    assert [f["device"] for f in filesystems] == ["/dev/root", "/dev/mmcblk1p1"]
+    assert filesystems[0]["label"] == ""
+
+
+@pytest.mark.asyncio
+async def test_list_filesystems_forks_once(tmp_path):
+    mountinfo = tmp_path / "mountinfo"
+    mountinfo.write_text(MOUNTINFO)
+    calls = []
+
+    async def run(args, timeout=30):
+        calls.append(args)
+        return CommandResult(args, 0, LSBLK, "", 0.01)
+
+    with patch.object(storage, "run_command", side_effect=run), \
+            patch.object(storage, "MOUNTINFO_PATH", str(mountinfo)), \
+            patch.object(storage.os, "statvfs", side_effect=_statvfs):
+        filesystems = await storage.list_filesystems()
+
+    assert calls == [["lsblk", "-J", "-b", "-o", storage.LSBLK_COLUMNS]]
+    assert len(filesystems) == 4
+
+
+def _uevent(action, devname, major, minor, subsystem="block"):
+    devpath = f"/devices/platform/usb/host0/block/sda/{devname}"
+    env = [f"ACTION={action}", f"DEVPATH={devpath}", f"SUBSYSTEM={subsystem}",
+           f"MAJOR={major}", f"MINOR={minor}", f"DEVNAME={devname}",
+           "DEVTYPE=partition", "SEQNUM=4242"]
+    return "\0".join([f"{action}@{devpath}"] + env).encode() + b"\0"
+
+
+def test_parse_uevent():
+    event = parse_uevent(_uevent("add", "sda1", 8, 1))
+
+    assert event["ACTION"] == "add"
+    assert event["SUBSYSTEM"] == "block"
+    assert (event["MAJOR"], event["MINOR"]) == ("8", "1")
+
+
+def test_parse_uevent_ignores_udev_messages():
+    assert parse_uevent(b"libudev\0\xfe\xed\xca\xfe" + b"\0" * 32) is None
+    assert parse_uevent(b"") is None
+
+
+@pytest_asyncio.fixture
+async def monitored_storage(tmp_path):
+    mountinfo = tmp_path / "mountinfo"
+    mountinfo.write_text(MOUNTINFO)
+    manager = StorageManager()
+    manager.UEVENT_SETTLE = 0.01
+    manager._loop = asyncio.get_running_loop()
+    manager._devices = parse_lsblk(LSBLK)
+    manager._mountinfo = open(mountinfo)
+    manager._mounts = manager._read_mounts()
+    manager._mount_poll = select.epoll()
+    reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    reader.setblocking(False)
+    manager._uevent_sock = reader
+    diffs = []
+    manager.add_change_listener(diffs.append)
+    with patch.object(storage.os, "statvfs", side_effect=_statvfs):
+        manager._published = await manager._inventory()
+        yield manager, writer, mountinfo, diffs
+    manager._loop = None
+    await manager.cleanup()
+    writer.close()
+
+
+async def _settle(manager):
+    for task in (manager._refresh_task, manager._publish_task):
+        if task is not None:
+            await task
+
+
+@pytest.mark.asyncio
+async def test_remove_uevent_updates_without_forking(monitored_storage):
+    manager, writer, _mountinfo, diffs = monitored_storage
+
+    with patch.object(storage, "run_command") as run:
+        writer.send(_uevent("remove", "sda1", 8, 1))
+        writer.send(_uevent("remove", "sda", 8, 0))
+        manager._on_uevent_readable()
+        await _settle(manager)
+        filesystems = await manager.get_filesystems()
+
+    run.assert_not_called()
+    assert diffs == [{"/dev/sda1": None}]
+    assert "/dev/sda1" not in {fs["device"] for fs in filesystems}
+
+
+@pytest.mark.asyncio
+async def test_add_burst_runs_one_lsblk(monitored_storage):
+    manager, writer, _mountinfo, diffs = monitored_storage
+    manager._devices = [d for d in manager._devices if not d.name.startswith("sda")]
+    manager._published = await manager._inventory()
+    calls = []
+
+    async def run(args, timeout=30):
+        calls.append(args)
+        return CommandResult(args, 0, LSBLK, "", 0.01)
+
+    with patch.object(storage, "run_command", side_effect=run):
+        writer.send(_uevent("add", "sda", 8, 0))
+        writer.send(_uevent("add", "sda1", 8, 1))
+        writer.send(_uevent("add", "input5", 13, 64, subsystem="input"))
+        manager._on_uevent_readable()
+        await asyncio.sleep(manager.UEVENT_SETTLE * 3)
+        await _settle(manager)
+
+    assert len(calls) == 1
+    assert list(diffs[0]) == ["/dev/sda1"]
+    assert diffs[0]["/dev/sda1"]["label"] == "STICK"
+
+
+@pytest.mark.asyncio
+async def test_mount_table_change_is_pushed(monitored_storage):
+    manager, _writer, mountinfo, diffs = monitored_storage
+    # The SD card is unmounted
+    mountinfo.write_text("\n".join(MOUNTINFO.splitlines()[:-1]) + "\n")
+
+    manager._on_mounts_readable()
+    await _settle(manager)
+    manager._on_mounts_readable()
+    await _settle(manager)
+
+    assert len(diffs) == 1
+    assert diffs[0]["/media/SD CARD"] is None
+    assert diffs[0]["/dev/mmcblk1p1"]["mount_point"] == ""
+    assert diffs[0]["/dev/mmcblk1p1"]["size"] == 63863521280
+
+
+def _apply_changes(filesystems, changes):
+    # Mirrors StorageSettings.applyChanges in frontend/storage-settings.js
+    filesystems = list(filesystems)
+    for key, record in changes.items():
+        index = next((i for i, fs in enumerate(filesystems) if (fs["mount_point"] or fs["device"]) == key), None)
+        if record is None:
+            if index is not None:
+                del filesystems[index]
+        elif index is not None:
+            filesystems[index] = record
+        else:
+            filesystems.append(record)
+    return filesystems
+
+
+@pytest.mark.asyncio
+async def test_pushed_changes_rebuild_the_inventory(monitored_storage):
+    manager, _writer, mountinfo, diffs = monitored_storage
+    shown = await manager.get_filesystems()
+
+    for text in ("\n".join(MOUNTINFO.splitlines()[:-1]) + "\n", MOUNTINFO):
+        mountinfo.write_text(text)
+        manager._on_mounts_readable()
+        await _settle(manager)
+        # As StorageChanged carries it to the page
+        shown = _apply_changes(shown, json.loads(json.dumps({"filesystems": diffs[-1]}))["filesystems"])
+
+        key = operator.itemgetter("device", "mount_point")
+        assert sorted(shown, key=key) == sorted(await manager.get_filesystems(), key=key)
+    assert len(diffs) == 2
+
+
+@pytest.mark.asyncio
+async def test_mounts_sharing_a_source_are_kept_apart(monitored_storage):
+    manager, _writer, _mountinfo, _diffs = monitored_storage
+    manager._mounts = parse_mountinfo(
+        "40 19 0:40 / / rw - overlay overlay rw\n"
+        "41 19 0:41 / /data rw - overlay overlay rw\n"
+    )
+    manager._devices = []
+
+    inventory = await manager._inventory()
+
+    assert sorted(inventory) == ["/", "/data"]
+    assert {fs["device"] for fs in inventory.values()} == {"overlay"}
+
+
+@pytest.mark.asyncio
+async def test_jobs_serialise_per_device_and_run_devices_in_parallel():
+    manager = StorageManager()
+    finished = []
+    manager.add_job_listener(finished.append)
+    running = []
+    overlap = []
+
+    async def run(args, timeout=30):
+        running.append(args[-1])
+        overlap.append(list(running))
+        await asyncio.sleep(0.02)
+        running.remove(args[-1])
+        return CommandResult(args, 0, "", "", 0.02)
+
+    with patch.object(storage, "run_command", side_effect=run), \
+            patch.object(storage, "list_block_devices", return_value=[]), \
+            patch.object(storage.os, "makedirs"):
+        first = manager.start_unmount("sda1")
+        second = manager.start_unmount("/dev/sda1", lazy=True)
+        other = manager.start_unmount("mmcblk1p1")
+        assert [job["state"] for job in manager.get_jobs()] == ["queued"] * 3
+        while len(finished) < 3:
+            await asyncio.sleep(0.01)
+
+    assert first.device == second.device == "/dev/sda1"
+    assert second.options == {"lazy": True, "sync": False}
+    # The two sda1 jobs never overlapped; the SD card ran next to the first
+    assert ["/dev/sda1", "/dev/sda1"] not in overlap
+    assert ["/dev/sda1", "/dev/mmcblk1p1"] in overlap
+    assert [job.id for job in finished].index(first.id) < [job.id for job in finished].index(second.id)
+    assert all(job.state == "succeeded" for job in finished)
+
+
+@pytest.mark.asyncio
+async def test_failed_mount_job_reports_error():
+    manager = StorageManager()
+    finished = []
+    manager.add_job_listener(finished.append)
+
+    async def run(args, timeout=30):
+        return CommandResult(args, 32, "", "mount: wrong fs type, bad option\n", 0.01)
+
+    with patch.object(storage, "run_command", side_effect=run), \
+            patch.object(storage, "list_block_devices", return_value=[]), \
+            patch.object(storage.os, "makedirs"):
+        job = manager.start_mount("sda1")
+        await manager._job_tasks[job.id]
+
+    assert finished == [job]
+    assert job.state == "failed"
+    assert job.error == "mount: wrong fs type, bad option"
+    assert job.finished >= job.started
+
+
+@pytest.mark.asyncio
+async def test_job_fails_on_unexpected_error():
+    manager = StorageManager()
+    finished = []
+    manager.add_job_listener(finished.append)
+
+    with patch.object(storage, "list_block_devices", return_value=[]), \
+            patch.object(storage.os, "makedirs", side_effect=OSError(30, "Read-only file system")):
+        job = manager.start_mount("sda1")
+        await manager._job_tasks[job.id]
+
+    assert finished == [job]
+    assert job.state == "failed"
+    assert "Read-only file system" in job.error
+    assert job.finished >= job.started
+    assert manager._job_tasks == {}
+
+
+@pytest.mark.asyncio
+async def test_job_commands_traced_as_background():
+    manager = StorageManager()
+    methods = []
+
+    async def run(args, timeout=30):
+        methods.append(current_method.get())
+        return CommandResult(args, 0, "", "", 0.0)
+
+    async def handler():
+        return manager.start_unmount("sda1")
+
+    with patch.object(storage, "run_command", side_effect=run):
+        job = await run_in_method("UnmountDevice", handler())
+        await manager._job_tasks[job.id]
+
+    assert methods == ["background:storage-unmount"]
+
+
+@pytest.mark.asyncio
+async def test_unmount_options():
+    manager = StorageManager()
+    calls = []
+
+    async def run(args, timeout=30):
+        calls.append(args)
+        return CommandResult(args, 0, "", "", 0.01)
+
+    with patch.object(storage, "run_command", side_effect=run), \
+            patch.object(storage.os, "sync") as sync:
+        await manager.unmount("sda1", lazy=True, sync=True)
+
+    sync.assert_called_once()
+    assert calls == [["umount", "-l", "/dev/sda1"]]
+
+
+@pytest.mark.asyncio
+async def test_job_history_is_bounded():
+    manager = StorageManager()
+    manager.JOB_HISTORY = 2
+
+    async def run(args, timeout=30):
+        return CommandResult(args, 0, "", "", 0.0)
+
+    with patch.object(storage, "run_command", side_effect=run):
+        jobs = [manager.start_unmount(f"sd{c}1") for c in "abcd"]
+        await asyncio.gather(*manager._job_tasks.values())
+
+    assert [job["id"] for job in manager.get_jobs()] == [jobs[2].id, jobs[3].id]
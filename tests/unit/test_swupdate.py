@@ -0,0 +1,146 @@
+import hashlib
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from fakes.swu import default_entries, write_swu
+from fakes.swupdate import FakeSwupdate
+from swupdate import IPC_MESSAGE_SIZE, STREAM_HOLDBACK, SwupdateClient
+
+
+@pytest.fixture
+def daemon():
+    # Socket paths are limited to 108 bytes, too short for tmp_path
+    with tempfile.TemporaryDirectory(prefix="swu-") as workdir:
+        fake = FakeSwupdate(Path(workdir) / "sockinstctrl")
+        fake.start()
+        yield fake
+        fake.stop()
+
+
+@pytest.fixture
+def payload(tmp_path):
+    path = tmp_path / "update.swu"
+    write_swu(path, default_entries(image_size=500_000))
+    return path.read_bytes()
+
+
+@pytest.fixture
+def manager(daemon, manager):
+    """The shared manager, streaming into the fake swupdate."""
+    manager.streaming = True
+    manager.swupdate_socket = daemon.path
+    return manager
+
+
+def _upload(manager, data, chunk_size=64 * 1024):
+    assert manager.start_upload(len(data))
+    offsets = list(range(0, len(data), chunk_size))
+    # Second chunk first, so the stream has to buffer it
+    offsets[0], offsets[1] = offsets[1], offsets[0]
+    for offset in offsets:
+        manager.write_chunk(data[offset:offset + chunk_size], offset)
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_message_size_matches_64bit_layout():
+    assert IPC_MESSAGE_SIZE == 3120
+
+
+def test_streamed_upload_installs_after_trigger(daemon, payload, data_dir, manager):
+    _upload(manager, payload)
+    status = manager.get_status()
+    assert status["mode"] == "stream"
+    assert status["received_size"] == len(payload)
+    assert status["missing_range_count"] == 0
+
+    assert manager.finalize_upload(hashlib.sha256(payload).hexdigest())
+    assert manager.state == "ready"
+    # The tail, trailer included, waits for TriggerUpdate
+    assert len(daemon.received) == len(payload) - STREAM_HOLDBACK
+    assert bytes(daemon.received) == payload[:-STREAM_HOLDBACK]
+    assert not daemon.installed.is_set()
+    assert not list(data_dir.glob("software.swu*"))
+
+    assert manager.trigger_update()
+    assert daemon.installed.wait(5)
+    _wait(lambda: daemon.post_updates == 1)
+    assert daemon.results == [True]
+    assert bytes(daemon.received) == payload
+    assert daemon.requests == [{"source": 4, "dry_run": False, "len": len(payload)}]
+
+
+def test_dry_run_stream_returns_to_idle(daemon, payload, manager):
+    manager._dry_run = True
+    _upload(manager, payload)
+    assert manager.finalize_upload("")
+    assert manager.trigger_update()
+    _wait(lambda: manager.state == "idle")
+    assert daemon.requests[0]["dry_run"]
+    assert daemon.results == [True]
+    assert daemon.post_updates == 0
+
+
+def test_board_mismatch_aborts_stream(daemon, payload, manager):
+    manager._device_board = "other-board"
+    assert manager.start_upload(len(payload))
+    manager.write_chunk(payload[:4096], 0)
+    assert manager.state == "error"
+    assert "Board mismatch" in manager.error_message
+    assert daemon.installed.wait(5)
+    assert daemon.results == [False]
+
+
+def test_hash_mismatch_fails_install(daemon, payload, manager):
+    _upload(manager, payload)
+    assert not manager.finalize_upload("0" * 64)
+    assert "SHA-256 mismatch" in manager.error_message
+    assert daemon.installed.wait(5)
+    assert daemon.results == [False]
+
+
+def test_cancel_ready_stream_rolls_back(daemon, payload, manager):
+    _upload(manager, payload)
+    assert manager.finalize_upload("")
+    assert manager.cancel_upload()
+    assert manager.state == "idle"
+    assert daemon.installed.wait(5)
+    assert daemon.results == [False]
+    assert manager.get_status()["mode"] == "staged"
+
+
+def test_incomplete_stream_reports_gap(payload, manager):
+    assert manager.start_upload(len(payload))
+    manager.write_chunk(payload[:4096], 0)
+    manager.write_chunk(payload[8192:16384], 8192)
+    assert manager.get_status()["missing_ranges"] == [[4096, len(payload)]]
+    assert not manager.finalize_upload("")
+    assert manager.state == "uploading"
+
+
+@pytest.mark.parametrize("refuse", [False, True])
+def test_falls_back_to_staging(daemon, payload, data_dir, manager, refuse):
+    daemon.refuse = refuse
+    if not refuse:
+        manager.swupdate_socket = str(data_dir / "missing")
+    with patch.object(manager, "_get_available_space", return_value=len(payload)):
+        assert manager.start_upload(len(payload))
+    assert manager.get_status()["mode"] == "staged"
+    assert (data_dir / "software.swu.part").exists()
+    manager.cancel_upload()
+
+
+def test_client_status_and_post_update(daemon):
+    client = SwupdateClient(daemon.path)
+    assert client.get_status()["current"] == 0
+    client.post_update()
+    assert daemon.post_updates == 1
@@ -0,0 +1,77 @@
+import pytest
+
+from tzcatalog import load_timezones, parse_tzdata_zi, parse_zone_tab, walk_zoneinfo
+
+TZDATA_ZI = """# version 2024a
+R d 1916 o - Jun 14 23s 1 S
+Z Africa/Abidjan -0:16:8 - LMT 1912
+0 - GMT
+Z Europe/Berlin 0:53:28 - LMT 1893 Ap
+1 c CE%sT 1945 May 24 2
+Z Etc/UTC 0 - UTC
+L Etc/UTC UTC
+L Europe/Berlin Arctic/Longyearbyen
+"""
+
+ZONE1970_TAB = """# tzdb timezone descriptions
+#codes\tcoordinates\tTZ\tcomments
+CI,BF,GH\t+0519-00402\tAfrica/Abidjan
+DE,DK\t+5230+01322\tEurope/Berlin\tmost of Germany
+"""
+
+
+def _write_tzif(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"TZif2" + b"\x00" * 40)
+
+
+def test_parse_tzdata_zi(tmp_path):
+    path = tmp_path / "tzdata.zi"
+    path.write_text(TZDATA_ZI)
+
+    names = parse_tzdata_zi(path)
+
+    assert names == [
+        "Africa/Abidjan", "Europe/Berlin", "Etc/UTC", "UTC", "Arctic/Longyearbyen"
+    ]
+
+
+def test_parse_zone_tab(tmp_path):
+    path = tmp_path / "zone1970.tab"
+    path.write_text(ZONE1970_TAB)
+
+    assert parse_zone_tab(path) == ["Africa/Abidjan", "Europe/Berlin", "UTC"]
+
+
+def test_walk_zoneinfo_skips_non_zones(tmp_path):
+    _write_tzif(tmp_path / "Europe" / "Berlin")
+    _write_tzif(tmp_path / "UTC")
+    _write_tzif(tmp_path / "posix" / "Europe" / "Berlin")
+    _write_tzif(tmp_path / "posixrules")
+    (tmp_path / "zone.tab").write_text("not a zone")
+    (tmp_path / "leapseconds").write_text("not a zone")
+
+    assert sorted(walk_zoneinfo(tmp_path)) == ["Europe/Berlin", "UTC"]
+
+
+def test_load_timezones_prefers_tzdata_zi(tmp_path):
+    (tmp_path / "tzdata.zi").write_text(TZDATA_ZI)
+    (tmp_path / "zone1970.tab").write_text(ZONE1970_TAB)
+
+    assert "Arctic/Longyearbyen" in load_timezones(tmp_path)
+
+
+def test_load_timezones_falls_back_to_zone_tab(tmp_path):
+    (tmp_path / "zone1970.tab").write_text(ZONE1970_TAB)
+
+    assert load_timezones(tmp_path) == ["Africa/Abidjan", "Europe/Berlin", "UTC"]
+
+
+def test_load_timezones_falls_back_to_walk(tmp_path):
+    _write_tzif(tmp_path / "Asia" / "Tokyo")
+
+    assert load_timezones(tmp_path) == ["Asia/Tokyo"]
+
+
+def test_load_timezones_missing(tmp_path):
+    assert load_timezones(tmp_path / "missing") is None
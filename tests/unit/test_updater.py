@@ -0,0 +1,165 @@
+import functools
+import hashlib
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import updater
+from fakes.swu import default_entries, write_swu
+from updater import UpdaterManager, UpdaterState
+
+
+@pytest.fixture
+def swu(tmp_path):
+    path = tmp_path / "update.swu"
+    write_swu(path, default_entries(image_size=2_000_000))
+    return path
+
+
+class StatusRecorder:
+    def __init__(self, manager):
+        self.manager = manager
+        self.statuses = []
+        self.finished = threading.Event()
+        manager.add_status_listener(self)
+
+    def __call__(self, status):
+        self.statuses.append(status)
+        if status["state"] in ("ready", "error", "idle"):
+            self.finished.set()
+
+    def stages(self):
+        names = []
+        for status in self.statuses:
+            stage = status["stage"]
+            if stage and (not names or names[-1] != stage["name"]):
+                names.append(stage["name"])
+        return names
+
+
+def _uploaded(swu):
+    manager = UpdaterManager()
+    manager._device_board = "streambox-t6"
+    data = swu.read_bytes()
+    with patch.object(manager, "_get_available_space", return_value=len(data)):
+        assert manager.start_upload(len(data))
+    # Out of order, so finalize has bytes left to read back
+    manager.write_chunk(data[4096:], 4096)
+    manager.write_chunk(data[:4096], 0)
+    return manager, data
+
+
+def test_background_finalize_reports_stages(swu, data_dir):
+    manager, data = _uploaded(swu)
+    recorder = StatusRecorder(manager)
+
+    assert manager.finalize_upload(hashlib.sha256(data).hexdigest(), background=True)
+    assert recorder.finished.wait(5)
+
+    assert manager.state == UpdaterState.READY.value
+    assert recorder.stages() == ["hash", "copy", "index", "board"]
+    assert manager.get_status()["stage"] is None
+    assert (data_dir / "software.swu").read_bytes() == data
+
+
+def test_background_import_failure(swu, data_dir):
+    manager = UpdaterManager()
+    manager._device_board = "other_board"
+    recorder = StatusRecorder(manager)
+
+    assert manager.import_local_file(str(swu), "", background=True)
+    assert recorder.finished.wait(5)
+
+    assert manager.state == UpdaterState.ERROR.value
+    assert "Board mismatch" in manager.error_message
+    assert recorder.stages() == ["copy", "index", "board"]
+    assert not (data_dir / "software.swu").exists()
+
+
+def test_progress_notifications_are_throttled(swu, data_dir):
+    manager = UpdaterManager()
+    manager.status_interval = 60
+    recorder = StatusRecorder(manager)
+
+    with patch.object(updater, "import_pass", functools.partial(updater.import_pass, chunk_size=4096)):
+        assert manager.import_local_file(str(swu), "")
+
+    # Forced notifications for each stage and the final state only
+    progress = [s for s in recorder.statuses if s["stage"] and s["stage"]["done"]]
+    assert len(progress) <= 1
+    assert len(recorder.statuses) <= 6
+
+
+def test_cancel_aborts_verification(swu, data_dir):
+    manager = UpdaterManager()
+    seen = []
+
+    def cancel_on_progress(status):
+        stage = status["stage"]
+        if stage and stage["done"]:
+            seen.append(stage["done"])
+            manager.cancel_upload()
+
+    manager.status_interval = 0
+    manager.add_status_listener(cancel_on_progress)
+    with patch.object(updater, "import_pass", functools.partial(updater.import_pass, chunk_size=65536)):
+        assert not manager.import_local_file(str(swu), "")
+
+    assert seen == [65536]
+    assert manager.state == UpdaterState.IDLE.value
+    assert manager.get_status()["stage"] is None
+    assert not (data_dir / "software.swu.part").exists()
+    assert not (data_dir / "software.swu").exists()
+
+
+def test_upload_progress_is_coalesced(swu, data_dir):
+    manager = UpdaterManager()
+    manager.status_interval = 60
+    recorder = StatusRecorder(manager)
+    data = swu.read_bytes()
+
+    with patch.object(manager, "_get_available_space", return_value=len(data)):
+        manager.start_upload(len(data))
+    for offset in range(0, len(data), 4096):
+        manager.write_chunk(data[offset:offset + 4096], offset)
+    manager._flush_status()
+
+    # Start, then one trailing notification carrying the final progress
+    assert [s["progress"] for s in recorder.statuses] == [0.0, 100.0]
+
+
+def test_status_does_not_read_files(tmp_path, data_dir):
+    version_file = tmp_path / "sw-versions"
+    version_file.write_text("VERSION=2.4.0\n")
+    with patch.object(updater, "VERSION_FILE", version_file), \
+            patch.object(updater, "DRY_RUN_FILE", tmp_path / "dry-run"):
+        manager = UpdaterManager()
+        version_file.write_text("VERSION=2.5.0\n")
+        (tmp_path / "dry-run").touch()
+        status = manager.get_status()
+        assert status["current_version"] == "2.4.0"
+        assert not status["dry_run"]
+
+        manager.set_dry_run(False)
+        assert not (tmp_path / "dry-run").exists()
+        assert not manager.get_status()["dry_run"]
+
+
+def test_status_survives_upload_cleared_concurrently(data_dir):
+    manager = UpdaterManager()
+
+    class VanishingStream:
+        # Cancel clears the stream on another thread between check and use
+        position = 100
+        total_size = 1000
+
+        @property
+        def complete(self):
+            manager._stream = None
+            return False
+
+    manager._stream = VanishingStream()
+    status = manager.get_status()
+    assert status["missing_ranges"] == [[100, 1000]]
+    assert status["mode"] == "stream"
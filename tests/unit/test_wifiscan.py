@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from wifiscan import BAND_2G, BAND_5G, BAND_6G, BssRecord, ScanParser, bucket_by_band, parse_scan
+
+SCAN = (Path(__file__).resolve().parent.parent / "fixtures" / "iw" / "scan.txt").read_text()
+
+
+def test_parse_scan_dedupes_by_ssid():
+    records = parse_scan(SCAN.splitlines())
+
+    assert [r.ssid for r in records] == ["HomeNet", "Office 6E", "Cafe Guest", "Legacy"]
+    home = records[0]
+    assert home.bssid == "a0:b1:c2:d3:e4:02"
+    assert home.signal == -48
+    assert home.frequency == 5180
+    assert home.security == "wpa"
+    assert home.bands == (BAND_2G, BAND_5G)
+
+
+def test_parse_scan_security_and_band():
+    records = {r.ssid: r for r in parse_scan(SCAN.splitlines())}
+
+    assert records["Cafe Guest"].security == "open"
+    assert records["Legacy"].security == "wep"
+    assert records["Office 6E"].band == BAND_6G
+
+
+def test_parser_counts_every_bss_and_drops_hidden():
+    parser = ScanParser()
+    for line in SCAN.splitlines():
+        parser.feed(line)
+    records = parser.finish()
+
+    assert parser.bss_count == 7
+    assert "" not in {r.ssid for r in records}
+
+
+def test_bucket_by_band():
+    buckets = bucket_by_band(parse_scan(SCAN.splitlines()))
+
+    assert [r.ssid for r in buckets[BAND_2G]] == ["HomeNet", "Cafe Guest", "Legacy"]
+    assert [r.ssid for r in buckets[BAND_5G]] == ["HomeNet"]
+    assert [r.ssid for r in buckets[BAND_6G]] == ["Office 6E"]
+
+
+def test_record_has_no_instance_dict():
+    record = BssRecord("aa:bb:cc:dd:ee:ff")
+    assert not hasattr(record, "__dict__")
+    assert record.to_dict()["band"] is None
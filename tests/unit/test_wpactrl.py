@@ -0,0 +1,111 @@
+import pytest
+import pytest_asyncio
+from unittest.mock import patch
+
+from fakes.wpa_supplicant import FakeWpaSupplicant
+from network import NetworkManager
+from wpactrl import (
+    EVENT_CONNECTED, EVENT_SSID_TEMP_DISABLED, WpaCtrl, WpaCtrlError, select_network,
+)
+
+PSK = "a" * 64
+
+
+@pytest_asyncio.fixture
+async def fake_wpa(tmp_path):
+    server = FakeWpaSupplicant(tmp_path / "wlan0", psk=PSK)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_request_and_status(fake_wpa):
+    async with WpaCtrl(fake_wpa.path) as ctrl:
+        assert await ctrl.ping() is True
+        assert (await ctrl.status())["wpa_state"] == "DISCONNECTED"
+        with pytest.raises(WpaCtrlError):
+            await ctrl.command("BOGUS")
+
+
+@pytest.mark.asyncio
+async def test_open_without_daemon(tmp_path):
+    ctrl = WpaCtrl(str(tmp_path / "wlan0"))
+    assert await ctrl.ping() is False
+    with pytest.raises(WpaCtrlError):
+        await ctrl.attach()
+    await ctrl.close()
+
+
+@pytest.mark.asyncio
+async def test_select_network_waits_for_connected_event(fake_wpa):
+    async with WpaCtrl(fake_wpa.path) as ctrl:
+        await ctrl.attach()
+        net_id = await select_network(ctrl, 'Home "Net"', PSK)
+        event = await ctrl.wait_event([EVENT_CONNECTED, EVENT_SSID_TEMP_DISABLED], timeout=2)
+
+    assert event.startswith(EVENT_CONNECTED)
+    assert fake_wpa.networks[net_id] == {"ssid": 'Home "Net"'.encode().hex(), "psk": PSK}
+    assert fake_wpa.commands[-2:] == [f"SELECT_NETWORK {net_id}", "DETACH"]
+
+
+@pytest.mark.asyncio
+async def test_wrong_key_reports_temp_disabled(fake_wpa):
+    async with WpaCtrl(fake_wpa.path) as ctrl:
+        await ctrl.attach()
+        await select_network(ctrl, "HomeNet", "b" * 64)
+        event = await ctrl.wait_event([EVENT_CONNECTED, EVENT_SSID_TEMP_DISABLED], timeout=2)
+
+    assert event.startswith(EVENT_SSID_TEMP_DISABLED)
+    assert "reason=WRONG_KEY" in event
+
+
+@pytest.mark.asyncio
+async def test_wait_event_timeout(fake_wpa):
+    async with WpaCtrl(fake_wpa.path) as ctrl:
+        await ctrl.attach()
+        assert await ctrl.wait_event([EVENT_CONNECTED], timeout=0.05) is None
+
+
+@pytest.mark.asyncio
+async def test_associate_with_running_daemon(fake_wpa, tmp_path):
+    manager = NetworkManager()
+    manager.WPA_CTRL_DIR = str(tmp_path)
+
+    with patch.object(manager, '_run_command') as run:
+        assert await manager._wpa_associate("wlan0", "HomeNet", PSK, "/unused") is True
+        assert await manager._wpa_associate("wlan0", "HomeNet", "c" * 64, "/unused") is False
+
+    run.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_associate_starts_daemon_when_absent(tmp_path):
+    manager = NetworkManager()
+    manager.WPA_CTRL_DIR = str(tmp_path)
+    server = FakeWpaSupplicant(tmp_path / "wlan0", connected=True)
+    started = []
+
+    async def run(args, timeout=30):
+        started.append(args)
+        await server.start()
+        return True, ""
+
+    try:
+        with patch.object(manager, '_run_command', side_effect=run):
+            assert await manager._wpa_associate("wlan0", "HomeNet", None, "/etc/wpa.conf") is True
+    finally:
+        await server.stop()
+
+    assert started[0][:4] == ["wpa_supplicant", "-B", "-i", "wlan0"]
+    assert "STATUS" in server.commands
+
+
+@pytest.mark.asyncio
+async def test_terminate_disconnects_first(fake_wpa, tmp_path):
+    manager = NetworkManager()
+    manager.WPA_CTRL_DIR = str(tmp_path)
+
+    assert await manager._wpa_terminate("wlan0") is True
+    assert fake_wpa.terminated is True
+    assert fake_wpa.commands.index("DISCONNECT") < fake_wpa.commands.index("TERMINATE")